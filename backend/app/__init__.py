@@ -38,6 +38,9 @@ def create_app(config_name='development'):
   from app.errors import bp  as errors_bp
   app.register_blueprint(errors_bp)
 
+  from app.scheduler import scheduler
+  scheduler.init_app(app)
+
   if not app.debug and not app.testing: 
     if not os.path.exists('logs'):
       os.mkdir('logs')
@@ -1,26 +1,86 @@
-from app.models import Paper, Author, Keyword, Citation, paper_authors
-from app import db
-from sqlalchemy import func, desc
+from app.models import (
+  Paper, Author, AuthorMetrics, Keyword, Citation, KeywordPairStats, KeywordYearStats, ResearchGap, YearStats,
+  paper_authors, paper_keywords, get_data_version
+)
+from app.rollups import keyword_totals
+from app.sketches import distinct_union, sketches_built
+from app.utils import CacheHelper, paginate_results
+from app.caching import single_flight
+from app import db, cache
+from flask import current_app
+from sqlalchemy import case, func, desc, literal, select, union_all
+from sqlalchemy.orm import aliased
 from collections import defaultdict
+from itertools import chain
 import networkx as nx
+import numpy as np
+import scipy.sparse as sp
+import scipy.stats as stats
+import math
 from datetime import datetime
+
+KEYWORD_RELATIONSHIP_METRICS = ('count', 'jaccard', 'lift', 'pmi')
+AUTHOR_LEADERBOARD_SORTS = (
+  'h_index', 'g_index', 'i10_index', 'total_citations',
+  'avg_citations', 'paper_count', 'unique_collaborators'
+)
+TRENDING_SORTS = ('decayed_score', 'growth_rate', 'recent_papers')
       
+def _id_array(query, width=1, chunk_size=50000):
+  rows = query.execution_options(yield_per=chunk_size)
+  return np.fromiter(chain.from_iterable(rows), dtype=np.int64).reshape(-1, width)
+
+
+def approximate_average_clustering(sources, targets, n_nodes, samples, confidence=0.95, seed=42):
+  """Estimate the undirected average clustering by wedge sampling.
+
+  Nodes are drawn uniformly and, for those with degree >= 2, one random
+  pair of neighbours is tested for adjacency; the fraction of closed
+  wedges is an unbiased estimate of nx.average_clustering (Schank &
+  Wagner). The graph is held as sorted undirected id pairs (u * n + v), so
+  both neighbour lookup and adjacency tests are array operations.
+  Returns (estimate, (low, high) Wilson interval).
+  """
+  if n_nodes == 0 or samples <= 0:
+    return 0.0, (0.0, 0.0)
+
+  pairs = np.unique(np.concatenate([sources * n_nodes + targets, targets * n_nodes + sources]))
+  rows = pairs // n_nodes
+  cols = pairs % n_nodes
+  indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+  np.cumsum(np.bincount(rows, minlength=n_nodes), out=indptr[1:])
+
+  rng = np.random.default_rng(seed)
+  nodes = rng.integers(0, n_nodes, size=samples)
+  degree = indptr[nodes + 1] - indptr[nodes]
+  wedge = degree >= 2
+  start, degree = indptr[nodes[wedge]], degree[wedge]
+
+  first = rng.integers(0, degree)
+  second = rng.integers(0, degree - 1)
+  second += second >= first
+  keys = cols[start + first] * n_nodes + cols[start + second]
+
+  found = np.searchsorted(pairs, keys)
+  closed = int(np.count_nonzero(pairs[np.minimum(found, len(pairs) - 1)] == keys)) if len(pairs) else 0
+
+  estimate = closed / samples
+  z = stats.norm.ppf(0.5 + confidence / 2)
+  centre = (estimate + z * z / (2 * samples)) / (1 + z * z / samples)
+  margin = z * math.sqrt(estimate * (1 - estimate) / samples + z * z / (4 * samples * samples)) / (1 + z * z / samples)
+  return estimate, (float(max(centre - margin, 0.0)), float(min(centre + margin, 1.0)))
+
+
 class ResearchAnalytics:
 
   @staticmethod
-  def get_research_hotspots(year_range=None, limit=10):
-    query = db.session.query(
-      Keyword.name,
-      func.count(Paper.id).label('paper_count'),
-      func.avg(Paper.citation_count).label('avg_citations')
-    ).join(Keyword.papers)
-
-    if year_range:
-      start_year, end_year = year_range
-      query = query.filter(Paper.year.between(start_year, end_year))
-
-    results = query.group_by(Keyword.name)\
-      .having(func.count(Paper.id) >= 3)\
+  def get_research_hotspots(year_range=None, limit=10, min_papers=None):
+    if min_papers is None:
+      min_papers = current_app.config['MIN_HOTSPOT_PAPERS']
+
+    start_year, end_year = year_range if year_range else (None, None)
+
+    results = keyword_totals(start_year, end_year, min_papers=min_papers)\
       .order_by(desc('avg_citations'))\
       .limit(limit).all()
 
@@ -31,284 +91,664 @@ class ResearchAnalytics:
         'avg_citations': float(avg_citations or 0),
         'hotspot_score': paper_count * float(avg_citations or 0)
       }
-      for keyword, paper_count, avg_citations in results
+      for keyword, paper_count, _, avg_citations in results
     ]
 
-@staticmethod
-def get_author_collaborations_network(min_papers=2):
-  authors = Author.query.join(Author.papers)\
-    .group_by(Author.id)\
-    .having(func.count(Paper.id) >= min_papers).all()
-
-  collaborations = defaultdict(set)
-
-  for author in authors:
-    for paper in author.papers:
-      co_authors = [a for a in paper.authors if a.id != author.id]
-      for co_author in co_authors:
-        collaborations[author.name].add(co_author.name)
-
-  edges = []
-  processed_pairs = set()
-
-  for author, collaborators in collaborations.items():
-    for collaborator in collaborators:
-      pair = tuple(sorted([author, collaborator]))
-      if pair not in processed_pairs:
-        edges.append({
-          'source':pair[0],
-          'target': pair[1],
-          'type': 'collaboration'
-        })
-        processed_pairs.add(pair)
-
-  return {
-    'nodes': [{'id': author.name, 'type': 'author', 'paper_count': len(list(author.papers))}
-              for author in authors],
-    'edges': edges
-  }
-
-@staticmethod
-def analyze_citation_patterns():
-  try:
+  @staticmethod
+  def get_keyword_evolutions(keywords, years_back=10, period_years=None, top_k=10):
+    """Per-period paper counts and top co-keywords for several keywords.
+
+    All terms share one scan: they are joined against `keyword` as a small
+    derived table, papers are bucketed into period_years-wide periods in
+    SQL, and the top_k co-keywords per period are picked with ROW_NUMBER.
+    """
+    if period_years is None:
+      period_years = current_app.config['KEYWORD_EVOLUTION_PERIOD_YEARS']
+
+    terms = list(dict.fromkeys(kw.lower().strip() for kw in keywords if kw.strip()))
+    if not terms:
+      return {}
+
+    start_year = datetime.now().year - years_back
+    term_table = union_all(*[select(literal(term).label('term')) for term in terms]).subquery('terms')
+
+    matches = select(term_table.c.term, paper_keywords.c.paper_id)\
+      .join(Keyword, Keyword.name.contains(term_table.c.term))\
+      .join(paper_keywords, paper_keywords.c.keyword_id == Keyword.id)\
+      .distinct().subquery('matches')
+
+    bucket = ((Paper.year // period_years) * period_years).label('bucket')
+    matched_papers = select(matches.c.term, matches.c.paper_id, Paper.citation_count, bucket)\
+      .join(Paper, Paper.id == matches.c.paper_id)\
+      .where(Paper.year >= start_year).subquery('matched_papers')
+
+    period_rows = db.session.execute(
+      select(
+        matched_papers.c.term,
+        matched_papers.c.bucket,
+        func.count(matched_papers.c.paper_id),
+        func.avg(matched_papers.c.citation_count)
+      ).group_by(matched_papers.c.term, matched_papers.c.bucket)
+    ).all()
+
+    co_keyword = aliased(Keyword)
+    co_counts = select(
+      matched_papers.c.term,
+      matched_papers.c.bucket,
+      co_keyword.name.label('co_keyword'),
+      func.count().label('count')
+    ).join(paper_keywords, paper_keywords.c.paper_id == matched_papers.c.paper_id)\
+     .join(co_keyword, co_keyword.id == paper_keywords.c.keyword_id)\
+     .where(co_keyword.name != matched_papers.c.term)\
+     .group_by(matched_papers.c.term, matched_papers.c.bucket, co_keyword.name).subquery('co_counts')
+
+    ranked = select(
+      co_counts,
+      func.row_number().over(
+        partition_by=(co_counts.c.term, co_counts.c.bucket),
+        order_by=(co_counts.c.count.desc(), co_counts.c.co_keyword)
+      ).label('rank')
+    ).subquery('ranked')
+
+    co_rows = db.session.execute(
+      select(ranked.c.term, ranked.c.bucket, ranked.c.co_keyword, ranked.c.count)
+      .where(ranked.c.rank <= top_k)
+      .order_by(ranked.c.term, ranked.c.bucket, ranked.c.rank)
+    ).all()
+
+    top_co_keywords = defaultdict(list)
+    for term, period_start, co_name, count in co_rows:
+      top_co_keywords[(term, period_start)].append({'keyword': co_name, 'count': count})
+
+    evolutions = {term: {'keyword': term, 'evolution': [], 'total_papers': 0} for term in terms}
+    for term, period_start, paper_count, avg_citations in sorted(period_rows, key=lambda x: (x[0], x[1])):
+      evolutions[term]['evolution'].append({
+        'period': f'{period_start}-{period_start + period_years - 1}',
+        'paper_count': paper_count,
+        'avg_citations': float(avg_citations or 0),
+        'top_co_keywords': top_co_keywords[(term, period_start)]
+      })
+      evolutions[term]['total_papers'] += paper_count
 
-    G = nx.DiGraph()
+    return evolutions
 
-    papers = Paper.query.all()
-    for paper in papers:
-      G.add_node(paper.id, title=paper.title, year=paper.year)
+  @staticmethod
+  def get_temporal_keyword_evolution(keyword, years_back=10, period_years=None, top_k=10):
+    evolution = ResearchAnalytics.get_keyword_evolutions(
+      [keyword], years_back, period_years, top_k
+    ).get(keyword.lower().strip())
+    return evolution or {'keyword': keyword, 'evolution': [], 'total_papers': 0}
 
-    citations = Citation.query.all()
-    for citation in citations:
-      G.add_edge(citation.citing_paper_id, citation.cited_paper_id)
+  @staticmethod
+  def compute_research_gaps(min_citations=50, max_recent_papers=5, limit=20):
+    """Rank influential older papers whose keywords see little recent work.
+
+    Recent paper counts per keyword are read once from the keyword/year
+    rollup and joined to the influential papers' keywords, so the whole
+    ranking is a single grouped query.
+    """
+    recent_year_threshold = datetime.now().year - 3
+
+    recent_counts = select(
+      KeywordYearStats.keyword_id,
+      func.sum(KeywordYearStats.paper_count).label('recent_count')
+    ).where(KeywordYearStats.year >= recent_year_threshold)\
+     .group_by(KeywordYearStats.keyword_id).subquery('recent_counts')
+
+    keyword_count = func.count(paper_keywords.c.keyword_id)
+    avg_recent = (func.coalesce(func.sum(recent_counts.c.recent_count), 0) * 1.0 /
+                  case((keyword_count > 0, keyword_count), else_=1)).label('avg_recent')
+    gap_score = (Paper.citation_count * 1.0 /
+                 case((avg_recent > 1, avg_recent), else_=1)).label('gap_score')
+
+    rows = db.session.query(Paper.id, avg_recent, gap_score)\
+      .outerjoin(paper_keywords, paper_keywords.c.paper_id == Paper.id)\
+      .outerjoin(recent_counts, recent_counts.c.keyword_id == paper_keywords.c.keyword_id)\
+      .filter(Paper.citation_count >= min_citations)\
+      .filter(Paper.year < recent_year_threshold)\
+      .group_by(Paper.id, Paper.citation_count)\
+      .having(avg_recent <= max_recent_papers)\
+      .order_by(desc('gap_score'), Paper.id)\
+      .limit(limit).all()
 
-    if len(G.nodes()) == 0:
-      return {
-        'influential_papers': [],
-        'network_stats': {
-          'total_papers': 0,
-          'total_citations': 0,
-          'density': 0,
-          'avg_clustering': 0
-        }
-      }
-    
-    pagerank_scores = nx.pagerank(G) if len(G.edges()) > 0 else {node: 0 for node in G.nodes()}
-    betweenness_centrality = nx.betweenness_centrality(G) if len(G.edges()) > 0 else {node: 0 for node in G.nodes()}
-    in_degree_centrality = nx.in_degree_centrality(G) if len(G.edges()) > 0 else {node: 0 for node in G.nodes()}
+    return [(paper_id, float(avg), float(score)) for paper_id, avg, score in rows]
 
+  @staticmethod
+  def refresh_research_gaps(min_citations=50, max_recent_papers=5):
+    """Replace the stored gaps for one parameter set; run from the snapshot refresh."""
+    version = get_data_version()
+    computed_at = datetime.utcnow()
+    try:
+      ResearchGap.query\
+        .filter_by(min_citations=min_citations, max_recent_papers=max_recent_papers)\
+        .delete()
+      db.session.add_all([
+        ResearchGap(
+          paper_id=paper_id,
+          min_citations=min_citations,
+          max_recent_papers=max_recent_papers,
+          recent_similar_papers=avg_recent,
+          gap_score=score,
+          data_version=version,
+          computed_at=computed_at
+        )
+        for paper_id, avg_recent, score in
+        ResearchAnalytics.compute_research_gaps(min_citations, max_recent_papers)
+      ])
+      db.session.commit()
+    except Exception:
+      db.session.rollback()
+      raise
 
-    influential_papers = []
-    for paper_id, pagerank_score in sorted(pagerank_scores.items(),
-                                           key=lambda x: x[1], reverse=True)[:20]:
-      
-      paper = Paper.query.get(paper_id)
-      if paper:
-        influential_papers.append({
-          'id': paper.id,
-          'title': paper.title,
-          'year': paper.year,
-          'citation_count': paper.citation_count,
-          'pagerank_score': pagerank_score,
-          'betweenness_centrality': betweenness_centrality.get(paper_id, 0),
-          'in_degree_centrality': in_degree_centrality.get(paper_id, 0)
-        })
-
-    density = nx.density(G) if len(G.nodes()) > 1 else 0
-    avg_clustering = nx.average_clustering(G.to_undirected()) if len(G.nodes()) > 1 else 0
+  @staticmethod
+  def identify_research_gaps(min_citations=50, max_recent_papers=5):
+    """The gaps stored by the last refresh_research_gaps; never writes."""
+    stored = ResearchGap.query\
+      .filter_by(min_citations=min_citations, max_recent_papers=max_recent_papers)\
+      .order_by(desc(ResearchGap.gap_score), ResearchGap.paper_id).all()
 
-    return {
-      'influential_papers': influential_papers,
-      'network_stats': {
-        'total_papers': len(G.nodes()),
-        'total_citations': len(G.edges()),
-        'density': density,
-        'avg_clustering': avg_clustering
+    return [
+      {
+        'paper': gap.paper.to_dict(),
+        'recent_similar_papers': gap.recent_similar_papers,
+        'keywords': [kw.name for kw in gap.paper.keywords],
+        'gap_score': gap.gap_score,
+        'computed_at': gap.computed_at.isoformat() if gap.computed_at else None
       }
+      for gap in stored
+    ]
+
+  @staticmethod
+  def get_keyword_relationships_batch(keyword_names, metric='count', limit=10):
+    """Top related keywords for each name, ranked by count, jaccard, lift or pmi.
+
+    Scores come straight from keyword_pair_stats; ROW_NUMBER keeps `limit`
+    partners per keyword so only k rows per keyword leave the database.
+    """
+    names = list(dict.fromkeys(name.lower().strip() for name in keyword_names if name.strip()))
+    results = {name: [] for name in names}
+    if not names:
+      return results
+
+    total_papers = db.session.query(func.coalesce(func.sum(YearStats.paper_count), 0)).scalar()
+
+    pair = aliased(KeywordPairStats)
+    own = aliased(KeywordPairStats)
+    other = aliased(KeywordPairStats)
+    source = aliased(Keyword)
+    partner = aliased(Keyword)
+
+    co_count = pair.co_count
+    n_source = own.co_count
+    n_partner = other.co_count
+    scores = {
+      'count': co_count,
+      'jaccard': co_count * 1.0 / (n_source + n_partner - co_count),
+      'lift': co_count * float(total_papers) / (n_source * n_partner),
     }
-  
-  except Exception as e:
+    scores['pmi'] = scores['lift']
+
+    ranked = select(
+      source.name.label('keyword'),
+      partner.name.label('related'),
+      co_count.label('co_count'),
+      n_source.label('n_source'),
+      n_partner.label('n_partner'),
+      func.row_number().over(
+        partition_by=pair.keyword_id,
+        order_by=(scores[metric].desc(), partner.name)
+      ).label('rank')
+    ).select_from(pair)\
+     .join(source, source.id == pair.keyword_id)\
+     .join(partner, partner.id == pair.related_keyword_id)\
+     .join(own, (own.keyword_id == pair.keyword_id) & (own.related_keyword_id == pair.keyword_id))\
+     .join(other, (other.keyword_id == pair.related_keyword_id) & (other.related_keyword_id == pair.related_keyword_id))\
+     .where(source.name.in_(names), pair.related_keyword_id != pair.keyword_id)\
+     .subquery('ranked')
+
+    rows = db.session.execute(
+      select(ranked).where(ranked.c.rank <= limit).order_by(ranked.c.keyword, ranked.c.rank)
+    ).all()
+
+    for keyword, related, count, n_a, n_b, _ in rows:
+      lift = count * total_papers / (n_a * n_b) if n_a and n_b else 0.0
+      results[keyword].append({
+        'keyword': related,
+        'co_occurence_count': count,
+        'strength': count / n_a if n_a else 0.0,
+        'jaccard': count / (n_a + n_b - count),
+        'lift': lift,
+        'pmi': math.log(lift) if lift > 0 else None
+      })
+
+    return results
+
+  @staticmethod
+  def get_keyword_relationships(keyword_name, limit=10, metric='count'):
+    return ResearchAnalytics.get_keyword_relationships_batch(
+      [keyword_name], metric, limit
+    ).get(keyword_name.lower().strip(), [])
+
+  @staticmethod
+  def compute_author_metrics():
+    """Recompute h-, g- and i10-index and collaborator counts for every author.
+
+    Each author's papers are ranked by citation_count with ROW_NUMBER and a
+    running citation sum, so all indices fall out of one grouped pass that
+    is written straight into author_metrics with INSERT ... SELECT.
+    """
+    version = get_data_version()
+    computed_at = datetime.utcnow()
+    citations = func.coalesce(Paper.citation_count, 0)
+
+    ranked = select(
+      paper_authors.c.author_id,
+      citations.label('citations'),
+      func.row_number().over(
+        partition_by=paper_authors.c.author_id,
+        order_by=(citations.desc(), Paper.id)
+      ).label('rank'),
+      func.sum(citations).over(
+        partition_by=paper_authors.c.author_id,
+        order_by=(citations.desc(), Paper.id),
+        rows=(None, 0)
+      ).label('running_total')
+    ).join(Paper, Paper.id == paper_authors.c.paper_id).subquery('ranked')
+
+    per_author = select(
+      ranked.c.author_id,
+      func.count().label('paper_count'),
+      func.sum(ranked.c.citations).label('total_citations'),
+      (func.sum(ranked.c.citations) * 1.0 / func.count()).label('avg_citations'),
+      func.sum(case((ranked.c.citations >= ranked.c.rank, 1), else_=0)).label('h_index'),
+      func.max(case((ranked.c.running_total >= ranked.c.rank * ranked.c.rank, ranked.c.rank), else_=0)).label('g_index'),
+      func.sum(case((ranked.c.citations >= 10, 1), else_=0)).label('i10_index')
+    ).group_by(ranked.c.author_id).subquery('per_author')
+
+    co_author = paper_authors.alias('co_author')
+    collaborators = select(
+      paper_authors.c.author_id,
+      func.count(func.distinct(co_author.c.author_id)).label('unique_collaborators')
+    ).join(co_author, (co_author.c.paper_id == paper_authors.c.paper_id) &
+                      (co_author.c.author_id != paper_authors.c.author_id))\
+     .group_by(paper_authors.c.author_id).subquery('collaborators')
+
+    try:
+      db.session.execute(AuthorMetrics.__table__.delete())
+      db.session.execute(AuthorMetrics.__table__.insert().from_select(
+        ['author_id', 'paper_count', 'total_citations', 'avg_citations', 'h_index',
+         'g_index', 'i10_index', 'unique_collaborators', 'data_version', 'computed_at'],
+        select(
+          per_author.c.author_id,
+          per_author.c.paper_count,
+          per_author.c.total_citations,
+          per_author.c.avg_citations,
+          per_author.c.h_index,
+          per_author.c.g_index,
+          per_author.c.i10_index,
+          func.coalesce(collaborators.c.unique_collaborators, 0),
+          literal(version),
+          literal(computed_at)
+        ).outerjoin(collaborators, collaborators.c.author_id == per_author.c.author_id)
+      ))
+      db.session.commit()
+    except Exception:
+      db.session.rollback()
+      raise
 
-    papers=Paper.query.order_by(desc(Paper.citation_count)).limit(20).all()
     return {
-      'influential_papers': [
-        {
-          'id': paper.id,
-          'title': paper.title,
-          'year': paper.year,
-          'citation_count': paper.citation_count,
-          'pagerank_score': 0,
-          'betweenness_centrality': 0,
-          'in_degree_centrality': 0
-        }
-        for paper in papers
-      ],
-      'network_stats': {
-        'total_papers': Paper.query.count(),
-        'total_citations': Citation.query.count(),
-        'density': 0,
-        'avg_clustering': 0
-      }
+      'authors': AuthorMetrics.query.count(),
+      'data_version': version,
+      'computed_at': computed_at.isoformat()
     }
-  
-@staticmethod
-def get_temporal_keyword_evolution(keyword, years_back=10):
-  current_year = datetime.now().year
-  start_year = current_year - years_back
-
-  papers = Paper.query.join(Paper.keywords)\
-    .filter(Keyword.name.contains(keyword.lower()))\
-    .filter(Paper.year >= start_year)\
-    .order_by(Paper.year).all()
-  
-  periods = defaultdict(list)
-  for paper in papers:
-    period = f'{paper.year//5 * 5}-{paper.year//5 * 5 + 4}'
-    periods[period].append(paper)
-
-  evolution = []
-  for period, period_papers in sorted(periods.items()):
-    co_keywords = defaultdict(int)
-    total_citations = 0
-
-    for paper in period_papers:
-      total_citations += paper.citation_count
-      for kw in paper.keywords:
-        if kw.name != keyword.lower():
-          co_keywords[kw.name] += 1
-    
-    top_co_keywords = sorted(co_keywords.items(),
-                             key=lambda x: x[1], reverse=True)[:10]
-    
-    evolution.append({
-      'period': period,
-      'paper_count': len(period_papers),
-      'avg_citations': total_citations / len(period_papers) if period_papers else 0,
-      'top_co_keywords': [{'keyword': kw, 'count': count}
-                          for kw, count in top_co_keywords]
-    })
-
-  return {
-    'keyword': keyword,
-    'evolution': evolution,
-    'total_papers': len(papers)
-  }
-
-@staticmethod
-def identify_research_papers(min_citations= 50, max_recent_papers=5):
-  current_year = datetime.now().year
-  recent_year_threshold = current_year - 3
-
-  gaps =[]
-
-  old_influential = Paper.query\
-    .filter(Paper.citation_count >= min_citations)\
-    .filter(Paper.year , recent_year_threshold)\
-    .all()
-  
-  for paper in old_influential:
-    recent_similar = 0
-    for keyword in paper.keywords:
-      recent_count = Paper.query.join(Paper.keywords)\
-        .filter(Keyword.name == keyword.name)\
-        .filter(Paper.year >= recent_year_threshold)\
-        .count()
-      recent_similar += recent_count
-
-    avg_recent_similar = recent_similar / max(len(paper.keywords), 1)
-
-    if avg_recent_similar <= max_recent_papers:
-      gaps.append({
-        'paper': paper.to_dict(),
-        'recent_similar_papers': avg_recent_similar,
-        'keywords': [kw.name for kw in paper.keywords],
-        'gap_score': paper.citation_count / max(avg_recent_similar, 1)
-      })
 
-  gaps.sort(key=lambda x: x['gap_score'], reverse=True)
-  return gaps[:20]
+  @staticmethod
+  def author_metrics_state():
+    """(data_version, computed_at) of the stored leaderboard, or (None, None)."""
+    return db.session.query(func.max(AuthorMetrics.data_version), func.max(AuthorMetrics.computed_at)).one()
+
+  @staticmethod
+  def refresh_author_metrics():
+    """Bring author_metrics up to the current data version.
+
+    compute_author_metrics replaces the whole table, so refreshes go through
+    single_flight: one caller recomputes and the others wait for it and
+    reuse the result instead of racing on the delete and insert.
+    """
+    def load():
+      version, computed_at = ResearchAnalytics.author_metrics_state()
+      if version is None or version != get_data_version():
+        return None
+      return {
+        'authors': AuthorMetrics.query.count(),
+        'data_version': version,
+        'computed_at': computed_at.isoformat()
+      }
+
+    return single_flight.do('author_metrics', load, ResearchAnalytics.compute_author_metrics)
+
+  @staticmethod
+  def get_author_leaderboard(sort_by='h_index', order='desc', page=1, per_page=20):
+    """Page through the last computed leaderboard.
+
+    The table is refreshed by the analytics scheduler and `flask
+    compute-author-metrics`; a request only computes it when it was never
+    built.
+    """
+    if ResearchAnalytics.author_metrics_state()[0] is None:
+      ResearchAnalytics.refresh_author_metrics()
+
+    column = getattr(AuthorMetrics, sort_by)
+    query = AuthorMetrics.query.order_by(
+      desc(column) if order == 'desc' else column,
+      AuthorMetrics.author_id
+    )
+    result = paginate_results(query, page, per_page)
+    result['items'] = [metrics.to_dict() for metrics in result['items']]
+    return result
+
+  @staticmethod
+  def get_collaboration_matrix(author_names):
+    """Pairwise shared-paper counts for a set of authors.
+
+    Fetches the author x paper incidence for the requested authors in one
+    query and returns AᵀA; the diagonal holds each author's paper count.
+    """
+    names = list(dict.fromkeys(name.strip() for name in author_names if name and name.strip()))
+    authors = dict(db.session.query(Author.name, Author.id).filter(Author.name.in_(names)).all())
+
+    found = [name for name in names if name in authors]
+    missing = [name for name in names if name not in authors]
+    if not found:
+      return {'authors': [], 'missing': missing, 'matrix': []}
+
+    column_of = {authors[name]: i for i, name in enumerate(found)}
+    rows = db.session.query(paper_authors.c.paper_id, paper_authors.c.author_id)\
+      .filter(paper_authors.c.author_id.in_(list(column_of))).all()
+
+    if rows:
+      paper_ids, author_ids = zip(*rows)
+      paper_index, paper_rows = np.unique(np.asarray(paper_ids), return_inverse=True)
+      columns = np.asarray([column_of[author_id] for author_id in author_ids])
+      incidence = sp.csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (paper_rows, columns)),
+        shape=(len(paper_index), len(found))
+      )
+      matrix = (incidence.T @ incidence).toarray()
+    else:
+      matrix = np.zeros((len(found), len(found)), dtype=np.int32)
 
-@staticmethod
-def get_collaboration_strength(author1_name, author2_name):
-  try:
-    author1 = Author.query.filter_by(name=author1_name).first()
-    author2 = Author.query.filter_by(name=author2_name).first()
+    return {
+      'authors': found,
+      'missing': missing,
+      'matrix': matrix.tolist()
+    }
 
-    if not author1 or not author2:
+  @staticmethod
+  def get_collaboration_strength(author1_name, author2_name):
+    if author1_name == author2_name:
       return 0
-    
-    common_papers = db.session.query(Paper)\
-      .join(paper_authors, Paper.id == paper_authors.c.paper_id)\
-      .filter(paper_authors.c.author_id.in_([author1.id, author2.id]))\
-      .group_by(Paper.id)\
-      .having(func.count(paper_authors.c.author_id) == 2)\
-      .all()
-    
-    return len(common_papers)
-  
-  except Exception as e:
-    return 0 
-
-@staticmethod
-def get_keyword_relationships(keyword_name, limit=10):
-  try:
-    keyword = Keyword.query.filter_by(name=keyword_name.lower()).first()
-    if not keyword:
+
+    result = ResearchAnalytics.get_collaboration_matrix([author1_name, author2_name])
+    if len(result['authors']) < 2:
+      return 0
+    return result['matrix'][0][1]
+
+  @staticmethod
+  def compute_trending_keywords(half_life_years=None, window_years=None, baseline_years=None):
+    """Rank every keyword by time-decayed paper volume and recent growth.
+
+    One grouped read of keyword_year_stats feeds a vectorised pass:
+    decayed_score weights each year's papers by 0.5 ** (age / half_life),
+    and growth_rate compares the papers-per-year rate of the last
+    window_years with the baseline_years before it (add-one smoothed so
+    new keywords do not divide by zero).
+    """
+    config = current_app.config
+    half_life_years = half_life_years or config['TRENDING_HALF_LIFE_YEARS']
+    window_years = window_years or config['TRENDING_WINDOW_YEARS']
+    baseline_years = baseline_years or config['TRENDING_BASELINE_YEARS']
+
+    current_year = datetime.now().year
+    horizon_start = current_year - config['TRENDING_HORIZON_YEARS']
+
+    rows = db.session.query(
+      KeywordYearStats.keyword_id, Keyword.name, KeywordYearStats.year, KeywordYearStats.paper_count
+    ).join(Keyword, Keyword.id == KeywordYearStats.keyword_id)\
+     .filter(KeywordYearStats.year >= horizon_start).all()
+
+    if not rows:
       return []
-    
-    papers_with_keyword = keyword.papers.all()
-
-    co_occurence = defaultdict(int)
-    for paper in papers_with_keyword:
-      for kw in paper.keywords:
-        if kw.name != keyword_name.lower():
-          co_occurence[kw.name] += 1
-
-    related_keywords = sorted(co_occurence.items(),
-                               key=lambda x: x[1], reverse=True)[:limit]
-    
+
+    keyword_ids, names, years, counts = zip(*rows)
+    ids, slots = np.unique(np.asarray(keyword_ids), return_inverse=True)
+    counts = np.asarray(counts, dtype=float)
+    ages = np.clip(current_year - np.asarray(years), 0, None)
+
+    decayed = np.bincount(slots, weights=counts * 0.5 ** (ages / half_life_years), minlength=len(ids))
+    recent = np.bincount(slots, weights=counts * (ages < window_years), minlength=len(ids))
+    in_baseline = (ages >= window_years) & (ages < window_years + baseline_years)
+    baseline = np.bincount(slots, weights=counts * in_baseline, minlength=len(ids))
+    growth = (recent / window_years + 1) / (baseline / baseline_years + 1) - 1
+
+    name_of = dict(zip(keyword_ids, names))
     return [
       {
-        'keyword': kw,
-        'co_occurence_count': count,
-        'strength': count / len(papers_with_keyword)
-
+        'keyword': name_of[int(keyword_id)],
+        'decayed_score': float(decayed[i]),
+        'recent_papers': int(recent[i]),
+        'baseline_papers': int(baseline[i]),
+        'growth_rate': float(growth[i])
       }
-      for kw, count in related_keywords
+      for i, keyword_id in enumerate(ids.tolist())
     ]
-  
-  except Exception as e:
-    return []
-  
-@staticmethod
-def get_author_impact_metrics(author_name):
-  try:
+
+  @staticmethod
+  def get_trending_keywords(sort_by='decayed_score', half_life_years=None,
+                            window_years=None, baseline_years=None):
+    key = CacheHelper.generate_cache_key(
+      'trending_keywords', version=get_data_version(), half_life=half_life_years,
+      window=window_years, baseline=baseline_years, year=datetime.now().year
+    )
+    ranking = cache.get(key)
+    if ranking is None:
+      ranking = ResearchAnalytics.compute_trending_keywords(half_life_years, window_years, baseline_years)
+      cache.set(key, ranking, timeout=current_app.config['TRENDING_CACHE_TIMEOUT'])
+
+    return sorted(ranking, key=lambda x: (-x[sort_by], x['keyword']))
+
+  @staticmethod
+  def get_author_collaboration_network(min_papers=2):
+    authors = Author.query.join(Author.papers)\
+      .group_by(Author.id)\
+      .having(func.count(Paper.id) >= min_papers).all()
+
+    collaborations = defaultdict(set)
+
+    for author in authors:
+      for paper in author.papers:
+        co_authors = [a for a in paper.authors if a.id != author.id]
+        for co_author in co_authors:
+          collaborations[author.name].add(co_author.name)
+
+    edges = []
+    processed_pairs = set()
+
+    for author, collaborators in collaborations.items():
+      for collaborator in collaborators:
+        pair = tuple(sorted([author, collaborator]))
+        if pair not in processed_pairs:
+          edges.append({
+            'source':pair[0],
+            'target': pair[1],
+            'type': 'collaboration'
+          })
+          processed_pairs.add(pair)
+
+    return {
+      'nodes': [{'id': author.name, 'type': 'author', 'paper_count': len(list(author.papers))}
+                for author in authors],
+      'edges': edges
+    }
+
+  @staticmethod
+  def analyze_citation_patterns(limit=20, clustering=None):
+    """PageRank, betweenness and in-degree leaders plus whole-network stats.
+
+    The graph is built from id-only columns streamed into arrays, so no
+    Paper or Citation objects are loaded. A metric that cannot be computed
+    is listed under `degraded` together with the fallback that replaced it.
+    """
+    paper_ids = _id_array(db.session.query(Paper.id))[:, 0]
+    edges = _id_array(db.session.query(Citation.citing_paper_id, Citation.cited_paper_id), width=2)
+    cited_ids = edges[:, 1]
+
+    n_nodes, n_edges = len(paper_ids), len(edges)
+    degraded = []
+
+    def attempt(metric, compute, fallback, fallback_name):
+      try:
+        return compute()
+      except (nx.NetworkXException, ArithmeticError, MemoryError, ValueError) as e:
+        current_app.logger.warning(f'Citation analysis: {metric} failed: {str(e)}')
+        degraded.append({'metric': metric, 'error': f'{type(e).__name__}: {e}', 'fallback': fallback_name})
+        return fallback()
+
+    if n_nodes == 0:
+      return {
+        'influential_papers': [],
+        'network_stats': {
+          'total_papers': 0,
+          'total_citations': 0,
+          'density': 0,
+          'avg_clustering': 0
+        },
+        'degraded': []
+      }
+
+    G = nx.DiGraph()
+    G.add_nodes_from(paper_ids.tolist())
+    G.add_edges_from(edges.tolist())
+
+    in_degree = dict(zip(*np.unique(cited_ids, return_counts=True))) if n_edges else {}
+    scale = 1 / (n_nodes - 1) if n_nodes > 1 else 1
+    in_degree_centrality = {int(node): int(count) * scale for node, count in in_degree.items()}
+
+    if n_edges > 0:
+      pagerank_scores = attempt('pagerank', lambda: nx.pagerank(G),
+                                lambda: dict(in_degree_centrality), 'in_degree_centrality')
+      betweenness_centrality = attempt('betweenness_centrality', lambda: nx.betweenness_centrality(G),
+                                       dict, 'omitted')
+    else:
+      pagerank_scores = {}
+      betweenness_centrality = {}
+
+    config = current_app.config
+    clustering = clustering or config['CLUSTERING_MODE']
+    if clustering == 'auto':
+      clustering = 'approximate' if n_edges > config['CLUSTERING_EXACT_MAX_EDGES'] else 'exact'
+
+    clustering_info = {'method': clustering}
+    if n_nodes <= 1:
+      avg_clustering = 0
+    elif clustering == 'approximate':
+      sorted_ids = np.sort(paper_ids)
+      positions = np.searchsorted(sorted_ids, edges)
+      samples = config['CLUSTERING_SAMPLE_SIZE']
+      confidence = config['CLUSTERING_CONFIDENCE']
+      avg_clustering, (low, high) = approximate_average_clustering(
+        positions[:, 0], positions[:, 1], n_nodes, samples, confidence
+      )
+      clustering_info.update({
+        'samples': samples,
+        'confidence': confidence,
+        'interval': [low, high]
+      })
+    else:
+      avg_clustering = attempt('avg_clustering', lambda: nx.average_clustering(G.to_undirected()),
+                               lambda: None, 'omitted')
+
+    if pagerank_scores:
+      top = sorted(pagerank_scores.items(), key=lambda x: (-x[1], x[0]))[:limit]
+    else:
+      top = [(paper_id, 0) for (paper_id,) in
+             db.session.query(Paper.id).order_by(desc(Paper.citation_count), Paper.id).limit(limit)]
+
+    metadata = {
+      paper_id: (title, year, citation_count)
+      for paper_id, title, year, citation_count in db.session.query(
+        Paper.id, Paper.title, Paper.year, Paper.citation_count
+      ).filter(Paper.id.in_([paper_id for paper_id, _ in top]))
+    }
+
+    influential_papers = []
+    for paper_id, pagerank_score in top:
+      if paper_id not in metadata:
+        continue
+      title, year, citation_count = metadata[paper_id]
+      influential_papers.append({
+        'id': paper_id,
+        'title': title,
+        'year': year,
+        'citation_count': citation_count,
+        'pagerank_score': pagerank_score,
+        'betweenness_centrality': betweenness_centrality.get(paper_id, 0),
+        'in_degree_centrality': in_degree_centrality.get(paper_id, 0)
+      })
+
+    return {
+      'influential_papers': influential_papers,
+      'network_stats': {
+        'total_papers': n_nodes,
+        'total_citations': n_edges,
+        'density': n_edges / (n_nodes * (n_nodes - 1)) if n_nodes > 1 else 0,
+        'avg_clustering': avg_clustering,
+        'clustering': clustering_info
+      },
+      'degraded': degraded
+    }
+
+  @staticmethod
+  def get_author_impact_metrics(author_name):
     author = Author.query.filter_by(name=author_name).first()
     if not author:
       return None
-    
-    papers = list(author.papers)
+
+    papers = db.session.query(Paper.id, Paper.year, Paper.citation_count)\
+      .join(paper_authors, paper_authors.c.paper_id == Paper.id)\
+      .filter(paper_authors.c.author_id == author.id).all()
     if not papers:
       return None
-    
+
     total_papers = len(papers)
-    total_citations = sum(paper.citation_count for paper in papers)
-    avg_citations = total_citations / total_papers if total_papers > 0 else 0
+    total_citations = sum(citation_count or 0 for _, _, citation_count in papers)
+    avg_citations = total_citations / total_papers
 
-    citation_counts = sorted([paper.citation_count for paper in papers], reverse=True)
+    citation_counts = sorted((citation_count or 0 for _, _, citation_count in papers), reverse=True)
     h_index = 0
     for i, citations in enumerate(citation_counts):
       if citations >= i+1:
         h_index = i+1
       else:
         break
-    
-    current_year = datetime.now().year
-    recent_papers = [p for p in papers if p.year >= current_year - 3]
 
-    collaborators = set()
-    for paper in papers:
-      collaborators.update([a.name for a in paper.authors if a.name != author_name])
+    current_year = datetime.now().year
+    recent_papers = [year for _, year, _ in papers if year >= current_year - 3]
+
+    # Distinct counts come from the per-year HyperLogLog sketches instead of
+    # materialising every co-author and citing paper, unless the sketches are
+    # still waiting for their backfill.
+    if sketches_built():
+      unique_collaborators = distinct_union('author', 'collaborators', [author.id])[0].count()
+      distinct_citing_papers = distinct_union('author', 'citing_papers', [author.id])[0].count()
+    else:
+      author_papers = select(paper_authors.c.paper_id).where(paper_authors.c.author_id == author.id)
+      unique_collaborators = db.session.query(func.count(paper_authors.c.author_id.distinct()))\
+        .filter(paper_authors.c.paper_id.in_(author_papers), paper_authors.c.author_id != author.id).scalar()
+      distinct_citing_papers = db.session.query(func.count(Citation.citing_paper_id.distinct()))\
+        .filter(Citation.cited_paper_id.in_(author_papers)).scalar()
+
+    most_cited_id = max(papers, key=lambda p: p.citation_count or 0).id
 
     return {
       'author': author_name,
@@ -317,11 +757,8 @@ def get_author_impact_metrics(author_name):
       'avg_citations': avg_citations,
       'h_index': h_index,
       'recent_papers_count': len(recent_papers),
-      'unique_collaborators': len(collaborators),
-      'most_cited_paper': max(papers, key=lambda p: p.citation_count).to_dict() if papers else None,
-      'active_years': list(set(paper.year for paper in papers))
+      'unique_collaborators': unique_collaborators,
+      'distinct_citing_papers': distinct_citing_papers,
+      'most_cited_paper': db.session.get(Paper, most_cited_id).to_dict(),
+      'active_years': sorted(set(year for _, year, _ in papers))
     }
-  
-  except Exception as e:
-    return None
-  
@@ -0,0 +1,346 @@
+from app.models import Paper, Author, Keyword, Citation, KeywordYearStats, paper_authors, get_data_version
+from app.analytics import approximate_average_clustering
+from app.scheduler import SNAPSHOT_TASKS, store_snapshot
+from app.temporal import temporal_network_stats
+from app import db
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from flask import current_app
+import networkx as nx
+import numpy as np
+import json
+import os
+import time
+
+BATCH_TASKS = (
+  'hotspots', 'pagerank', 'betweenness', 'clustering',
+  'collaboration_network', 'keyword_evolution', 'temporal_network'
+)
+
+
+def _rows(query):
+  return [tuple(row) for row in query.execution_options(yield_per=50000)]
+
+
+# Transaction options that give every query of the load the same snapshot
+_SNAPSHOT_ISOLATION = {
+  'postgresql': {'isolation_level': 'SERIALIZABLE', 'postgresql_readonly': True, 'postgresql_deferrable': True},
+  'mysql': {'isolation_level': 'REPEATABLE READ'}
+}
+
+
+def load_batch_inputs(max_attempts=3):
+  """Read everything the batch tasks need as plain Python data.
+
+  On PostgreSQL the load runs in one SERIALIZABLE READ ONLY DEFERRABLE
+  transaction (REPEATABLE READ on MySQL), so every task sees the same
+  snapshot. Other backends (SQLite) do not hold one snapshot across plain
+  reads; there the data version is compared before and after the load and
+  the load retried when it moved, which catches most concurrent writes but
+  not one that commits after a higher change log id.
+  """
+  config = current_app.config
+  isolation = _SNAPSHOT_ISOLATION.get(db.engine.dialect.name)
+
+  for _ in range(max_attempts):
+    db.session.rollback()
+    if isolation:
+      db.session.connection(execution_options=isolation)
+    version = get_data_version()
+
+    inputs = {
+      'data_version': version,
+      'papers': _rows(db.session.query(Paper.id, Paper.title, Paper.year, Paper.citation_count)
+                      .order_by(Paper.id)),
+      'edges': _rows(db.session.query(Citation.citing_paper_id, Citation.cited_paper_id)),
+      'keyword_years': _rows(db.session.query(
+        Keyword.name, KeywordYearStats.year, KeywordYearStats.paper_count, KeywordYearStats.citation_sum
+      ).join(Keyword, Keyword.id == KeywordYearStats.keyword_id)),
+      'author_papers': _rows(db.session.query(Author.name, paper_authors.c.paper_id)
+                             .join(paper_authors, paper_authors.c.author_id == Author.id)),
+      'min_hotspot_papers': config['MIN_HOTSPOT_PAPERS'],
+      'min_collaboration_papers': config['MIN_COLLABORATION_PAPERS'],
+      'period_years': config['KEYWORD_EVOLUTION_PERIOD_YEARS'],
+      'start_year': datetime.now().year - config['DEFAULT_YEARS_BACK'],
+      'betweenness_samples': config['BATCH_BETWEENNESS_SAMPLES'],
+      'clustering': {
+        'mode': config['CLUSTERING_MODE'],
+        'exact_max_edges': config['CLUSTERING_EXACT_MAX_EDGES'],
+        'samples': config['CLUSTERING_SAMPLE_SIZE'],
+        'confidence': config['CLUSTERING_CONFIDENCE']
+      }
+    }
+
+    consistent = isolation is not None or get_data_version() == version
+    db.session.rollback()
+    if consistent:
+      return inputs
+
+  raise RuntimeError(f'Data kept changing while loading batch inputs ({max_attempts} attempts)')
+
+
+def _citation_graph(inputs):
+  G = nx.DiGraph()
+  G.add_nodes_from(paper_id for paper_id, _, _, _ in inputs['papers'])
+  G.add_edges_from(inputs['edges'])
+  return G
+
+
+def _task_hotspots(inputs):
+  totals = defaultdict(lambda: [0, 0])
+  for name, _, paper_count, citation_sum in inputs['keyword_years']:
+    totals[name][0] += paper_count
+    totals[name][1] += citation_sum
+
+  hotspots = [
+    {
+      'keyword': name,
+      'paper_count': paper_count,
+      'avg_citations': citation_sum / paper_count,
+      'hotspot_score': float(citation_sum)
+    }
+    for name, (paper_count, citation_sum) in totals.items()
+    if paper_count >= inputs['min_hotspot_papers']
+  ]
+  hotspots.sort(key=lambda x: x['avg_citations'], reverse=True)
+  return hotspots
+
+
+def _task_pagerank(inputs):
+  G = _citation_graph(inputs)
+  if G.number_of_edges() == 0:
+    return {node: 0 for node in G.nodes()}
+  return nx.pagerank(G)
+
+
+def _task_betweenness(inputs):
+  G = _citation_graph(inputs)
+  if G.number_of_edges() == 0:
+    return {node: 0 for node in G.nodes()}
+
+  samples = inputs['betweenness_samples']
+  k = samples if samples and samples < G.number_of_nodes() else None
+  return nx.betweenness_centrality(G, k=k, seed=42)
+
+
+def _task_clustering(inputs):
+  settings = inputs['clustering']
+  n_nodes, n_edges = len(inputs['papers']), len(inputs['edges'])
+  mode = settings['mode']
+  if mode == 'auto':
+    mode = 'approximate' if n_edges > settings['exact_max_edges'] else 'exact'
+
+  if n_nodes <= 1:
+    return {'density': 0, 'avg_clustering': 0, 'clustering': {'method': mode}}
+
+  density = n_edges / (n_nodes * (n_nodes - 1))
+  if mode != 'approximate':
+    return {
+      'density': density,
+      'avg_clustering': nx.average_clustering(_citation_graph(inputs).to_undirected()),
+      'clustering': {'method': mode}
+    }
+
+  # papers are ordered by id, so positions come straight from searchsorted
+  paper_ids = np.fromiter((paper_id for paper_id, _, _, _ in inputs['papers']), dtype=np.int64, count=n_nodes)
+  edges = np.array(inputs['edges'], dtype=np.int64).reshape(-1, 2)
+  positions = np.searchsorted(paper_ids, edges)
+  estimate, (low, high) = approximate_average_clustering(
+    positions[:, 0], positions[:, 1], n_nodes, settings['samples'], settings['confidence']
+  )
+  return {
+    'density': density,
+    'avg_clustering': estimate,
+    'clustering': {
+      'method': mode,
+      'samples': settings['samples'],
+      'confidence': settings['confidence'],
+      'interval': [low, high]
+    }
+  }
+
+
+def _task_collaboration_network(inputs):
+  papers_by_author = defaultdict(set)
+  authors_by_paper = defaultdict(set)
+  for name, paper_id in inputs['author_papers']:
+    papers_by_author[name].add(paper_id)
+    authors_by_paper[paper_id].add(name)
+
+  authors = [name for name, papers in papers_by_author.items()
+             if len(papers) >= inputs['min_collaboration_papers']]
+
+  pairs = set()
+  for name in authors:
+    for paper_id in papers_by_author[name]:
+      for co_author in authors_by_paper[paper_id]:
+        if co_author != name:
+          pairs.add(tuple(sorted([name, co_author])))
+
+  return {
+    'nodes': [{'id': name, 'type': 'author', 'paper_count': len(papers_by_author[name])}
+              for name in sorted(authors)],
+    'edges': [{'source': source, 'target': target, 'type': 'collaboration'}
+              for source, target in sorted(pairs)]
+  }
+
+
+def _task_keyword_evolution(inputs):
+  period_years = inputs['period_years']
+  periods = defaultdict(lambda: [0, 0])
+  for name, year, paper_count, citation_sum in inputs['keyword_years']:
+    if year is None or year < inputs['start_year']:
+      continue
+    bucket = (year // period_years) * period_years
+    periods[(name, bucket)][0] += paper_count
+    periods[(name, bucket)][1] += citation_sum
+
+  evolutions = {}
+  for (name, bucket), (paper_count, citation_sum) in sorted(periods.items()):
+    evolution = evolutions.setdefault(name, {'keyword': name, 'evolution': [], 'total_papers': 0})
+    evolution['evolution'].append({
+      'period': f'{bucket}-{bucket + period_years - 1}',
+      'paper_count': paper_count,
+      'avg_citations': citation_sum / paper_count if paper_count else 0
+    })
+    evolution['total_papers'] += paper_count
+  return evolutions
+
+
+def _task_temporal_network(inputs):
+  return temporal_network_stats(
+    ((paper_id, year) for paper_id, _, year, _ in inputs['papers']), inputs['edges']
+  )
+
+
+_TASK_FUNCTIONS = {
+  'hotspots': _task_hotspots,
+  'pagerank': _task_pagerank,
+  'betweenness': _task_betweenness,
+  'clustering': _task_clustering,
+  'collaboration_network': _task_collaboration_network,
+  'keyword_evolution': _task_keyword_evolution,
+  'temporal_network': _task_temporal_network
+}
+
+_TASK_INPUTS = {
+  'hotspots': ('keyword_years', 'min_hotspot_papers'),
+  'pagerank': ('papers', 'edges'),
+  'betweenness': ('papers', 'edges', 'betweenness_samples'),
+  'clustering': ('papers', 'edges', 'clustering'),
+  'collaboration_network': ('author_papers', 'min_collaboration_papers'),
+  'keyword_evolution': ('keyword_years', 'period_years', 'start_year'),
+  'temporal_network': ('papers', 'edges')
+}
+
+
+def _run_task(name, inputs):
+  started = time.perf_counter()
+  result = _TASK_FUNCTIONS[name](inputs)
+  return name, result, time.perf_counter() - started
+
+
+def run_batch_analytics(tasks=BATCH_TASKS, workers=None):
+  """Run the batch tasks across a process pool from one load_batch_inputs read.
+
+  Workers receive only the slices of the snapshot their task needs and
+  never touch the database. Returns (inputs, {task: result}, {task: seconds}).
+  """
+  inputs = load_batch_inputs()
+  results = {}
+  timings = {}
+
+  with ProcessPoolExecutor(max_workers=workers) as pool:
+    futures = [
+      pool.submit(_run_task, name, {key: inputs[key] for key in _TASK_INPUTS[name]})
+      for name in tasks
+    ]
+    for future in as_completed(futures):
+      name, result, seconds = future.result()
+      results[name] = result
+      timings[name] = seconds
+
+  return inputs, results, timings
+
+
+def _influential_papers(inputs, results, limit=20):
+  pagerank = results['pagerank']
+  betweenness = results.get('betweenness', {})
+  in_degree = Counter(cited_id for _, cited_id in inputs['edges'])
+  scale = 1 / (len(inputs['papers']) - 1) if len(inputs['papers']) > 1 else 1
+  papers = {paper_id: (title, year, citations) for paper_id, title, year, citations in inputs['papers']}
+
+  influential = []
+  for paper_id, score in sorted(pagerank.items(), key=lambda x: x[1], reverse=True)[:limit]:
+    if paper_id not in papers:
+      continue
+    title, year, citations = papers[paper_id]
+    influential.append({
+      'id': paper_id,
+      'title': title,
+      'year': year,
+      'citation_count': citations,
+      'pagerank_score': score,
+      'betweenness_centrality': betweenness.get(paper_id, 0),
+      'in_degree_centrality': in_degree[paper_id] * scale
+    })
+  return influential
+
+
+def store_batch_snapshots(inputs, results, timings):
+  """Write the endpoint-shaped results into analytics_snapshot.
+
+  keyword_evolution is left out: the endpoint also ranks co-keywords per
+  period, so its result is only written by write_batch_files.
+  """
+  version = inputs['data_version']
+  stored = []
+
+  def duration(*names):
+    return int(sum(timings.get(name, 0) for name in names) * 1000)
+
+  if 'hotspots' in results:
+    stored.append(store_snapshot('research_hotspots', SNAPSHOT_TASKS['research_hotspots'][1],
+                                 {'research_hotspots': results['hotspots'][:current_app.config['ANALYTICS_MAX_LIMIT']]},
+                                 version, duration('hotspots')))
+
+  if {'pagerank', 'betweenness', 'clustering'} <= results.keys():
+    patterns = {
+      'influential_papers': _influential_papers(inputs, results),
+      'network_stats': {
+        'total_papers': len(inputs['papers']),
+        'total_citations': len(inputs['edges']),
+        **results['clustering']
+      }
+    }
+    stored.append(store_snapshot('citation_patterns', {}, patterns, version,
+                                 duration('pagerank', 'betweenness', 'clustering')))
+
+  if 'collaboration_network' in results and \
+      inputs['min_collaboration_papers'] == SNAPSHOT_TASKS['collaboration_network'][1]['min_papers']:
+    stored.append(store_snapshot('collaboration_network', {'min_papers': inputs['min_collaboration_papers']},
+                                 results['collaboration_network'], version,
+                                 duration('collaboration_network')))
+
+  if 'temporal_network' in results:
+    stored.append(store_snapshot('temporal_network', {}, {'temporal_network': results['temporal_network']},
+                                 version, duration('temporal_network')))
+
+  return stored
+
+
+def write_batch_files(output_dir, inputs, results, timings):
+  os.makedirs(output_dir, exist_ok=True)
+  paths = []
+  for name, result in results.items():
+    path = os.path.join(output_dir, f'{name}.json')
+    with open(path, 'w', encoding='utf-8') as f:
+      json.dump({
+        'task': name,
+        'data_version': inputs['data_version'],
+        'seconds': timings[name],
+        'result': result
+      }, f, default=str)
+    paths.append(path)
+  return paths
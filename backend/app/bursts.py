@@ -0,0 +1,257 @@
+from app.models import Paper, Citation, CitationDailyCount, CitationVelocity, StreamCursor
+from app.utils import chunk_list
+from app import db
+from collections import defaultdict
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import case, desc, func
+import math
+import threading
+
+CITATION_STREAM = 'citation_bursts'
+CITATION_BURST_SORTS = ('velocity', 'acceleration', 'burst')
+
+_stream_lock = threading.Lock()
+
+
+def _advance_burst_state(state, cited_at, scale, gamma, min_gap_days):
+  """Feed one citation of a paper into its two-state Kleinberg automaton.
+
+  Inter-arrival gaps are modelled as exponential with the paper's mean rate
+  in the base state and scale times that rate in the burst state; entering
+  the burst state costs gamma * ln(n). Only the two running Viterbi costs
+  are kept, so each citation is an O(1) update and the current state is
+  whichever cost is lower.
+  """
+  if state.citation_count == 0:
+    state.first_cited_at = state.last_cited_at = cited_at
+    state.citation_count = 1
+    state.base_cost = 0.0
+    state.burst_cost = gamma * math.log(2)
+    return
+
+  gap = max((cited_at - state.last_cited_at).total_seconds() / 86400, min_gap_days)
+  elapsed = max((cited_at - state.first_cited_at).total_seconds() / 86400, gap)
+  base_rate = state.citation_count / elapsed
+  burst_rate = scale * base_rate
+  enter_cost = gamma * math.log(state.citation_count + 1)
+
+  base = min(state.base_cost, state.burst_cost) + base_rate * gap - math.log(base_rate)
+  burst = min(state.base_cost + enter_cost, state.burst_cost) + burst_rate * gap - math.log(burst_rate)
+  floor = min(base, burst)
+  state.base_cost = base - floor
+  state.burst_cost = burst - floor
+  state.citation_count += 1
+  state.first_cited_at = min(state.first_cited_at, cited_at)
+  state.last_cited_at = max(state.last_cited_at, cited_at)
+
+  if burst < base:
+    if not state.in_burst:
+      state.in_burst = True
+      state.burst_started_at = cited_at
+      state.burst_citations = 0
+    state.burst_citations += 1
+  else:
+    state.in_burst = False
+    state.burst_citations = 0
+
+
+def _add_daily_count(connection, paper_id, day, count):
+  table = CitationDailyCount.__table__
+  result = connection.execute(
+    table.update()
+    .where(table.c.paper_id == paper_id, table.c.day == day)
+    .values(citation_count=table.c.citation_count + count)
+  )
+  if result.rowcount == 0:
+    connection.execute(table.insert().values(paper_id=paper_id, day=day, citation_count=count))
+
+
+def _skipped_ids(start, ids, limit):
+  """Ids in (start, ids[-1]) missing from the ascending ids, at most the last limit."""
+  skipped = []
+  previous = start
+  for item_id in ids:
+    if item_id > previous + 1:
+      skipped.extend(range(max(previous + 1, item_id - limit), item_id))
+    previous = item_id
+  return skipped[-limit:]
+
+
+def process_new_citations(batch_size=None):
+  """Stream citations added since the last pass into velocity and burst state.
+
+  The pass reads citations in id order above the `citation_bursts` cursor,
+  one batch per transaction. Ids are assigned at insert but become visible
+  at commit, so ids the cursor moves past without seeing are kept in its
+  pending list and looked up again on every pass for
+  CITATION_STREAM_GAP_TIMEOUT seconds. The cursor is advanced with a
+  compare-and-set in the same transaction, so a batch that another process
+  already applied is rolled back instead of being counted twice. Deleted
+  citations are not subtracted; reset_citation_stream rebuilds everything
+  from scratch.
+  """
+  config = current_app.config
+  batch_size = batch_size or config['CITATION_STREAM_BATCH_SIZE']
+  max_gaps = config['CITATION_STREAM_MAX_GAPS']
+  scale = config['CITATION_BURST_SCALE']
+  gamma = config['CITATION_BURST_GAMMA']
+  min_gap_days = config['CITATION_BURST_MIN_GAP_SECONDS'] / 86400
+  processed = 0
+  recheck = True
+
+  with _stream_lock:
+    while True:
+      cursor = db.session.get(StreamCursor, CITATION_STREAM)
+      if cursor is None:
+        cursor = StreamCursor(name=CITATION_STREAM, position=0, pending=[])
+        db.session.add(cursor)
+        db.session.flush()
+      start, last_update = cursor.position, cursor.updated_at
+
+      now = datetime.utcnow()
+      expires = now.timestamp() - config['CITATION_STREAM_GAP_TIMEOUT']
+      pending = {item_id: since for item_id, since in cursor.pending or [] if since > expires}
+
+      rows = db.session.query(Citation.id, Citation.cited_paper_id, Citation.created_at)\
+        .filter(Citation.id > start).order_by(Citation.id).limit(batch_size).all()
+      late = []
+      if recheck and pending:
+        for chunk in chunk_list(list(pending), 500):
+          late.extend(db.session.query(Citation.id, Citation.cited_paper_id, Citation.created_at)
+                      .filter(Citation.id.in_(chunk)).all())
+      recheck = False
+      if not rows and not late:
+        db.session.commit()
+        break
+
+      events = defaultdict(list)
+      daily = defaultdict(int)
+      for _, paper_id, created_at in sorted(late + rows, key=lambda row: row[2] or now):
+        created_at = created_at or now
+        events[paper_id].append(created_at)
+        daily[(paper_id, created_at.date())] += 1
+
+      states = {}
+      for chunk in chunk_list(list(events), 500):
+        for state in CitationVelocity.query.filter(CitationVelocity.paper_id.in_(chunk)):
+          states[state.paper_id] = state
+
+      for paper_id, cited_at in events.items():
+        state = states.get(paper_id)
+        if state is None:
+          state = CitationVelocity(paper_id=paper_id, citation_count=0, base_cost=0.0,
+                                   burst_cost=0.0, in_burst=False, burst_citations=0)
+          db.session.add(state)
+        for timestamp in cited_at:
+          _advance_burst_state(state, timestamp, scale, gamma, min_gap_days)
+
+      connection = db.session.connection()
+      for (paper_id, day), count in daily.items():
+        _add_daily_count(connection, paper_id, day, count)
+
+      for item_id, _, _ in late:
+        pending.pop(item_id, None)
+      for item_id in _skipped_ids(start, [row[0] for row in rows], max_gaps):
+        pending[item_id] = now.timestamp()
+      pending = sorted(pending.items())[-max_gaps:]
+
+      end = rows[-1][0] if rows else start
+      table = StreamCursor.__table__
+      moved = db.session.execute(
+        table.update()
+        .where(table.c.name == CITATION_STREAM, table.c.position == start,
+               table.c.updated_at == last_update)
+        .values(position=end, pending=[list(gap) for gap in pending], updated_at=now)
+      )
+      if moved.rowcount != 1:
+        db.session.rollback()
+        break
+
+      db.session.commit()
+      db.session.expire(cursor)
+      processed += len(rows) + len(late)
+      if len(rows) < batch_size:
+        break
+
+  return processed
+
+
+def reset_citation_stream():
+  CitationDailyCount.query.delete()
+  CitationVelocity.query.delete()
+  StreamCursor.query.filter_by(name=CITATION_STREAM).delete()
+  db.session.commit()
+
+
+def get_rising_papers(k=10, window_days=None, sort_by='velocity'):
+  """Top-k rising papers over the last window_days.
+
+  velocity ranks by citations in the window, acceleration by the smoothed
+  ratio against the window before it, and burst keeps only papers whose
+  automaton is in the burst state and that were cited within the window.
+  """
+  window_days = min(
+    window_days or current_app.config['CITATION_VELOCITY_WINDOW_DAYS'],
+    current_app.config['CITATION_VELOCITY_MAX_WINDOW_DAYS']
+  )
+  now = datetime.utcnow()
+  recent_start = now.date() - timedelta(days=window_days - 1)
+  previous_start = recent_start - timedelta(days=window_days)
+  active_since = now - timedelta(days=window_days)
+
+  recent = func.sum(case((CitationDailyCount.day >= recent_start, CitationDailyCount.citation_count), else_=0))
+  previous = func.sum(case((CitationDailyCount.day < recent_start, CitationDailyCount.citation_count), else_=0))
+  acceleration = (recent + 1) * 1.0 / (previous + 1)
+
+  query = db.session.query(CitationDailyCount.paper_id, recent.label('recent'), previous.label('previous'))\
+    .filter(CitationDailyCount.day >= previous_start)\
+    .group_by(CitationDailyCount.paper_id)\
+    .having(recent > 0)
+
+  if sort_by == 'burst':
+    query = query.join(CitationVelocity, CitationVelocity.paper_id == CitationDailyCount.paper_id)\
+      .filter(CitationVelocity.in_burst.is_(True), CitationVelocity.last_cited_at >= active_since)\
+      .group_by(CitationVelocity.burst_citations)\
+      .order_by(desc(CitationVelocity.burst_citations), desc('recent'))
+  elif sort_by == 'acceleration':
+    query = query.order_by(desc(acceleration), desc('recent'))
+  else:
+    query = query.order_by(desc('recent'))
+
+  top = query.order_by(CitationDailyCount.paper_id).limit(k).all()
+  if not top:
+    return []
+
+  details = {
+    paper_id: (title, year, citation_count, in_burst, last_cited_at, burst_started_at, burst_citations)
+    for paper_id, title, year, citation_count, in_burst, last_cited_at, burst_started_at, burst_citations
+    in db.session.query(
+      Paper.id, Paper.title, Paper.year, Paper.citation_count,
+      CitationVelocity.in_burst, CitationVelocity.last_cited_at,
+      CitationVelocity.burst_started_at, CitationVelocity.burst_citations
+    ).outerjoin(CitationVelocity, CitationVelocity.paper_id == Paper.id)
+     .filter(Paper.id.in_([paper_id for paper_id, _, _ in top]))
+  }
+
+  results = []
+  for paper_id, recent_count, previous_count in top:
+    if paper_id not in details:
+      continue
+    title, year, citation_count, in_burst, last_cited_at, burst_started_at, burst_citations = details[paper_id]
+    active = bool(in_burst) and last_cited_at is not None and last_cited_at >= active_since
+    results.append({
+      'paper_id': paper_id,
+      'title': title,
+      'year': year,
+      'citation_count': citation_count,
+      'window_citations': recent_count,
+      'previous_window_citations': previous_count,
+      'velocity_per_day': recent_count / window_days,
+      'velocity_per_week': recent_count * 7 / window_days,
+      'acceleration': (recent_count + 1) / (previous_count + 1),
+      'in_burst': active,
+      'burst_started_at': burst_started_at.isoformat() if active and burst_started_at else None,
+      'burst_citations': burst_citations if active else 0
+    })
+  return results
@@ -0,0 +1,491 @@
+from app.models import Paper, Author, Keyword, Citation, ChangeLog
+from app import cache
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from flask import current_app, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session, attributes
+import hashlib
+import threading
+import time
+import uuid
+
+# Collection tags: listings and aggregates are dropped only by writes that
+# touch something they read. Inserting or deleting a paper drops them all, a
+# citation write drops CITATION_TAGS and a paper update drops 'papers' plus
+# the tags of its changed fields. Views embedding whole Paper.to_dict()
+# payloads, which carry the citation counts and updated_at, also carry
+# 'papers'.
+WRITE_TAGS = ('papers', 'authors', 'keywords', 'citations', 'graph', 'analytics', 'trends', 'statistics')
+CITATION_TAGS = ('papers', 'citations', 'graph', 'analytics', 'statistics')
+PAPER_FIELD_TAGS = {
+  'title': ('citations', 'graph'),
+  'year': ('graph', 'analytics', 'trends', 'statistics'),
+  'citation_count': ('authors', 'keywords', 'graph', 'analytics', 'trends', 'statistics'),
+  'authors': ('authors', 'graph', 'analytics', 'trends', 'statistics'),
+  'keywords': ('keywords', 'graph', 'analytics', 'trends', 'statistics')
+}
+
+_TAG_EPOCH_KEY = 'cache_tags:epoch'
+_COMPARE_AND_DELETE = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+_SWR_PREFIX = 'swr/'
+
+
+def _tag_key(tag):
+  return f'cache_tags:{tag}'
+
+
+def _stale_key(key):
+  return f'stale:{key}'
+
+
+def _seconds(value):
+  """Timeouts may be given as seconds or as the name of a config value."""
+  return current_app.config[value] if isinstance(value, str) else value
+
+
+class TagIndex:
+  """Maps cache tags to the keys stored under them.
+
+  With Redis each tag is a set next to the entries (SADD on store, SMEMBERS
+  and DEL on invalidation), so every worker shares it. Other backends keep
+  the set as an ordinary cache value updated under a process lock, which is
+  exact for SimpleCache since that cache is process-local anyway.
+  """
+
+  def __init__(self):
+    self._lock = threading.Lock()
+
+  @staticmethod
+  def _redis():
+    return getattr(cache.cache, '_write_client', None)
+
+  @staticmethod
+  def _tag_timeout(timeout):
+    return max(timeout or 0, current_app.config['CACHE_TAGGED_TIMEOUT'])
+
+  def add(self, key, tags, timeout=None):
+    if not tags:
+      return
+    ttl = self._tag_timeout(timeout)
+    client = self._redis()
+
+    if client is not None:
+      prefix = cache.cache.key_prefix
+      pipe = client.pipeline()
+      for tag in tags:
+        pipe.sadd(prefix + _tag_key(tag), key)
+        pipe.expire(prefix + _tag_key(tag), ttl)
+      pipe.execute()
+      return
+
+    with self._lock:
+      for tag in tags:
+        keys = cache.get(_tag_key(tag)) or set()
+        keys.add(key)
+        cache.set(_tag_key(tag), keys, timeout=ttl)
+
+  @staticmethod
+  def _drop(keys):
+    # stale-while-revalidate entries are only marked, so they can still be
+    # served while a background refresh replaces them
+    stale = [key for key in keys if key.startswith(_SWR_PREFIX)]
+    if stale:
+      cache.set_many({_stale_key(key): True for key in stale},
+                     timeout=current_app.config['CACHE_TAGGED_TIMEOUT'])
+    fresh = [key for key in keys if not key.startswith(_SWR_PREFIX)]
+    if fresh:
+      cache.delete_many(*fresh)
+
+  def invalidate(self, tags):
+    """Drop every entry stored under any of tags; returns the key count."""
+    tags = set(tags)
+    if not tags:
+      return 0
+    client = self._redis()
+
+    if client is not None:
+      prefix = cache.cache.key_prefix
+      names = [prefix + _tag_key(tag) for tag in tags]
+      pipe = client.pipeline()
+      for name in names:
+        pipe.smembers(name)
+      keys = set()
+      for members in pipe.execute():
+        keys.update(member.decode() if isinstance(member, bytes) else member for member in members)
+      self._drop(keys)
+      client.delete(*names)
+    else:
+      with self._lock:
+        keys = set()
+        for members in cache.get_many(*[_tag_key(tag) for tag in tags]):
+          keys.update(members or ())
+        self._drop(keys)
+        cache.delete_many(*[_tag_key(tag) for tag in tags])
+
+    # entries computed before this point must not be stored afterwards
+    cache.cache.inc(_TAG_EPOCH_KEY)
+    return len(keys)
+
+
+tag_index = TagIndex()
+
+
+class SingleFlight:
+  """Lets one caller recompute a missing cache entry while the rest wait.
+
+  Callers in the same process wait on an event held by the leader. With
+  Redis the leader also takes a SET NX lock, so leaders in other workers
+  poll the cache for its result instead of recomputing. Followers that are
+  still waiting after CACHE_SINGLE_FLIGHT_TIMEOUT, or that find nothing in
+  the cache once the leader finished (an error response, a failure or an
+  invalidation), compute the value themselves.
+  """
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._flights = {}
+
+  def do(self, key, load, compute):
+    """Return load() if it has a value, otherwise compute() once per key."""
+    timeout = current_app.config['CACHE_SINGLE_FLIGHT_TIMEOUT']
+    with self._lock:
+      done = self._flights.get(key)
+      leader = done is None
+      if leader:
+        done = self._flights[key] = threading.Event()
+
+    if not leader:
+      done.wait(timeout)
+      value = load()
+      return value if value is not None else compute()
+
+    try:
+      return self._lead(key, load, compute, timeout)
+    finally:
+      with self._lock:
+        self._flights.pop(key, None)
+      done.set()
+
+  def _lead(self, key, load, compute, timeout):
+    client = getattr(cache.cache, '_write_client', None)
+    if client is None:
+      value = load()
+      return value if value is not None else compute()
+
+    lock_key = f'{cache.cache.key_prefix}single_flight:{key}'
+    token = uuid.uuid4().hex
+    if not client.set(lock_key, token, nx=True, px=int(timeout * 1000)):
+      deadline = time.monotonic() + timeout
+      poll = current_app.config['CACHE_SINGLE_FLIGHT_POLL']
+      while time.monotonic() < deadline and client.exists(lock_key):
+        time.sleep(poll)
+        value = load()
+        if value is not None:
+          return value
+      value = load()
+      return value if value is not None else compute()
+
+    try:
+      value = load()
+      return value if value is not None else compute()
+    finally:
+      # compare-and-delete so an expired lock now held by another worker survives
+      client.eval(_COMPARE_AND_DELETE, 1, lock_key, token)
+
+
+single_flight = SingleFlight()
+
+
+class Revalidator:
+  """Refreshes stale-while-revalidate entries on a small thread pool.
+
+  A key is refreshed at most once at a time per process, and with Redis a
+  short SET NX claim keeps other workers from refreshing it as well. The
+  view runs again inside a request context rebuilt from the original path
+  and query string.
+  """
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._refreshing = set()
+    self._executor = None
+
+  def submit(self, key, compute):
+    app = current_app._get_current_object()
+    with self._lock:
+      if key in self._refreshing:
+        return False
+      client = getattr(cache.cache, '_write_client', None)
+      claim = (f'{cache.cache.key_prefix}revalidate:{key}', uuid.uuid4().hex) if client is not None else None
+      if claim is not None and not client.set(*claim, nx=True,
+                                              px=int(app.config['CACHE_SINGLE_FLIGHT_TIMEOUT'] * 1000)):
+        return False
+      self._refreshing.add(key)
+      if self._executor is None:
+        self._executor = ThreadPoolExecutor(max_workers=app.config['CACHE_REVALIDATE_WORKERS'],
+                                            thread_name_prefix='cache-revalidate')
+
+    self._executor.submit(self._refresh, app, key, request.path, request.query_string.decode(), compute,
+                          client, claim)
+    return True
+
+  def _refresh(self, app, key, path, query_string, compute, client=None, claim=None):
+    try:
+      with app.test_request_context(path, query_string=query_string):
+        compute()
+    except Exception as e:
+      app.logger.warning(f'Background refresh of {key} failed: {e}')
+    finally:
+      with self._lock:
+        self._refreshing.discard(key)
+      if claim is not None:
+        # release the claim at once so the next stale hit in any worker can
+        # refresh again; compare-and-delete leaves a newer worker's claim alone
+        try:
+          client.eval(_COMPARE_AND_DELETE, 1, *claim)
+        except Exception as e:
+          app.logger.warning(f'Releasing the refresh claim on {key} failed: {e}')
+
+
+revalidator = Revalidator()
+
+
+def view_cache_key(query_string=False, prefix='view/'):
+  key = f'{prefix}{request.path}'
+  if query_string:
+    args = tuple(sorted(request.args.items(multi=True)))
+    key += '?' + hashlib.md5(str(args).encode()).hexdigest()
+  return key
+
+
+def _freeze(response):
+  # plain bytes and header pairs, so one cached value can be shared by
+  # concurrent requests (the two-tier cache hands out the same object)
+  return response.get_data(), response.status_code, list(response.headers.items())
+
+
+def _thaw(frozen):
+  if frozen is None:
+    return None
+  body, status, headers = frozen
+  return current_app.response_class(body, status=status, headers=headers)
+
+
+def _entry_response(entry):
+  return _thaw(entry[1]) if entry is not None else None
+
+
+def cached(timeout=None, query_string=False, tags=(), stale_after=None):
+  """Like cache.cached, but registers the response under tags.
+
+  Tags are format strings filled from the view arguments, e.g.
+  'paper:{paper_id}', and are dropped by invalidate_tags when a commit
+  touches them. Only 200 responses are stored, and a response that was
+  computed while an invalidation ran is returned but not cached.
+  Concurrent misses for one key are coalesced through single_flight.
+
+  With stale_after the entry turns stale after that many seconds (or on
+  invalidation) but is kept until timeout; stale hits are answered from
+  the cache while revalidator recomputes the entry in the background.
+  Both timeouts may name a config value instead of giving seconds.
+  """
+  def decorator(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+      swr = stale_after is not None
+      key = view_cache_key(query_string, _SWR_PREFIX if swr else 'view/')
+
+      def compute():
+        epoch = cache.get(_TAG_EPOCH_KEY)
+        response = current_app.make_response(f(*args, **kwargs))
+        if response.status_code == 200 and cache.get(_TAG_EPOCH_KEY) == epoch:
+          entry_timeout = _seconds(timeout) or current_app.config['CACHE_TAGGED_TIMEOUT']
+          tag_index.add(key, [tag.format(**kwargs) for tag in tags], entry_timeout)
+          if swr:
+            cache.set(key, (time.time() + _seconds(stale_after), _freeze(response)), timeout=entry_timeout)
+            cache.delete(_stale_key(key))
+          else:
+            cache.set(key, _freeze(response), timeout=entry_timeout)
+        return response
+
+      if not swr:
+        response = _thaw(cache.get(key))
+        if response is not None:
+          return response
+        return single_flight.do(key, lambda: _thaw(cache.get(key)), compute)
+
+      entry, stale = cache.get_many(key, _stale_key(key))
+      if entry is not None:
+        fresh_until, frozen = entry
+        if stale or time.time() >= fresh_until:
+          revalidator.submit(key, compute)
+        return _thaw(frozen)
+      return single_flight.do(key, lambda: _entry_response(cache.get(key)), compute)
+    return decorated
+  return decorator
+
+
+def http_last_modified(changed_at):
+  """changed_at as a Last-Modified date, or None while its second is not over.
+
+  HTTP dates drop sub-second precision, so a later write in the same second
+  would carry the same date and be answered with a wrong 304.
+  """
+  if changed_at is None:
+    return None
+  last_modified = changed_at.replace(tzinfo=timezone.utc, microsecond=0)
+  if last_modified + timedelta(seconds=1) > datetime.now(timezone.utc):
+    return None
+  return last_modified
+
+
+def is_not_modified(etag, last_modified=None):
+  """Whether the request's validators already match this representation."""
+  if request.if_none_match:
+    return request.if_none_match.contains_weak(etag)
+  last_modified = http_last_modified(last_modified)
+  if request.if_modified_since and last_modified:
+    return last_modified <= request.if_modified_since
+  return False
+
+
+def conditional(validators):
+  """Answer conditional GETs from version lookups, before the view runs.
+
+  validators(**view_args) returns (etag, last_modified) and should only
+  read the change log, or None when there is nothing to validate (e.g. an
+  unknown id), in which case the view answers as usual. A client that
+  already holds that version gets a bodiless 304; otherwise both validators
+  are attached to a 200 response. If-None-Match: * only matches a
+  representation that exists, so the view runs first and only its 200 is
+  turned into a 304.
+  """
+  def decorator(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+      current = validators(**kwargs)
+      if current is None:
+        return f(*args, **kwargs)
+
+      etag, last_modified = current
+      star = request.if_none_match.star_tag
+      if not star and is_not_modified(etag, last_modified):
+        response = current_app.response_class(status=304)
+      else:
+        response = current_app.make_response(f(*args, **kwargs))
+        if response.status_code != 200:
+          return response
+        if star:
+          response = current_app.response_class(status=304)
+
+      response.set_etag(etag)
+      last_modified = http_last_modified(last_modified)
+      if last_modified:
+        response.last_modified = last_modified
+      return response
+    return decorated
+  return decorator
+
+
+def invalidate_tags(tags):
+  return tag_index.invalidate(tags)
+
+
+def invalidate_all():
+  cache.clear()
+
+
+def _entity_tags(paper):
+  """paper:, author: and keyword: tags of every page embedding the paper."""
+  tags = set()
+  if paper.id is not None:
+    tags.add(f'paper:{paper.id}')
+  tags.update(f'author:{author.id}' for author in paper.authors if author.id is not None)
+  tags.update(f'keyword:{keyword.id}' for keyword in paper.keywords if keyword.id is not None)
+  return tags
+
+
+def _paper_tags(session, paper, changed=None, deleted=False):
+  if changed is None:
+    tags = set(WRITE_TAGS)
+  else:
+    tags = {'papers'}.union(*(PAPER_FIELD_TAGS.get(key, ()) for key in changed))
+  tags.update(_entity_tags(paper))
+  if deleted:
+    # the cascade removes its citations, which changes the neighbours' counts
+    for citation in list(paper.cited_papers) + list(paper.citing_papers):
+      tags.update(_citation_tags(session, citation))
+  return tags
+
+
+def _citation_tags(session, citation):
+  tags = set(CITATION_TAGS)
+  for paper_id in (citation.citing_paper_id, citation.cited_paper_id):
+    paper = session.get(Paper, paper_id) if paper_id is not None else None
+    if paper is not None:
+      tags.update(_entity_tags(paper))
+  return tags
+
+
+def _changed_keys(paper):
+  return [key for key in Paper.__mapper__.attrs.keys()
+          if attributes.get_history(paper, key, passive=attributes.PASSIVE_NO_INITIALIZE).has_changes()]
+
+
+@event.listens_for(Session, 'before_flush')
+def capture_cache_tags(session, flush_context, instances):
+  with session.no_autoflush:
+    _capture_cache_tags(session, session.info.setdefault('cache_tags', set()))
+
+
+def _capture_cache_tags(session, tags):
+  for obj in session.new:
+    if isinstance(obj, Paper):
+      tags.update(_paper_tags(session, obj))
+    elif isinstance(obj, Citation):
+      tags.update(_citation_tags(session, obj))
+    elif isinstance(obj, Author):
+      tags.add('authors')
+    elif isinstance(obj, Keyword):
+      tags.add('keywords')
+    elif isinstance(obj, ChangeLog) and obj.entity_type == 'database':
+      session.info['cache_reset'] = True
+
+  for obj in session.dirty:
+    if isinstance(obj, Paper) and session.is_modified(obj):
+      tags.update(_paper_tags(session, obj, changed=_changed_keys(obj)))
+
+  for obj in session.deleted:
+    if isinstance(obj, Paper):
+      tags.update(_paper_tags(session, obj, deleted=True))
+    elif isinstance(obj, Citation):
+      tags.update(_citation_tags(session, obj))
+    elif isinstance(obj, Author):
+      tags.update(('authors', f'author:{obj.id}'))
+    elif isinstance(obj, Keyword):
+      tags.update(('keywords', f'keyword:{obj.id}'))
+
+
+@event.listens_for(Session, 'after_commit')
+def apply_cache_invalidation(session):
+  tags = session.info.pop('cache_tags', None)
+  reset = session.info.pop('cache_reset', False)
+  if not has_app_context() or not (tags or reset):
+    return
+
+  # the write is already committed; a cache outage must not turn it into an error
+  try:
+    if reset:
+      invalidate_all()
+    else:
+      invalidate_tags(tags)
+  except Exception as e:
+    current_app.logger.warning(f'Cache invalidation failed for {sorted(tags or ())}: {e}')
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_cache_tags(session):
+  session.info.pop('cache_tags', None)
+  session.info.pop('cache_reset', None)
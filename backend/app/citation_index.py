@@ -0,0 +1,352 @@
+from app.models import Citation
+from app import db
+from sqlalchemy import func
+from flask import current_app
+import numpy as np
+import random
+import threading
+import time
+
+
+def _build_csr(sources, targets, n):
+  order = np.argsort(sources, kind='stable')
+  indptr = np.zeros(n + 1, dtype=np.int64)
+  np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+  return indptr.tolist(), targets[order].tolist()
+
+
+def _strongly_connected_components(n, indptr, indices):
+  # Iterative Tarjan. Components come out in reverse topological order,
+  # so every edge of the condensation goes from a higher to a lower id.
+  index = [-1] * n
+  low = [0] * n
+  on_stack = [False] * n
+  comp = [-1] * n
+  stack = []
+  counter = 0
+  n_comps = 0
+
+  for root in range(n):
+    if index[root] != -1:
+      continue
+
+    index[root] = low[root] = counter
+    counter += 1
+    stack.append(root)
+    on_stack[root] = True
+    work = [(root, indptr[root])]
+
+    while work:
+      v, pos = work[-1]
+      if pos < indptr[v + 1]:
+        w = indices[pos]
+        work[-1] = (v, pos + 1)
+        if index[w] == -1:
+          index[w] = low[w] = counter
+          counter += 1
+          stack.append(w)
+          on_stack[w] = True
+          work.append((w, indptr[w]))
+        elif on_stack[w] and index[w] < low[v]:
+          low[v] = index[w]
+      else:
+        work.pop()
+        if work:
+          parent = work[-1][0]
+          if low[v] < low[parent]:
+            low[parent] = low[v]
+        if low[v] == index[v]:
+          while True:
+            w = stack.pop()
+            on_stack[w] = False
+            comp[w] = n_comps
+            if w == v:
+              break
+          n_comps += 1
+
+  return comp, n_comps
+
+
+class CitationIndex:
+  """In-process citation adjacency with a reachability index.
+
+  Edges point from the citing paper to the cited paper, so the ancestors of
+  a paper are the works it transitively builds on and its descendants are
+  the works that transitively build on it. Cycles are collapsed into
+  strongly connected components; the resulting DAG carries topological
+  heights and GRAIL-style interval labels that rule out most unreachable
+  pairs in O(k) before any traversal is attempted.
+  """
+
+  def __init__(self, citing_ids, cited_ids, traversals=2, seed=42):
+    citing = np.asarray(citing_ids, dtype=np.int64)
+    cited = np.asarray(cited_ids, dtype=np.int64)
+
+    self.paper_ids, inverse = np.unique(np.concatenate([citing, cited]), return_inverse=True)
+    self.position = {int(pid): i for i, pid in enumerate(self.paper_ids.tolist())}
+    n = len(self.paper_ids)
+    sources = inverse[:len(citing)]
+    targets = inverse[len(citing):]
+
+    self.n_nodes = n
+    self.n_edges = len(citing)
+    self.out_indptr, self.out_indices = _build_csr(sources, targets, n)
+    self.in_indptr, self.in_indices = _build_csr(targets, sources, n)
+
+    comp, n_comps = _strongly_connected_components(n, self.out_indptr, self.out_indices)
+    self.comp = comp
+    self.n_comps = n_comps
+    comp_arr = np.asarray(comp, dtype=np.int64)
+    self.comp_size = np.bincount(comp_arr, minlength=n_comps).tolist()
+
+    c_src = comp_arr[sources]
+    c_dst = comp_arr[targets]
+    keep = c_src != c_dst
+    pairs = np.unique(c_src[keep] * max(n_comps, 1) + c_dst[keep])
+    c_src = pairs // max(n_comps, 1)
+    c_dst = pairs % max(n_comps, 1)
+    self.c_out_indptr, self.c_out_indices = _build_csr(c_src, c_dst, n_comps)
+    self.c_in_indptr, self.c_in_indices = _build_csr(c_dst, c_src, n_comps)
+
+    self._compute_heights()
+    self._compute_intervals(traversals, seed)
+
+    self._count_cache = {}
+
+  def _compute_heights(self):
+    # Successors always have smaller component ids, so a single ascending
+    # sweep sees every successor before its predecessors.
+    height = [0] * self.n_comps
+    indptr, indices = self.c_out_indptr, self.c_out_indices
+    for c in range(self.n_comps):
+      best = -1
+      for pos in range(indptr[c], indptr[c + 1]):
+        h = height[indices[pos]]
+        if h > best:
+          best = h
+      height[c] = best + 1
+    self.height = height
+
+  def _compute_intervals(self, traversals, seed):
+    rng = random.Random(seed)
+    indptr, indices = self.c_out_indptr, self.c_out_indices
+    roots = [c for c in range(self.n_comps) if self.c_in_indptr[c] == self.c_in_indptr[c + 1]]
+    self.intervals = []
+
+    for t in range(traversals):
+      rng.shuffle(roots)
+      reverse = t % 2 == 1
+      rank = [-1] * self.n_comps
+      low = [0] * self.n_comps
+      counter = 0
+
+      for root in roots:
+        if rank[root] != -1:
+          continue
+        rank[root] = -2
+        work = [(root, 0)]
+        while work:
+          c, offset = work[-1]
+          start, end = indptr[c], indptr[c + 1]
+          if offset < end - start:
+            work[-1] = (c, offset + 1)
+            child = indices[end - 1 - offset] if reverse else indices[start + offset]
+            if rank[child] == -1:
+              rank[child] = -2
+              work.append((child, 0))
+          else:
+            work.pop()
+            rank[c] = counter
+            best = counter
+            for pos in range(start, end):
+              if low[indices[pos]] < best:
+                best = low[indices[pos]]
+            low[c] = best
+            counter += 1
+
+      self.intervals.append((low, rank))
+
+  def _may_reach(self, cu, cv):
+    if cu == cv:
+      return True
+    if self.height[cu] <= self.height[cv]:
+      return False
+    for low, rank in self.intervals:
+      if low[cv] < low[cu] or rank[cv] > rank[cu]:
+        return False
+    return True
+
+  def _comp_reaches(self, cu, cv):
+    if cu == cv:
+      return True
+    if not self._may_reach(cu, cv):
+      return False
+
+    indptr, indices = self.c_out_indptr, self.c_out_indices
+    seen = {cu}
+    stack = [cu]
+    while stack:
+      c = stack.pop()
+      for pos in range(indptr[c], indptr[c + 1]):
+        s = indices[pos]
+        if s == cv:
+          return True
+        if s not in seen and self._may_reach(s, cv):
+          seen.add(s)
+          stack.append(s)
+    return False
+
+  def reaches(self, source_id, target_id):
+    u = self.position.get(source_id)
+    v = self.position.get(target_id)
+    if u is None or v is None:
+      return source_id == target_id
+    return self._comp_reaches(self.comp[u], self.comp[v])
+
+  def shortest_path(self, source_id, target_id):
+    if source_id == target_id:
+      return [source_id]
+
+    u = self.position.get(source_id)
+    v = self.position.get(target_id)
+    if u is None or v is None or not self.reaches(source_id, target_id):
+      return None
+
+    comp = self.comp
+    cu, cv = comp[u], comp[v]
+    forward_parent = {u: None}
+    backward_parent = {v: None}
+    forward = [u]
+    backward = [v]
+
+    while forward and backward:
+      # Expand the smaller frontier; prune nodes the labels say cannot lie
+      # on a path between the endpoints.
+      if len(forward) <= len(backward):
+        next_frontier = []
+        for x in forward:
+          for pos in range(self.out_indptr[x], self.out_indptr[x + 1]):
+            y = self.out_indices[pos]
+            if y in forward_parent or not self._may_reach(comp[y], cv):
+              continue
+            forward_parent[y] = x
+            if y in backward_parent:
+              return self._join_path(forward_parent, backward_parent, y)
+            next_frontier.append(y)
+        forward = next_frontier
+      else:
+        next_frontier = []
+        for x in backward:
+          for pos in range(self.in_indptr[x], self.in_indptr[x + 1]):
+            y = self.in_indices[pos]
+            if y in backward_parent or not self._may_reach(cu, comp[y]):
+              continue
+            backward_parent[y] = x
+            if y in forward_parent:
+              return self._join_path(forward_parent, backward_parent, y)
+            next_frontier.append(y)
+        backward = next_frontier
+
+    return None
+
+  def _join_path(self, forward_parent, backward_parent, meet):
+    path = []
+    node = meet
+    while node is not None:
+      path.append(node)
+      node = forward_parent[node]
+    path.reverse()
+    node = backward_parent[meet]
+    while node is not None:
+      path.append(node)
+      node = backward_parent[node]
+    return [int(self.paper_ids[i]) for i in path]
+
+  def _count_reachable(self, c, indptr, indices):
+    seen = {c}
+    stack = [c]
+    total = self.comp_size[c] - 1
+    while stack:
+      x = stack.pop()
+      for pos in range(indptr[x], indptr[x + 1]):
+        s = indices[pos]
+        if s not in seen:
+          seen.add(s)
+          total += self.comp_size[s]
+          stack.append(s)
+    return total
+
+  def lineage_counts(self, paper_id):
+    u = self.position.get(paper_id)
+    if u is None:
+      return {'ancestors': 0, 'descendants': 0}
+
+    c = self.comp[u]
+    if c not in self._count_cache:
+      if len(self._count_cache) >= current_app.config['CITATION_INDEX_CACHE_SIZE']:
+        self._count_cache.clear()
+      self._count_cache[c] = {
+        'ancestors': self._count_reachable(c, self.c_out_indptr, self.c_out_indices),
+        'descendants': self._count_reachable(c, self.c_in_indptr, self.c_in_indices)
+      }
+    return self._count_cache[c]
+
+  def stats(self):
+    return {
+      'nodes': self.n_nodes,
+      'edges': self.n_edges,
+      'components': self.n_comps,
+      'max_height': max(self.height) if self.height else 0
+    }
+
+
+_index = None
+_index_signature = None
+_index_checked_at = 0.0
+_index_lock = threading.Lock()
+
+
+def _citation_signature():
+  return tuple(db.session.query(func.count(Citation.id), func.max(Citation.id)).one())
+
+
+def _load_index():
+  citing_ids = []
+  cited_ids = []
+  rows = db.session.query(Citation.citing_paper_id, Citation.cited_paper_id)\
+    .execution_options(yield_per=50000)
+  for citing_id, cited_id in rows:
+    citing_ids.append(citing_id)
+    cited_ids.append(cited_id)
+
+  return CitationIndex(citing_ids, cited_ids,
+                       traversals=current_app.config['CITATION_INDEX_TRAVERSALS'])
+
+
+def get_citation_index():
+  global _index, _index_signature, _index_checked_at
+
+  refresh = current_app.config['CITATION_INDEX_REFRESH_SECONDS']
+  if _index is not None and time.monotonic() - _index_checked_at < refresh:
+    return _index
+
+  with _index_lock:
+    if _index is not None and time.monotonic() - _index_checked_at < refresh:
+      return _index
+
+    signature = _citation_signature()
+    if _index is None or signature != _index_signature:
+      started = time.monotonic()
+      _index = _load_index()
+      _index_signature = signature
+      current_app.logger.info(
+        f'Citation index built: {_index.n_nodes} papers, {_index.n_edges} citations '
+        f'in {time.monotonic() - started:.2f}s'
+      )
+    _index_checked_at = time.monotonic()
+    return _index
+
+
+def invalidate_citation_index():
+  global _index_checked_at
+  _index_checked_at = 0.0
@@ -0,0 +1,173 @@
+from app.models import Paper, Author, Keyword, Citation, paper_authors, paper_keywords
+from app.citation_index import get_citation_index
+from app.utils import chunk_list
+from app import db
+from collections import defaultdict
+from datetime import datetime
+from xml.sax.saxutils import escape, quoteattr
+
+NODE_ATTRIBUTES = [
+  ('title', 'string'),
+  ('year', 'int'),
+  ('citation_count', 'int'),
+  ('authors', 'string'),
+  ('keywords', 'string')
+]
+
+
+def resolve_export_ids(node_ids=None, year_from=None, year_to=None, keyword=None,
+                       min_citations=None, depth=0, max_nodes=10000):
+  """Return (sorted paper ids, truncated flag) for an explicit id list or a filter."""
+
+  if node_ids:
+    seeds = list(dict.fromkeys(int(node_id) for node_id in node_ids))
+  else:
+    query = db.session.query(Paper.id)
+    if year_from:
+      query = query.filter(Paper.year >= year_from)
+    if year_to:
+      query = query.filter(Paper.year <= year_to)
+    if keyword:
+      query = query.join(Paper.keywords).filter(Keyword.name.contains(keyword.lower()))
+    if min_citations is not None:
+      query = query.filter(Paper.citation_count >= min_citations)
+    seeds = [paper_id for (paper_id,) in
+             query.order_by(Paper.citation_count.desc()).limit(max_nodes + 1)]
+
+  truncated = len(seeds) > max_nodes
+  selected = set(seeds[:max_nodes])
+
+  if depth > 0 and not truncated:
+    index = get_citation_index()
+    frontier = [index.position[pid] for pid in selected if pid in index.position]
+    for _ in range(depth):
+      next_frontier = []
+      for x in frontier:
+        neighbours = index.out_indices[index.out_indptr[x]:index.out_indptr[x + 1]] + \
+          index.in_indices[index.in_indptr[x]:index.in_indptr[x + 1]]
+        for y in neighbours:
+          paper_id = int(index.paper_ids[y])
+          if paper_id not in selected:
+            if len(selected) >= max_nodes:
+              truncated = True
+              break
+            selected.add(paper_id)
+            next_frontier.append(y)
+        if truncated:
+          break
+      frontier = next_frontier
+      if truncated or not frontier:
+        break
+
+  # Explicit ids may reference papers that no longer exist; they are simply
+  # absent from the node stream, and edges are only emitted between
+  # streamed nodes.
+  return sorted(selected), truncated
+
+
+def _iter_node_chunks(paper_ids, chunk_size):
+  for chunk in chunk_list(paper_ids, chunk_size):
+    authors = defaultdict(list)
+    for paper_id, name in db.session.query(paper_authors.c.paper_id, Author.name)\
+        .join(Author, Author.id == paper_authors.c.author_id)\
+        .filter(paper_authors.c.paper_id.in_(chunk)):
+      authors[paper_id].append(name)
+
+    keywords = defaultdict(list)
+    for paper_id, name in db.session.query(paper_keywords.c.paper_id, Keyword.name)\
+        .join(Keyword, Keyword.id == paper_keywords.c.keyword_id)\
+        .filter(paper_keywords.c.paper_id.in_(chunk)):
+      keywords[paper_id].append(name)
+
+    rows = db.session.query(Paper.id, Paper.title, Paper.year, Paper.citation_count)\
+      .filter(Paper.id.in_(chunk)).order_by(Paper.id)
+
+    yield [
+      {
+        'id': paper_id,
+        'title': title,
+        'year': year,
+        'citation_count': citation_count or 0,
+        'authors': '; '.join(sorted(authors[paper_id])),
+        'keywords': '; '.join(sorted(keywords[paper_id]))
+      }
+      for paper_id, title, year, citation_count in rows
+    ]
+
+
+def _iter_edges(paper_ids, present_ids, chunk_size):
+  for chunk in chunk_list(paper_ids, chunk_size):
+    rows = db.session.query(Citation.id, Citation.citing_paper_id, Citation.cited_paper_id)\
+      .filter(Citation.citing_paper_id.in_(chunk)).order_by(Citation.id)
+    for citation_id, citing_id, cited_id in rows:
+      if cited_id in present_ids:
+        yield citation_id, citing_id, cited_id
+
+
+def stream_graphml(paper_ids, chunk_size=1000):
+  yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+  yield '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+  for name, attr_type in NODE_ATTRIBUTES:
+    yield f'  <key id="{name}" for="node" attr.name="{name}" attr.type="{attr_type}"/>\n'
+  yield '  <graph id="citations" edgedefault="directed">\n'
+
+  present_ids = set()
+  for nodes in _iter_node_chunks(paper_ids, chunk_size):
+    parts = []
+    for node in nodes:
+      present_ids.add(node['id'])
+      parts.append(f'    <node id="{node["id"]}">\n')
+      for name, _ in NODE_ATTRIBUTES:
+        parts.append(f'      <data key="{name}">{escape(str(node[name]))}</data>\n')
+      parts.append('    </node>\n')
+    yield ''.join(parts)
+
+  parts = []
+  for citation_id, citing_id, cited_id in _iter_edges(paper_ids, present_ids, chunk_size):
+    parts.append(f'    <edge id="e{citation_id}" source="{citing_id}" target="{cited_id}"/>\n')
+    if len(parts) >= chunk_size:
+      yield ''.join(parts)
+      parts = []
+  parts.append('  </graph>\n</graphml>\n')
+  yield ''.join(parts)
+
+
+def stream_gexf(paper_ids, chunk_size=1000):
+  yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+  yield '<gexf xmlns="http://gexf.net/1.3" version="1.3">\n'
+  yield f'  <meta lastmodifieddate="{datetime.utcnow().date().isoformat()}">\n'
+  yield '    <creator>Research Explorer</creator>\n  </meta>\n'
+  yield '  <graph defaultedgetype="directed" mode="static">\n'
+  yield '    <attributes class="node">\n'
+  for i, (name, attr_type) in enumerate(NODE_ATTRIBUTES[1:]):
+    gexf_type = 'integer' if attr_type == 'int' else attr_type
+    yield f'      <attribute id="{i}" title="{name}" type="{gexf_type}"/>\n'
+  yield '    </attributes>\n    <nodes>\n'
+
+  present_ids = set()
+  for nodes in _iter_node_chunks(paper_ids, chunk_size):
+    parts = []
+    for node in nodes:
+      present_ids.add(node['id'])
+      parts.append(f'      <node id="{node["id"]}" label={quoteattr(node["title"])}>\n'
+                   '        <attvalues>\n')
+      for i, (name, _) in enumerate(NODE_ATTRIBUTES[1:]):
+        parts.append(f'          <attvalue for="{i}" value={quoteattr(str(node[name]))}/>\n')
+      parts.append('        </attvalues>\n      </node>\n')
+    yield ''.join(parts)
+
+  yield '    </nodes>\n    <edges>\n'
+  parts = []
+  for citation_id, citing_id, cited_id in _iter_edges(paper_ids, present_ids, chunk_size):
+    parts.append(f'      <edge id="{citation_id}" source="{citing_id}" target="{cited_id}"/>\n')
+    if len(parts) >= chunk_size:
+      yield ''.join(parts)
+      parts = []
+  parts.append('    </edges>\n  </graph>\n</gexf>\n')
+  yield ''.join(parts)
+
+
+GRAPH_STREAMERS = {
+  'graphml': (stream_graphml, 'application/graphml+xml'),
+  'gexf': (stream_gexf, 'application/gexf+xml')
+}
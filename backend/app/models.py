@@ -1,5 +1,7 @@
 from app import db
 from datetime import datetime
+from sqlalchemy import case, event, func
+from sqlalchemy.orm import Session
 
 paper_authors = db.Table('paper_authors',
                          db.Column('paper_id', db.Integer, db.ForeignKey('paper.id'), primary_key=True),
@@ -155,12 +157,13 @@ class Keyword(db.Model):
     
     def get_trending_score(self, years_back=5):
         current_year = datetime.now().year
-        recent_papers = self.papers.filter(
-            Paper.year >= current_year - years_back
-        ).count()
-        total_papers = self.papers.count()
+        recent_papers, total_papers = db.session.query(
+            func.sum(case((KeywordYearStats.year >= current_year - years_back,
+                           KeywordYearStats.paper_count), else_=0)),
+            func.sum(KeywordYearStats.paper_count)
+        ).filter(KeywordYearStats.keyword_id == self.id).one()
         
-        if total_papers == 0:
+        if not total_papers:
             return 0
         
         return (recent_papers / total_papers) * 100
@@ -193,6 +196,373 @@ class Citation(db.Model):
         }
 
 
+class PaperSimilarity(db.Model):
+    __tablename__ = 'paper_similarity'
+
+    id = db.Column(db.Integer, primary_key=True)
+    paper_id = db.Column(db.Integer, db.ForeignKey('paper.id', ondelete='CASCADE'), nullable=False)
+    related_paper_id = db.Column(db.Integer, db.ForeignKey('paper.id', ondelete='CASCADE'), nullable=False)
+    method = db.Column(db.String(20), nullable=False)
+    shared_count = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('paper_id', 'method', 'related_paper_id', name='unique_similarity'),
+        db.Index('idx_similarity_lookup', 'paper_id', 'method', 'score'),
+    )
+
+    def __repr__(self):
+        return f'<PaperSimilarity {self.method} {self.paper_id} ~ {self.related_paper_id}>'
+
+    def to_dict(self):
+        return {
+            'paper_id': self.paper_id,
+            'related_paper_id': self.related_paper_id,
+            'method': self.method,
+            'shared_count': self.shared_count,
+            'score': self.score,
+            'computed_at': self.computed_at.isoformat() if self.computed_at else None
+        }
+
+
+class ResearchGap(db.Model):
+    __tablename__ = 'research_gap'
+
+    id = db.Column(db.Integer, primary_key=True)
+    paper_id = db.Column(db.Integer, db.ForeignKey('paper.id', ondelete='CASCADE'), nullable=False)
+    min_citations = db.Column(db.Integer, nullable=False)
+    max_recent_papers = db.Column(db.Integer, nullable=False)
+    recent_similar_papers = db.Column(db.Float, nullable=False)
+    gap_score = db.Column(db.Float, nullable=False)
+    data_version = db.Column(db.Integer, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    paper = db.relationship('Paper')
+
+    __table_args__ = (
+        db.Index('idx_research_gap_params', 'min_citations', 'max_recent_papers', 'gap_score'),
+    )
+
+    def __repr__(self):
+        return f'<ResearchGap {self.paper_id} score={self.gap_score:.2f}>'
+
+
+class AuthorMetrics(db.Model):
+    __tablename__ = 'author_metrics'
+
+    author_id = db.Column(db.Integer, db.ForeignKey('author.id', ondelete='CASCADE'), primary_key=True)
+    paper_count = db.Column(db.Integer, nullable=False, default=0)
+    total_citations = db.Column(db.BigInteger, nullable=False, default=0)
+    avg_citations = db.Column(db.Float, nullable=False, default=0)
+    h_index = db.Column(db.Integer, nullable=False, default=0, index=True)
+    g_index = db.Column(db.Integer, nullable=False, default=0, index=True)
+    i10_index = db.Column(db.Integer, nullable=False, default=0, index=True)
+    unique_collaborators = db.Column(db.Integer, nullable=False, default=0)
+    data_version = db.Column(db.Integer, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    author = db.relationship('Author')
+
+    __table_args__ = (
+        db.Index('idx_author_metrics_citations', 'total_citations'),
+    )
+
+    def __repr__(self):
+        return f'<AuthorMetrics {self.author_id} h={self.h_index}>'
+
+    def to_dict(self):
+        return {
+            'author_id': self.author_id,
+            'author': self.author.name if self.author else None,
+            'paper_count': self.paper_count,
+            'total_citations': self.total_citations,
+            'avg_citations': self.avg_citations,
+            'h_index': self.h_index,
+            'g_index': self.g_index,
+            'i10_index': self.i10_index,
+            'unique_collaborators': self.unique_collaborators,
+            'computed_at': self.computed_at.isoformat() if self.computed_at else None
+        }
+
+
+class CitationVelocity(db.Model):
+    __tablename__ = 'citation_velocity'
+
+    paper_id = db.Column(db.Integer, db.ForeignKey('paper.id', ondelete='CASCADE'), primary_key=True)
+    citation_count = db.Column(db.Integer, nullable=False, default=0)
+    first_cited_at = db.Column(db.DateTime)
+    last_cited_at = db.Column(db.DateTime, index=True)
+    base_cost = db.Column(db.Float, nullable=False, default=0)
+    burst_cost = db.Column(db.Float, nullable=False, default=0)
+    in_burst = db.Column(db.Boolean, nullable=False, default=False, index=True)
+    burst_started_at = db.Column(db.DateTime)
+    burst_citations = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CitationVelocity {self.paper_id} burst={self.in_burst}>'
+
+
+class CitationDailyCount(db.Model):
+    __tablename__ = 'citation_daily_count'
+
+    paper_id = db.Column(db.Integer, db.ForeignKey('paper.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    citation_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('idx_citation_daily_day', 'day', 'paper_id'),
+    )
+
+    def __repr__(self):
+        return f'<CitationDailyCount {self.paper_id} {self.day}: {self.citation_count}>'
+
+
+class DistinctSketch(db.Model):
+    __tablename__ = 'distinct_sketch'
+
+    entity_type = db.Column(db.String(20), primary_key=True)
+    entity_id = db.Column(db.Integer, primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    metric = db.Column(db.String(30), primary_key=True)
+    registers = db.Column(db.LargeBinary, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_distinct_sketch_metric', 'entity_type', 'metric', 'year'),
+    )
+
+    def __repr__(self):
+        return f'<DistinctSketch {self.entity_type}:{self.entity_id} {self.metric} {self.year}>'
+
+
+class StreamCursor(db.Model):
+    __tablename__ = 'stream_cursor'
+
+    name = db.Column(db.String(50), primary_key=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    # [id, unix time first skipped] for ids below position that were not
+    # visible yet, e.g. rows whose transaction had not committed
+    pending = db.Column(db.JSON, nullable=False, default=list)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<StreamCursor {self.name}={self.position}>'
+
+
+class KeywordYearStats(db.Model):
+    __tablename__ = 'keyword_year_stats'
+
+    keyword_id = db.Column(db.Integer, db.ForeignKey('keyword.id', ondelete='CASCADE'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    paper_count = db.Column(db.Integer, nullable=False, default=0)
+    citation_sum = db.Column(db.BigInteger, nullable=False, default=0)
+
+    # Covering indexes so keyword and year range lookups never touch the heap.
+    __table_args__ = (
+        db.Index('idx_kys_keyword_year', 'keyword_id', 'year', 'paper_count', 'citation_sum'),
+        db.Index('idx_kys_year_keyword', 'year', 'keyword_id', 'paper_count', 'citation_sum'),
+    )
+
+    def __repr__(self):
+        return f'<KeywordYearStats {self.keyword_id} {self.year}: {self.paper_count}>'
+
+    @property
+    def avg_citations(self):
+        return self.citation_sum / self.paper_count if self.paper_count else 0
+
+    def to_dict(self):
+        return {
+            'keyword_id': self.keyword_id,
+            'year': self.year,
+            'paper_count': self.paper_count,
+            'citation_sum': self.citation_sum,
+            'avg_citations': self.avg_citations
+        }
+
+class KeywordPairStats(db.Model):
+    """Sparse keyword x keyword co-occurrence counts.
+
+    Pairs are stored in both directions so lookups by keyword_id are a
+    single range scan; the diagonal (keyword_id == related_keyword_id)
+    holds the keyword's own paper count.
+    """
+    __tablename__ = 'keyword_pair_stats'
+
+    keyword_id = db.Column(db.Integer, db.ForeignKey('keyword.id', ondelete='CASCADE'), primary_key=True)
+    related_keyword_id = db.Column(db.Integer, db.ForeignKey('keyword.id', ondelete='CASCADE'), primary_key=True)
+    co_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('idx_kps_keyword_count', 'keyword_id', 'co_count'),
+    )
+
+    def __repr__(self):
+        return f'<KeywordPairStats {self.keyword_id} ~ {self.related_keyword_id}: {self.co_count}>'
+
+
+class YearStats(db.Model):
+    """Per-year margin of the keyword rollup, counting each paper once."""
+    __tablename__ = 'year_stats'
+
+    year = db.Column(db.Integer, primary_key=True)
+    paper_count = db.Column(db.Integer, nullable=False, default=0)
+    citation_sum = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<YearStats {self.year}: {self.paper_count}>'
+
+    @property
+    def avg_citations(self):
+        return self.citation_sum / self.paper_count if self.paper_count else 0
+
+    def to_dict(self):
+        return {
+            'year': self.year,
+            'paper_count': self.paper_count,
+            'citation_sum': self.citation_sum,
+            'avg_citations': self.avg_citations
+        }
+
+
+class AnalyticsSnapshot(db.Model):
+    __tablename__ = 'analytics_snapshot'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False)
+    params = db.Column(db.String(255), nullable=False, default='{}')
+    result = db.Column(db.JSON, nullable=False)
+    data_version = db.Column(db.Integer, nullable=False)
+    duration_ms = db.Column(db.Integer)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_analytics_snapshot_lookup', 'name', 'params', 'id'),
+    )
+
+    def __repr__(self):
+        return f'<AnalyticsSnapshot {self.name} v{self.data_version}>'
+
+    def metadata_dict(self):
+        return {
+            'id': self.id,
+            'data_version': self.data_version,
+            'duration_ms': self.duration_ms,
+            'computed_at': self.computed_at.isoformat() if self.computed_at else None
+        }
+
+
+class ChangeLog(db.Model):
+    """Append-only log of paper, citation, author and keyword writes.
+
+    The highest id is the global data version; clients and caches compare
+    versions instead of timestamps so deletes are ordered too.
+    """
+    __tablename__ = 'change_log'
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(20), nullable=False)
+    entity_id = db.Column(db.Integer)
+    action = db.Column(db.String(10), nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        db.Index('idx_change_log_entity', 'entity_type', 'entity_id'),
+    )
+
+    def __repr__(self):
+        return f'<ChangeLog {self.id} {self.action} {self.entity_type}:{self.entity_id}>'
+
+    def to_dict(self):
+        return {
+            'version': self.id,
+            'entity_type': self.entity_type,
+            'entity_id': self.entity_id,
+            'action': self.action,
+            'changed_at': self.changed_at.isoformat() if self.changed_at else None
+        }
+
+
+TRACKED_ENTITIES = {Paper: 'paper', Citation: 'citation', Author: 'author', Keyword: 'keyword'}
+
+
+def _change_row(obj, action):
+    changed_at = getattr(obj, 'updated_at', None) or getattr(obj, 'created_at', None)
+    if action == 'delete' or changed_at is None:
+        changed_at = datetime.utcnow()
+    return {
+        'entity_type': TRACKED_ENTITIES[type(obj)],
+        'entity_id': obj.id,
+        'action': action,
+        'changed_at': changed_at
+    }
+
+
+@event.listens_for(Session, 'after_flush')
+def record_changes(session, flush_context):
+    rows = []
+    for obj in session.new:
+        if type(obj) in TRACKED_ENTITIES:
+            rows.append(_change_row(obj, 'insert'))
+    for obj in session.dirty:
+        if type(obj) in TRACKED_ENTITIES and session.is_modified(obj):
+            rows.append(_change_row(obj, 'update'))
+    for obj in session.deleted:
+        if type(obj) in TRACKED_ENTITIES:
+            rows.append(_change_row(obj, 'delete'))
+
+    if rows:
+        session.connection().execute(ChangeLog.__table__.insert(), rows)
+
+
+def record_reset():
+    """Mark a bulk rewrite (e.g. a restore) that bypassed the ORM events."""
+    db.session.add(ChangeLog(entity_type='database', action='reset'))
+
+
+def get_data_version():
+    return db.session.query(func.max(ChangeLog.id)).scalar() or 0
+
+
+def get_last_change(*conditions):
+    """(version, changed_at) of the newest change log entry matching conditions."""
+    row = db.session.query(ChangeLog.id, ChangeLog.changed_at)\
+        .filter(*conditions).order_by(ChangeLog.id.desc()).first()
+    return (row.id, row.changed_at) if row else (0, None)
+
+
+def get_changes_since(version, entity_type=None):
+    query = ChangeLog.query.filter(ChangeLog.id > version)
+    if entity_type:
+        query = query.filter(ChangeLog.entity_type == entity_type)
+    return query.order_by(ChangeLog.id).all()
+
+
+def prune_change_log(keep_versions):
+    """Delete change log rows older than the newest keep_versions versions.
+
+    The newest row of every live entity is kept whatever its age, since
+    paper ETags and get_last_change read it; that also keeps the global
+    maximum, so the data version never moves backwards. get_changes_since
+    can only look back keep_versions versions after a prune. Returns the
+    number of rows deleted.
+    """
+    cutoff = get_data_version() - max(keep_versions, 1)
+    if cutoff <= 0:
+        return 0
+
+    newest = db.session.query(func.max(ChangeLog.id))\
+        .group_by(ChangeLog.entity_type, ChangeLog.entity_id)
+    kept = db.session.query(ChangeLog.id).filter(ChangeLog.id.in_(newest), ChangeLog.action != 'delete')
+
+    deleted = ChangeLog.query\
+        .filter(ChangeLog.id <= cutoff, ChangeLog.id.notin_(kept))\
+        .delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
 def create_sample_data():
 
     try:
@@ -416,6 +786,7 @@ def restore_database(backup_data):
         Paper.query.delete()
         Author.query.delete()
         Keyword.query.delete()
+        record_reset()
         db.session.commit()
  
         if isinstance(backup_data, str):
@@ -510,6 +881,15 @@ def restore_database(backup_data):
         
         db.session.commit()
 
+        from app.rollups import rebuild_rollups
+        rebuild_rollups()
+
+        from app.bursts import reset_citation_stream
+        reset_citation_stream()
+
+        from app.sketches import rebuild_sketches
+        rebuild_sketches()
+
         restored_counts = {
             'papers': Paper.query.count(),
             'authors': Author.query.count(),
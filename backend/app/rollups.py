@@ -0,0 +1,246 @@
+from app.models import Paper, Keyword, KeywordPairStats, KeywordYearStats, YearStats, paper_keywords
+from app import db
+from collections import defaultdict
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session, attributes
+
+
+def _history_value(obj, key):
+  history = attributes.get_history(obj, key)
+  if history.deleted:
+    return history.deleted[0]
+  if history.unchanged:
+    return history.unchanged[0]
+  return getattr(obj, key)
+
+
+@event.listens_for(Session, 'before_flush')
+def capture_rollup_changes(session, flush_context, instances):
+  # Collection history for the dynamic keyword relationship is only visible
+  # before the flush, while new rows only get ids after it, so changes are
+  # captured here and applied in apply_rollup_changes.
+  pending = []
+  session.info['rollup_pending'] = pending
+
+  stale = []
+  for obj in session.deleted:
+    if isinstance(obj, Paper) and obj.id is not None:
+      stale.append((obj, None))
+  for obj in session.dirty:
+    if isinstance(obj, Paper) and obj.id is not None and obj not in session.deleted:
+      year_history = attributes.get_history(obj, 'year')
+      citation_history = attributes.get_history(obj, 'citation_count')
+      keyword_history = attributes.get_history(obj, 'keywords')
+      if year_history.has_changes() or citation_history.has_changes() or keyword_history.has_changes():
+        stale.append((obj, keyword_history))
+
+  old_keywords = defaultdict(set)
+  if stale:
+    rows = session.execute(
+      select(paper_keywords.c.paper_id, paper_keywords.c.keyword_id)
+      .where(paper_keywords.c.paper_id.in_([obj.id for obj, _ in stale]))
+    )
+    for paper_id, keyword_id in rows:
+      old_keywords[paper_id].add(keyword_id)
+
+  for obj, keyword_history in stale:
+    keyword_ids = old_keywords[obj.id]
+    pending.append((-1, _history_value(obj, 'year'),
+                    _history_value(obj, 'citation_count') or 0, list(keyword_ids)))
+
+    if keyword_history is not None:
+      removed = {kw.id for kw in keyword_history.deleted}
+      keywords = [kid for kid in keyword_ids if kid not in removed] + list(keyword_history.added)
+      pending.append((1, obj.year, obj.citation_count or 0, keywords))
+
+  for obj in session.new:
+    if isinstance(obj, Paper):
+      keywords = list(attributes.get_history(obj, 'keywords').added)
+      pending.append((1, obj.year, obj.citation_count or 0, keywords))
+
+
+@event.listens_for(Session, 'after_flush')
+def apply_rollup_changes(session, flush_context):
+  pending = session.info.pop('rollup_pending', None)
+  if not pending:
+    return
+
+  keyword_deltas = defaultdict(lambda: [0, 0])
+  year_deltas = defaultdict(lambda: [0, 0])
+  pair_deltas = defaultdict(int)
+
+  for sign, year, citations, keywords in pending:
+    year_deltas[year][0] += sign
+    year_deltas[year][1] += sign * citations
+    keyword_ids = {keyword.id if isinstance(keyword, Keyword) else keyword for keyword in keywords}
+    for keyword_id in keyword_ids:
+      keyword_deltas[(keyword_id, year)][0] += sign
+      keyword_deltas[(keyword_id, year)][1] += sign * citations
+      for related_id in keyword_ids:
+        pair_deltas[(keyword_id, related_id)] += sign
+
+  connection = session.connection()
+  for (keyword_id, year), (count, citations) in keyword_deltas.items():
+    if count or citations:
+      _apply_delta(connection, KeywordYearStats.__table__,
+                   {'keyword_id': keyword_id, 'year': year}, count, citations)
+  for year, (count, citations) in year_deltas.items():
+    if count or citations:
+      _apply_delta(connection, YearStats.__table__, {'year': year}, count, citations)
+  for (keyword_id, related_id), count in pair_deltas.items():
+    if count:
+      _apply_pair_delta(connection, keyword_id, related_id, count)
+
+
+def _apply_delta(connection, table, key, count, citations):
+  condition = [table.c[name] == value for name, value in key.items()]
+  result = connection.execute(
+    table.update().where(*condition).values(
+      paper_count=table.c.paper_count + count,
+      citation_sum=table.c.citation_sum + citations
+    )
+  )
+  if result.rowcount == 0 and count > 0:
+    connection.execute(table.insert().values(**key, paper_count=count, citation_sum=citations))
+  elif count < 0:
+    connection.execute(table.delete().where(*condition, table.c.paper_count <= 0))
+
+
+def _apply_pair_delta(connection, keyword_id, related_id, count):
+  table = KeywordPairStats.__table__
+  condition = [table.c.keyword_id == keyword_id, table.c.related_keyword_id == related_id]
+  result = connection.execute(
+    table.update().where(*condition).values(co_count=table.c.co_count + count)
+  )
+  if result.rowcount == 0 and count > 0:
+    connection.execute(table.insert().values(
+      keyword_id=keyword_id, related_keyword_id=related_id, co_count=count
+    ))
+  elif count < 0:
+    connection.execute(table.delete().where(*condition, table.c.co_count <= 0))
+
+
+def rebuild_rollups():
+  """Recompute both rollup tables from scratch, e.g. after a bulk restore."""
+  db.session.execute(KeywordYearStats.__table__.delete())
+  db.session.execute(YearStats.__table__.delete())
+  db.session.execute(KeywordPairStats.__table__.delete())
+
+  db.session.execute(KeywordYearStats.__table__.insert().from_select(
+    ['keyword_id', 'year', 'paper_count', 'citation_sum'],
+    select(
+      paper_keywords.c.keyword_id,
+      Paper.year,
+      func.count(Paper.id),
+      func.coalesce(func.sum(Paper.citation_count), 0)
+    ).join(Paper, Paper.id == paper_keywords.c.paper_id)
+     .group_by(paper_keywords.c.keyword_id, Paper.year)
+  ))
+  db.session.execute(YearStats.__table__.insert().from_select(
+    ['year', 'paper_count', 'citation_sum'],
+    select(
+      Paper.year,
+      func.count(Paper.id),
+      func.coalesce(func.sum(Paper.citation_count), 0)
+    ).group_by(Paper.year)
+  ))
+  related = paper_keywords.alias('related')
+  db.session.execute(KeywordPairStats.__table__.insert().from_select(
+    ['keyword_id', 'related_keyword_id', 'co_count'],
+    select(
+      paper_keywords.c.keyword_id,
+      related.c.keyword_id,
+      func.count()
+    ).join(related, related.c.paper_id == paper_keywords.c.paper_id)
+     .group_by(paper_keywords.c.keyword_id, related.c.keyword_id)
+  ))
+  db.session.commit()
+
+  return {
+    'keyword_years': KeywordYearStats.query.count(),
+    'years': YearStats.query.count(),
+    'keyword_pairs': KeywordPairStats.query.count()
+  }
+
+
+def keyword_totals(year_from=None, year_to=None, min_papers=None):
+  """Query of per-keyword paper_count, citation_sum and avg_citations over a year range."""
+  paper_count = func.sum(KeywordYearStats.paper_count)
+  citation_sum = func.sum(KeywordYearStats.citation_sum)
+
+  query = db.session.query(
+    Keyword.name,
+    paper_count.label('paper_count'),
+    citation_sum.label('citation_sum'),
+    (citation_sum * 1.0 / paper_count).label('avg_citations')
+  ).select_from(KeywordYearStats)\
+   .join(Keyword, Keyword.id == KeywordYearStats.keyword_id)
+
+  if year_from is not None:
+    query = query.filter(KeywordYearStats.year >= year_from)
+  if year_to is not None:
+    query = query.filter(KeywordYearStats.year <= year_to)
+
+  query = query.group_by(Keyword.name)
+  if min_papers is not None:
+    query = query.having(paper_count >= min_papers)
+  return query
+
+
+def year_totals(year_from=None, year_to=None):
+  query = db.session.query(YearStats.year, YearStats.paper_count, YearStats.citation_sum)
+  if year_from is not None:
+    query = query.filter(YearStats.year >= year_from)
+  if year_to is not None:
+    query = query.filter(YearStats.year <= year_to)
+  return query.order_by(YearStats.year)
+
+
+def keyword_year_series(limit=10, keywords=None, year_from=None, year_to=None):
+  """Year series for the top `limit` keywords (or an explicit list) in one query.
+
+  Returns (keyword names, years, {name: counts}) where every count list is
+  aligned to `years`, with zeros for years a keyword has no papers in.
+  """
+  filters = []
+  if year_from is not None:
+    filters.append(KeywordYearStats.year >= year_from)
+  if year_to is not None:
+    filters.append(KeywordYearStats.year <= year_to)
+  if keywords is not None:
+    filters.append(Keyword.name.in_(keywords))
+
+  cells = select(
+    Keyword.name.label('name'),
+    KeywordYearStats.year.label('year'),
+    KeywordYearStats.paper_count.label('paper_count'),
+    func.sum(KeywordYearStats.paper_count).over(partition_by=KeywordYearStats.keyword_id).label('total')
+  ).select_from(KeywordYearStats)\
+   .join(Keyword, Keyword.id == KeywordYearStats.keyword_id)\
+   .where(*filters).subquery()
+
+  ranked = select(
+    cells.c.name, cells.c.year, cells.c.paper_count,
+    func.dense_rank().over(order_by=(cells.c.total.desc(), cells.c.name)).label('rank')
+  ).subquery()
+
+  query = select(ranked.c.name, ranked.c.year, ranked.c.paper_count, ranked.c.rank)
+  if keywords is None:
+    query = query.where(ranked.c.rank <= limit)
+
+  rows = db.session.execute(query.order_by(ranked.c.rank, ranked.c.year)).all()
+
+  names = list(dict.fromkeys(name for name, _, _, _ in rows))
+  if keywords is not None:
+    names += [name for name in keywords if name not in names]
+
+  observed = [year for _, year, _, _ in rows]
+  start = year_from if year_from is not None else min(observed, default=None)
+  end = year_to if year_to is not None else max(observed, default=None)
+  years = list(range(start, end + 1)) if start is not None and end is not None else []
+
+  series = {name: [0] * len(years) for name in names}
+  for name, year, count, _ in rows:
+    series[name][year - start] = count
+
+  return names, years, series
@@ -1,17 +1,52 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, stream_with_context
 from app import db, cache
-from app.models import Paper, Author, Keyword, Citation
-from app.analytics import ResearchAnalytics
+from app.models import (
+  Paper, Author, Keyword, Citation, ChangeLog, KeywordYearStats, YearStats, get_last_change
+)
+from app.analytics import (
+  ResearchAnalytics, AUTHOR_LEADERBOARD_SORTS, KEYWORD_RELATIONSHIP_METRICS, TRENDING_SORTS
+)
+from app.caching import cached, conditional, http_last_modified, is_not_modified, single_flight
+from app.citation_index import get_citation_index, invalidate_citation_index
+from app.utils import CacheHelper, normalize_keyword
+from app.exporters import GRAPH_STREAMERS, resolve_export_ids
+from app.similarity import SIMILARITY_METHODS, get_related_papers
+from app.rollups import keyword_totals, keyword_year_series, year_totals
+from app.scheduler import get_snapshot
+from app.bursts import CITATION_BURST_SORTS, get_rising_papers
+from app.sketches import DISTINCT_METRICS, distinct_union, sketches_built
+from app.serializers import export_schema
+from marshmallow import EXCLUDE, ValidationError
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import func, desc, asc
+from datetime import datetime
 import json 
+import hashlib
 import csv
 import io
 
 bp = Blueprint('main', __name__)
 
+def data_validators(**view_args):
+  version, changed_at = get_last_change()
+  return f'data-{version}', changed_at
+
+def paper_validators(paper_id):
+  # The change log does not record which papers a citation links, so any
+  # citation write anywhere changes the ETag and Last-Modified of every paper.
+  # Unknown and deleted papers have no representation to validate.
+  if not db.session.query(Paper.query.filter_by(id=paper_id).exists()).scalar():
+    return None
+  paper_version, paper_changed_at = get_last_change(
+    ChangeLog.entity_type == 'paper', ChangeLog.entity_id == paper_id
+  )
+  citation_version, citation_changed_at = get_last_change(ChangeLog.entity_type == 'citation')
+  changed = [changed_at for changed_at in (paper_changed_at, citation_changed_at) if changed_at]
+  return f'paper-{paper_id}-{paper_version}-{citation_version}', max(changed) if changed else None
+
 @bp.route('/papers', methods=['GET'])
-@cache.cached(timeout=300, query_string=True)
+@conditional(data_validators)
+@cached(query_string=True, tags=('papers',))
 def get_papers():
   page = request.args.get('page', 1, type=int)
   per_page = request.args.get('per_page', 20, type=int)
@@ -28,11 +63,28 @@ def get_papers():
   })
 
 @bp.route('/papers/<int:paper_id>', methods=['GET'])
-@cache.cached(timeout=300)
+@conditional(paper_validators)
+@cached(tags=('paper:{paper_id}',))
 def get_paper(paper_id):
   paper = Paper.query.get_or_404(paper_id)
   return jsonify(paper.to_dict())
 
+@bp.route('/papers/<int:paper_id>/related', methods=['GET'])
+@cached(query_string=True, tags=('paper:{paper_id}', 'graph'))
+def get_related_papers_route(paper_id):
+  Paper.query.get_or_404(paper_id)
+  method = request.args.get('method', 'combined').strip().lower()
+  limit = request.args.get('limit', 10, type=int)
+
+  if method not in SIMILARITY_METHODS + ('combined',):
+    return jsonify({'error': 'method must be cocitation, coupling or combined'}), 400
+
+  return jsonify({
+    'paper_id': paper_id,
+    'method': method,
+    'related_papers': get_related_papers(paper_id, method, limit)
+  })
+
 @bp.route('/papers/', methods=['POST'])
 def create_paper():
   data = request.get_json()
@@ -107,6 +159,7 @@ def delete_paper(paper_id):
   try:
     db.session.delete(paper)
     db.session.commit()
+    invalidate_citation_index()
     return jsonify({'message': 'Paper deleted successfully'})
   
   except Exception as e:
@@ -165,13 +218,14 @@ def bulk_create_papers():
     return jsonify({'error': str(e)}), 500
   
 @bp.route('/authors', methods=['GET'])
-@cache.cached(timeout=300)
+@conditional(data_validators)
+@cached(tags=('authors',))
 def get_authors():
   authors = Author.query.all()
   return jsonify([author.to_dict() for author in authors])
 
 @bp.route('authors/<int:author_id>', methods=['GET'])
-@cache.cached(timeout=300)
+@cached(tags=('author:{author_id}',))
 def get_author(author_id):
   author = Author.query.get_or_404(author_id)
   return jsonify({
@@ -180,13 +234,14 @@ def get_author(author_id):
   })
 
 @bp.route('/keywords', methods=['GET'])
-@cache.cached(timeout=300)
+@conditional(data_validators)
+@cached(tags=('keywords',))
 def get_keywords():
   keywords = Keyword.query.all()
   return jsonify([keyword.to_dict() for keyword in keywords])
 
 @bp.route('/keywords/<int:keyword_id>', methods=['GET'])
-@cache.cached(timeout=300)
+@cached(tags=('keyword:{keyword_id}',))
 def get_keyword(keyword_id):
   keyword = Keyword.query.get_or_404(keyword_id)
   return jsonify({
@@ -208,6 +263,7 @@ def create_citation():
 
     db.session.add(citation)
     db.session.commit()
+    invalidate_citation_index()
 
     return jsonify({
       'message': 'Citation created successfully',
@@ -222,7 +278,7 @@ def create_citation():
     return jsonify({'error': str(e)}), 500
   
 @bp.route('/citations', methods=['GET'])
-@cache.cached(timeout=300)
+@cached(tags=('citations',))
 def get_citations():
   citations = Citation.query.all()
   return jsonify([citation.to_dict() for citation in citations])
@@ -319,7 +375,7 @@ def advanced_search():
   })
 
 @bp.route('/suggestions/keywords', methods=['GET'])
-@cache.cached(timeout=600, query_string=True)
+@cached(query_string=True, tags=('keywords',))
 def keyword_suggestions():
   query = request.args.get('q', '').strip()
   limit = request.args.get('limit', 10, type=int)
@@ -332,7 +388,7 @@ def keyword_suggestions():
   return jsonify([kw.name for kw in keywords])
 
 @bp.route('/suggestions/authors', methods=['GET'])
-@cache.cached(timeout=600, query_string=True)
+@cached(query_string=True, tags=('authors',))
 def author_suggestions():
   query = request.args.get('q', '').strip()
   limit = request.args.get('limit', 10, type=int)
@@ -358,14 +414,7 @@ def suggest_similar_papers():
 
   return jsonify({paper.to_dict() for paper in papers})
 
-@bp.route('/graph/data', methods=['GET'])
-@cache.cached(timeout=300, query_string=True)
-def get_graph_data():
-  year_from = request.args.get('year_from', type=int)
-  year_to = request.args.get('year_to', type=int)
-  keyword = request.args.get('keyword', '').strip()
-  max_nodes = request.args.get('max_nodes', 100, type=int)
-
+def _build_graph_snapshot(year_from, year_to, keyword, max_nodes):
   papers_query = Paper.query
 
   if year_from:
@@ -405,23 +454,100 @@ def get_graph_data():
       'type': 'citation'
     })
 
-  return jsonify({
-    'nodes': nodes,
-    'edges': edges,
-    'stats': {
-      'total_nodes': len(nodes),
-      'total_edges': len(edges),
-      'filters_applied': {
-        'year_from': year_from,
-        'year_to': year_to,
-        'keyword': keyword,
-        'max_nodes': max_nodes
-      }
+  return {'nodes': nodes, 'edges': edges}
+
+def _graph_delta(old, new):
+  old_nodes = {node['id']: node for node in old['nodes']}
+  new_nodes = {node['id']: node for node in new['nodes']}
+  old_edges = {(edge['source'], edge['target']) for edge in old['edges']}
+  new_edges = {(edge['source'], edge['target']) for edge in new['edges']}
+
+  return {
+    'nodes': {
+      'added': [node for node_id, node in new_nodes.items() if node_id not in old_nodes],
+      'changed': [node for node_id, node in new_nodes.items()
+                  if node_id in old_nodes and old_nodes[node_id] != node],
+      'removed': [node_id for node_id in old_nodes if node_id not in new_nodes]
+    },
+    'edges': {
+      'added': [edge for edge in new['edges'] if (edge['source'], edge['target']) not in old_edges],
+      'removed': [{'source': source, 'target': target, 'type': 'citation'}
+                  for source, target in old_edges - new_edges]
     }
-  })
+  }
+
+@bp.route('/graph/data', methods=['GET'])
+def get_graph_data():
+  year_from = request.args.get('year_from', type=int)
+  year_to = request.args.get('year_to', type=int)
+  keyword = request.args.get('keyword', '').strip()
+  max_nodes = request.args.get('max_nodes', 100, type=int)
+  since = request.args.get('since', type=int)
+
+  filters = {
+    'year_from': year_from,
+    'year_to': year_to,
+    'keyword': keyword,
+    'max_nodes': max_nodes
+  }
+  filter_key = CacheHelper.generate_cache_key('graph_data', **filters)
+  version, changed_at = get_last_change()
+  etag = f'graph-{version}-{since}-{hashlib.md5(filter_key.encode()).hexdigest()[:12]}'
+
+  if is_not_modified(etag, changed_at):
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    last_modified = http_last_modified(changed_at)
+    if last_modified:
+      response.last_modified = last_modified
+    return response
+
+  # Snapshots are keyed by data version, so they never go stale and older
+  # ones stay available as the base for `since` deltas.
+  snapshot_timeout = current_app.config['GRAPH_SNAPSHOT_TIMEOUT']
+  snapshot_key = f'{filter_key}_v{version}'
+
+  def build_snapshot():
+    snapshot = _build_graph_snapshot(year_from, year_to, keyword, max_nodes)
+    cache.set(snapshot_key, snapshot, timeout=snapshot_timeout)
+    return snapshot
+
+  snapshot = cache.get(snapshot_key)
+  if snapshot is None:
+    snapshot = single_flight.do(snapshot_key, lambda: cache.get(snapshot_key), build_snapshot)
+
+  payload = {'version': version}
+  base = cache.get(f'{filter_key}_v{since}') if since is not None and since <= version else None
+
+  if base is not None:
+    payload.update({
+      'since': since,
+      'delta': True,
+      **_graph_delta(base, snapshot)
+    })
+  else:
+    payload.update({
+      'delta': False,
+      'nodes': snapshot['nodes'],
+      'edges': snapshot['edges']
+    })
+
+  payload['stats'] = {
+    'total_nodes': len(snapshot['nodes']),
+    'total_edges': len(snapshot['edges']),
+    'filters_applied': filters
+  }
+
+  response = jsonify(payload)
+  response.set_etag(etag)
+  last_modified = http_last_modified(changed_at)
+  if last_modified:
+    response.last_modified = last_modified
+  return response
 
 @bp.route('/graph/subgraph/<int:paper_id>', methods=['GET'])
-@cache.cached(timeout=300, query_string=True)
+@conditional(data_validators)
+@cached(query_string=True, tags=('graph',))
 def get_subgraph(paper_id):
   depth = request.args.get('depth', 1, type=int)
 
@@ -480,63 +606,339 @@ def get_subgraph(paper_id):
     }
   })
 
+@bp.route('/graph/path/<int:source_id>/<int:target_id>', methods=['GET'])
+@conditional(data_validators)
+def get_citation_path(source_id, target_id):
+  Paper.query.get_or_404(source_id)
+  Paper.query.get_or_404(target_id)
+
+  index = get_citation_index()
+  path = index.shortest_path(source_id, target_id)
+
+  nodes = []
+  if path:
+    papers = {
+      paper_id: (title, year, citation_count)
+      for paper_id, title, year, citation_count in db.session.query(
+        Paper.id, Paper.title, Paper.year, Paper.citation_count
+      ).filter(Paper.id.in_(path))
+    }
+    for paper_id in path:
+      title, year, citation_count = papers.get(paper_id, (None, None, None))
+      nodes.append({
+        'id': paper_id,
+        'title': title,
+        'year': year,
+        'citation_count': citation_count,
+        'type': 'paper'
+      })
+
+  return jsonify({
+    'source_id': source_id,
+    'target_id': target_id,
+    'reachable': path is not None,
+    'path': path or [],
+    'length': len(path) - 1 if path else None,
+    'nodes': nodes
+  })
+
+@bp.route('/graph/lineage/<int:paper_id>', methods=['GET'])
+@conditional(data_validators)
+def get_citation_lineage(paper_id):
+  Paper.query.get_or_404(paper_id)
+
+  index = get_citation_index()
+  counts = index.lineage_counts(paper_id)
+
+  return jsonify({
+    'paper_id': paper_id,
+    'ancestors': counts['ancestors'],
+    'descendants': counts['descendants'],
+    'index_stats': index.stats()
+  })
+
+def snapshot_response(name, params=None):
+  snapshot = get_snapshot(name, params)
+  return jsonify({**snapshot.result, 'snapshot': snapshot.metadata_dict()})
+
 @bp.route('/analytics/research-hotspots', methods=['GET'])
-@cache.cached(timeout=600, query_string=True)
 def get_research_hotspots():
+  config = current_app.config
   year_from = request.args.get('year_from', type=int)
   year_to = request.args.get('year_to', type=int)
-  limit = request.args.get('limit', 10, type=int)
+  limit = min(max(request.args.get('limit', 10, type=int), 1), config['ANALYTICS_MAX_LIMIT'])
 
-  year_range = None
   if year_from and year_to:
-    year_range = (year_from, year_to)
+    # every distinct range is its own snapshot, so keep the key space bounded
+    year_from = min(max(year_from, config['MIN_YEAR']), config['MAX_YEAR'])
+    year_to = min(max(year_to, config['MIN_YEAR']), config['MAX_YEAR'])
+    if year_from > year_to:
+      return jsonify({'error': 'year_from must not be after year_to'}), 400
+  else:
+    year_from = year_to = None
 
-  hotspots = ResearchAnalytics.get_research_hotspots(year_range,limit)
-  return jsonify({'research_hotspots': hotspots})
+  snapshot = get_snapshot('research_hotspots', {'year_from': year_from, 'year_to': year_to})
+  return jsonify({
+    'research_hotspots': snapshot.result['research_hotspots'][:limit],
+    'snapshot': snapshot.metadata_dict()
+  })
 
 @bp.route('/analytics/collaboration-network', methods=['GET'])
-@cache.cached(timeout=600, query_string=True)
 def get_collaboration_network():
-  min_papers = request.args.get('min_papers', 2, type=int)
-  network = ResearchAnalytics.get_author_collaboration_network(min_papers)
-  return jsonify(network)
+  min_papers = min(max(request.args.get('min_papers', 2, type=int), 1),
+                   current_app.config['ANALYTICS_MAX_MIN_PAPERS'])
+  return snapshot_response('collaboration_network', {'min_papers': min_papers})
 
 @bp.route('/analytics/citation-patterns', methods=['GET'])
-@cache.cached(timeout=600)
 def get_citation_patterns():
-  patterns = ResearchAnalytics.analyze_citation_patterns()
-  return jsonify(patterns)
+  return snapshot_response('citation_patterns')
+
+@bp.route('/analytics/temporal-network', methods=['GET'])
+def get_temporal_network():
+  year_from = request.args.get('year_from', type=int)
+  year_to = request.args.get('year_to', type=int)
+
+  snapshot = get_snapshot('temporal_network')
+  series = [
+    entry for entry in snapshot.result['temporal_network']
+    if (year_from is None or entry['year'] >= year_from) and (year_to is None or entry['year'] <= year_to)
+  ]
+  return jsonify({'temporal_network': series, 'snapshot': snapshot.metadata_dict()})
+
+def _keyword_evolution_error(period_years, top_k):
+  if period_years is not None and period_years < 1:
+    return 'period_years must be at least 1'
+  if top_k < 1:
+    return 'top_k must be at least 1'
+  return None
 
 @bp.route('/analytics/keyword-evolution/<keyword>', methods=['GET'])
-@cache.cached(timeout=600, query_string=True)
+@cached(query_string=True, tags=('analytics',), stale_after='CACHE_ANALYTICS_STALE_AFTER')
 def get_keyword_evolution(keyword):
   years_back = request.args.get('years_back', 10, type=int)
-  evolution = ResearchAnalytics.get_temporal_keyword_evolution(keyword, years_back)
+  period_years = request.args.get('period_years', type=int)
+  top_k = request.args.get('top_k', 10, type=int)
+
+  error = _keyword_evolution_error(period_years, top_k)
+  if error:
+    return jsonify({'error': error}), 400
+
+  evolution = ResearchAnalytics.get_temporal_keyword_evolution(keyword, years_back, period_years, top_k)
   return jsonify(evolution)
 
+@bp.route('/analytics/keyword-evolution', methods=['GET'])
+@cached(query_string=True, tags=('analytics',), stale_after='CACHE_ANALYTICS_STALE_AFTER')
+def get_keyword_evolutions():
+  keywords = [kw for kw in request.args.get('keywords', '').split(',') if kw.strip()]
+  years_back = request.args.get('years_back', 10, type=int)
+  period_years = request.args.get('period_years', type=int)
+  top_k = request.args.get('top_k', 10, type=int)
+
+  if not keywords:
+    return jsonify({'error': 'keywords parameter required'}), 400
+
+  error = _keyword_evolution_error(period_years, top_k)
+  if error:
+    return jsonify({'error': error}), 400
+
+  max_terms = current_app.config['MAX_TREND_KEYWORDS']
+  if len(keywords) > max_terms:
+    return jsonify({'error': f'At most {max_terms} keywords per request'}), 400
+
+  evolutions = ResearchAnalytics.get_keyword_evolutions(keywords, years_back, period_years, top_k)
+  return jsonify({'evolutions': evolutions})
+
+@bp.route('/analytics/keyword-relationships', methods=['GET'])
+@cached(query_string=True, tags=('analytics',), stale_after='CACHE_ANALYTICS_STALE_AFTER')
+def get_keyword_relationships():
+  keywords = [kw for kw in request.args.get('keywords', '').split(',') if kw.strip()]
+  metric = request.args.get('metric', 'count').strip().lower()
+  limit = request.args.get('limit', 10, type=int)
+
+  if not keywords:
+    return jsonify({'error': 'keywords parameter required'}), 400
+
+  if metric not in KEYWORD_RELATIONSHIP_METRICS:
+    return jsonify({'error': f'metric must be one of {", ".join(KEYWORD_RELATIONSHIP_METRICS)}'}), 400
+
+  max_terms = current_app.config['MAX_TREND_KEYWORDS']
+  if len(keywords) > max_terms:
+    return jsonify({'error': f'At most {max_terms} keywords per request'}), 400
+
+  relationships = ResearchAnalytics.get_keyword_relationships_batch(keywords, metric, limit)
+  return jsonify({'metric': metric, 'relationships': relationships})
+
+@bp.route('/analytics/author-leaderboard', methods=['GET'])
+@cached(query_string=True, tags=('analytics',), stale_after='CACHE_ANALYTICS_STALE_AFTER')
+def get_author_leaderboard():
+  sort_by = request.args.get('sort', 'h_index').strip()
+  order = request.args.get('order', 'desc').strip().lower()
+  page = max(request.args.get('page', 1, type=int), 1)
+  per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+
+  if sort_by not in AUTHOR_LEADERBOARD_SORTS:
+    return jsonify({'error': f'sort must be one of {", ".join(AUTHOR_LEADERBOARD_SORTS)}'}), 400
+
+  if order not in ('asc', 'desc'):
+    return jsonify({'error': 'order must be asc or desc'}), 400
+
+  leaderboard = ResearchAnalytics.get_author_leaderboard(sort_by, order, page, per_page)
+  return jsonify({
+    'authors': leaderboard['items'],
+    'total': leaderboard['total'],
+    'pages': leaderboard['pages'],
+    'current_page': page,
+    'per_page': per_page,
+    'sort': sort_by,
+    'order': order
+  })
+
+@bp.route('/analytics/collaboration-matrix', methods=['POST'])
+def get_collaboration_matrix():
+  data = request.get_json()
+
+  if not isinstance(data, dict) or not isinstance(data.get('authors'), list):
+    return jsonify({'error': 'authors list required'}), 400
+
+  if not all(isinstance(author, str) for author in data['authors']):
+    return jsonify({'error': 'authors must be a list of names'}), 400
+
+  max_authors = current_app.config['MAX_COLLABORATION_AUTHORS']
+  if len(data['authors']) > max_authors:
+    return jsonify({'error': f'At most {max_authors} authors per request'}), 400
+
+  return jsonify(ResearchAnalytics.get_collaboration_matrix(data['authors']))
+
+@bp.route('/analytics/trending-keywords', methods=['GET'])
+def get_trending_keywords():
+  sort_by = request.args.get('sort', 'decayed_score').strip()
+  half_life = request.args.get('half_life', type=float)
+  window = request.args.get('window', type=int)
+  baseline = request.args.get('baseline', type=int)
+  page = max(request.args.get('page', 1, type=int), 1)
+  per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+
+  if sort_by not in TRENDING_SORTS:
+    return jsonify({'error': f'sort must be one of {", ".join(TRENDING_SORTS)}'}), 400
+
+  if any(value is not None and value <= 0 for value in (half_life, window, baseline)):
+    return jsonify({'error': 'half_life, window and baseline must be positive'}), 400
+
+  ranking = ResearchAnalytics.get_trending_keywords(sort_by, half_life, window, baseline)
+  total = len(ranking)
+
+  return jsonify({
+    'keywords': ranking[(page - 1) * per_page:page * per_page],
+    'total': total,
+    'pages': (total + per_page - 1) // per_page,
+    'current_page': page,
+    'per_page': per_page,
+    'sort': sort_by
+  })
+
+@bp.route('/analytics/citation-bursts', methods=['GET'])
+def get_citation_bursts():
+  k = min(max(request.args.get('k', 10, type=int), 1), 100)
+  window_days = request.args.get('window_days', current_app.config['CITATION_VELOCITY_WINDOW_DAYS'], type=int)
+  sort_by = request.args.get('sort', 'velocity').strip().lower()
+
+  if sort_by not in CITATION_BURST_SORTS:
+    return jsonify({'error': f'sort must be one of {", ".join(CITATION_BURST_SORTS)}'}), 400
+
+  if window_days < 1:
+    return jsonify({'error': 'window_days must be positive'}), 400
+  window_days = min(window_days, current_app.config['CITATION_VELOCITY_MAX_WINDOW_DAYS'])
+
+  papers = get_rising_papers(k, window_days, sort_by)
+
+  return jsonify({
+    'papers': papers,
+    'window_days': window_days,
+    'sort': sort_by
+  })
+
+@bp.route('/analytics/distinct-counts', methods=['GET'])
+@cached(query_string=True, tags=('analytics',), stale_after='CACHE_ANALYTICS_STALE_AFTER')
+def get_distinct_counts():
+  entity_type = request.args.get('entity', 'keyword').strip().lower()
+  metric = request.args.get('metric', 'authors').strip().lower()
+  names = [name.strip() for name in request.args.get('names', '').split(',') if name.strip()]
+  year_from = request.args.get('year_from', type=int)
+  year_to = request.args.get('year_to', type=int)
+
+  if (entity_type, metric) not in DISTINCT_METRICS:
+    supported = ', '.join(f'{entity}/{name}' for entity, name in DISTINCT_METRICS)
+    return jsonify({'error': f'entity/metric must be one of {supported}'}), 400
+
+  max_terms = current_app.config['MAX_TREND_KEYWORDS']
+  if len(names) > max_terms:
+    return jsonify({'error': f'At most {max_terms} names per request'}), 400
+
+  if not sketches_built():
+    return jsonify({'error': 'Distinct-count sketches are not built yet; run flask rebuild-sketches'}), 503
+
+  entity_ids = None
+  labels = {}
+  if entity_type == 'keyword' and names:
+    labels = dict(db.session.query(Keyword.id, Keyword.name)
+                  .filter(Keyword.name.in_([normalize_keyword(name) for name in names])).all())
+    entity_ids = list(labels)
+  elif entity_type == 'author' and names:
+    labels = dict(db.session.query(Author.id, Author.name).filter(Author.name.in_(names)).all())
+    entity_ids = list(labels)
+
+  union, per_entity = distinct_union(entity_type, metric, entity_ids, year_from, year_to)
+
+  return jsonify({
+    'entity': entity_type,
+    'metric': metric,
+    'year_from': year_from,
+    'year_to': year_to,
+    'estimate': union.count(),
+    'relative_error': union.relative_error,
+    'per_entity': [
+      {'name': labels[entity_id], 'estimate': per_entity[entity_id].count() if entity_id in per_entity else 0}
+      for entity_id in labels
+    ]
+  })
+
 @bp.route('/analytics/research-gaps', methods=['GET'])
-@cache.cached(timeout=600, query_string=True)
 def get_research_gaps():
   min_citations = request.args.get('min_citations', 50, type=int)
   max_recent = request.args.get('max_recent_papers', 5, type=int)
-  gaps = ResearchAnalytics.identify_research_gaps(min_citations, max_recent)
-  return jsonify({'research_gaps': gaps})
+  return snapshot_response('research_gaps', {
+    'min_citations': min_citations, 'max_recent_papers': max_recent
+  })
 
 @bp.route('/trends/papers-per-year', methods=['GET'])
-@cache.cached(timeout=600, query_string=True)
+@cached(query_string=True, tags=('trends',), stale_after='CACHE_TRENDS_STALE_AFTER')
 def papers_per_year():
   keyword = request.args.get('keyword', '').strip()
   author = request.args.get('author', '').strip()
 
-  query = db.session.query(Paper.year, func.count(Paper.id).label('count'))
-
+  matching_keywords = []
   if keyword:
-    query = query.join(Paper.keywords).filter(Keyword.name.contains(keyword.lower()))
+    matching_keywords = db.session.query(Keyword.id)\
+      .filter(Keyword.name.contains(keyword.lower())).limit(2).all()
+
+  if not author and not keyword:
+    results = [(year, count) for year, count, _ in year_totals()]
+  elif not author and len(matching_keywords) == 1:
+    results = db.session.query(KeywordYearStats.year, KeywordYearStats.paper_count)\
+      .filter(KeywordYearStats.keyword_id == matching_keywords[0].id)\
+      .order_by(KeywordYearStats.year).all()
+  else:
+    # Author filters and keyword substrings that match several keywords need
+    # distinct paper counts, which the rollup cannot provide.
+    query = db.session.query(Paper.year, func.count(func.distinct(Paper.id)).label('count'))
 
-  if author:
-    query = query.join(Paper.authors).filter(Author.name.contains(author))
+    if keyword:
+      query = query.join(Paper.keywords).filter(Keyword.name.contains(keyword.lower()))
 
-  results = query.group_by(Paper.year).order_by(Paper.year).all()
+    if author:
+      query = query.join(Paper.authors).filter(Author.name.contains(author))
+
+    results = query.group_by(Paper.year).order_by(Paper.year).all()
 
   return jsonify({
     'data': [{'year': year, 'count': count} for year, count in results],
@@ -544,35 +946,38 @@ def papers_per_year():
   })
 
 @bp.route('/trends/keywords-over-time', methods=['GET'])
-@cache.cached(timeout=600, query_string=True)
+@cached(query_string=True, tags=('trends',), stale_after='CACHE_TRENDS_STALE_AFTER')
 def keywords_over_time():
   limit = request.args.get('limit', 10, type=int)
-
-  top_keywords = db.session.query(Keyword.name, func.count(Paper.id).label('total_papers'))\
-    .join(Keyword.papers)\
-    .group_by(Keyword.name)\
-    .order_by(desc('total_papers'))\
-    .limit(limit).all()
-  
-  keyword_trends = {}
-  for keyword_name, _ in top_keywords:
-    yearly_counts = db.session.query(Paper.year, func.count(Paper.id).label('count'))\
-      .join(Paper.keywords)\
-      .filter(Keyword.name == keyword_name)\
-      .group_by(Paper.year)\
-      .order_by(Paper.year).all()
-    
-    keyword_trends[keyword_name] = [
-      {'year': year, 'count': count} for year, count in yearly_counts
-    ]
+  year_from = request.args.get('year_from', type=int)
+  year_to = request.args.get('year_to', type=int)
+  keywords = request.args.get('keywords', '').strip()
+
+  requested = None
+  if keywords:
+    requested = list(dict.fromkeys(
+      normalize_keyword(name) for name in keywords.split(',') if name.strip()
+    ))
+    max_terms = current_app.config['MAX_TREND_KEYWORDS']
+    if len(requested) > max_terms:
+      return jsonify({'error': f'At most {max_terms} keywords per request'}), 400
+
+  names, years, series = keyword_year_series(
+    limit=limit, keywords=requested, year_from=year_from, year_to=year_to
+  )
 
   return jsonify({
-    'trends': keyword_trends,
-    'top_keywords': [name for name, _ in top_keywords]
+    'trends': {
+      name: [{'year': year, 'count': count} for year, count in zip(years, counts) if count]
+      for name, counts in series.items()
+    },
+    'top_keywords': names,
+    'years': years,
+    'series': series
   })
 
 @bp.route('/trends/citation-analysis', methods=['GET'])
-@cache.cached(timeout=600)
+@cached(tags=('trends', 'papers'), stale_after='CACHE_TRENDS_STALE_AFTER')
 def citation_analysis():
   most_cited = Paper.query.order_by(desc(Paper.citation_count)).limit(10).all()
 
@@ -654,6 +1059,16 @@ def export_papers():
 @bp.route('/export/graph-data', methods=['POST'])
 def export_graph_data():
   data = request.get_json()
+  if data is not None and not isinstance(data, dict):
+    return jsonify({'error': 'Request body must be a JSON object'}), 400
+
+  format_type = (data or {}).get('format', 'json')
+  if not isinstance(format_type, str):
+    return jsonify({'error': 'format must be a string'}), 400
+  format_type = format_type.lower()
+
+  if format_type in GRAPH_STREAMERS:
+    return _stream_graph_export(data, format_type)
 
   if not data or 'node_ids' not in data:
     return jsonify({'error': 'node_ids required'}), 400
@@ -678,37 +1093,70 @@ def export_graph_data():
     }
   })
 
+def _stream_graph_export(data, format_type):
+  try:
+    data = export_schema.load({key: value for key, value in data.items() if key != 'format'}, unknown=EXCLUDE)
+  except ValidationError as e:
+    return jsonify({'error': 'Invalid export request', 'details': e.messages}), 400
+
+  node_ids = data.get('node_ids')
+  filters = data.get('filter', {})
+
+  if not node_ids and not filters:
+    return jsonify({'error': 'node_ids or filter required'}), 400
+
+  max_depth = current_app.config['MAX_SUBGRAPH_DEPTH']
+  depth = min(data.get('depth', 0), max_depth)
+
+  paper_ids, truncated = resolve_export_ids(
+    node_ids=node_ids,
+    year_from=filters.get('year_from'),
+    year_to=filters.get('year_to'),
+    keyword=(filters.get('keyword') or '').strip(),
+    min_citations=filters.get('min_citations'),
+    depth=depth,
+    max_nodes=current_app.config['MAX_EXPORT_NODES']
+  )
+
+  streamer, mimetype = GRAPH_STREAMERS[format_type]
+  chunk_size = current_app.config['EXPORT_CHUNK_SIZE']
+
+  return current_app.response_class(
+    stream_with_context(streamer(paper_ids, chunk_size)),
+    mimetype=mimetype,
+    headers={
+      'Content-Disposition': f'attachment; filename=graph.{format_type}',
+      'X-Export-Node-Count': str(len(paper_ids)),
+      'X-Export-Truncated': str(truncated).lower()
+    }
+  )
+
 @bp.route('/export/trends', methods=['GET'])
 def export_trends():
     trends = {}
 
-    yearly_counts = db.session.query(Paper.year, func.count(Paper.id).label('count'))\
-        .group_by(Paper.year).order_by(Paper.year).all()
-    trends['papers_per_year'] = [{'year': year, 'count': count} for year, count in yearly_counts]
+    yearly_counts = year_totals().all()
+    trends['papers_per_year'] = [{'year': year, 'count': count} for year, count, _ in yearly_counts]
 
-    top_keywords = db.session.query(Keyword.name, func.count(Paper.id).label('count'))\
-        .join(Keyword.papers)\
-        .group_by(Keyword.name)\
-        .order_by(desc('count'))\
+    top_keywords = keyword_totals()\
+        .order_by(desc('paper_count'), Keyword.name)\
         .limit(20).all()
-    trends['top_keywords'] = [{'keyword': name, 'count': count} for name, count in top_keywords]
+    trends['top_keywords'] = [{'keyword': name, 'count': count} for name, count, _, _ in top_keywords]
 
-    citation_stats = db.session.query(
-      func.avg(Paper.citation_count).label('avg_citations'),
-      func.max(Paper.citation_count).label('max_citations'),
-      func.count(Paper.id).label('total_papers')
-    ).first()
+    total_papers = sum(count for _, count, _ in yearly_counts)
+    total_citations = sum(citations for _, _, citations in yearly_counts)
+    max_citations = db.session.query(func.max(Paper.citation_count)).scalar()
 
     trends['citation_statistics'] = {
-      'average_citations': float(citation_stats.avg_citations or 0),
-      'max_citations': citation_stats.max_citations or 0,
-      'total_papers': citation_stats.total_papers
+      'average_citations': float(total_citations / total_papers) if total_papers else 0.0,
+      'max_citations': max_citations or 0,
+      'total_papers': total_papers
     }
 
     return jsonify({
       'trends': trends,
       'export_info': {
-        'exported_at': func.now(),
+        'exported_at': datetime.utcnow().isoformat(),
         'data_types': ['papers_per_year', 'top_keywords', 'citation_statistics']
       }
     })
@@ -888,8 +1336,15 @@ def health_check():
     }
   })
 
+@bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+  backend = cache.cache
+  if hasattr(backend, 'stats'):
+    return jsonify(backend.stats())
+  return jsonify({'backend': type(backend).__name__})
+
 @bp.route('/statistics/overview', methods=['GET'])
-@cache.cached(timeout=300)
+@cached(tags=('statistics',))
 def get_statistics():
   try:
 
@@ -948,20 +1403,18 @@ def get_statistics():
   
 
 @bp.route('/statistics/trends', methods=['GET'])
-@cache.cached(timeout=600)
+@cached(tags=('statistics', 'trends', 'papers'), stale_after='CACHE_TRENDS_STALE_AFTER')
 def get_trending_stats():
   try:
-    current_year = db.session.query(func.max(Paper.year)).scalar() or 2023
-    recent_papers = Paper.query.filter(Paper.year >= current_year - 1).count()
+    current_year = db.session.query(func.max(YearStats.year)).scalar() or 2023
+    recent_papers = db.session.query(func.sum(YearStats.paper_count))\
+      .filter(YearStats.year >= current_year - 1).scalar() or 0
 
     recent_highly_cited = Paper.query.filter(Paper.year >= current_year - 2)\
       .order_by(desc(Paper.citation_count)).limit(5).all()
     
-    trending_keywords = db.session.query(
-      Keyword.name,
-      func.count(Paper.id).label('recent_count')
-    ).join(Keyword.papers).filter(Paper.year >= current_year - 2)\
-     .group_by(Keyword.name).order_by(desc('recent_count')).limit(10).all()
+    trending_keywords = keyword_totals(year_from=current_year - 2)\
+      .order_by(desc('paper_count'), Keyword.name).limit(10).all()
 
     return jsonify({
       'recent_activity': {
@@ -969,7 +1422,7 @@ def get_trending_stats():
         'current_year_range': f"{current_year-1}-{current_year}"
       },
       'highly_cited_recent': [paper.to_dict() for paper in recent_highly_cited],
-      'trending_keywords': [{'name': name, 'count': count} for name, count in trending_keywords]
+      'trending_keywords': [{'name': name, 'count': count} for name, count, _, _ in trending_keywords]
     })
   
   except Exception as e:
@@ -0,0 +1,257 @@
+from app.models import AnalyticsSnapshot, ChangeLog, get_data_version, prune_change_log
+from app.analytics import ResearchAnalytics
+from app.bursts import process_new_citations
+from app.caching import revalidator, single_flight
+from app.temporal import compute_temporal_network_stats
+from app import db, cache
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import case, func
+from types import SimpleNamespace
+import json
+import os
+import threading
+import time
+
+
+def _research_hotspots(year_from=None, year_to=None):
+  # one snapshot per year range holds the top ANALYTICS_MAX_LIMIT; routes slice it
+  year_range = (year_from, year_to) if year_from and year_to else None
+  return {'research_hotspots': ResearchAnalytics.get_research_hotspots(
+    year_range, current_app.config['ANALYTICS_MAX_LIMIT']
+  )}
+
+
+def _citation_patterns():
+  return ResearchAnalytics.analyze_citation_patterns()
+
+
+def _collaboration_network(min_papers=2):
+  return ResearchAnalytics.get_author_collaboration_network(min_papers)
+
+
+def _research_gaps(min_citations=50, max_recent_papers=5):
+  ResearchAnalytics.refresh_research_gaps(min_citations, max_recent_papers)
+  return {'research_gaps': ResearchAnalytics.identify_research_gaps(min_citations, max_recent_papers)}
+
+
+# name -> (task, parameters of the default snapshot kept warm by the scheduler)
+SNAPSHOT_TASKS = {
+  'research_hotspots': (_research_hotspots, {'year_from': None, 'year_to': None}),
+  'citation_patterns': (_citation_patterns, {}),
+  'collaboration_network': (_collaboration_network, {'min_papers': 2}),
+  'research_gaps': (_research_gaps, {'min_citations': 50, 'max_recent_papers': 5}),
+  'temporal_network': (compute_temporal_network_stats, {})
+}
+
+
+def _params_key(params):
+  return json.dumps(params or {}, sort_keys=True)
+
+
+def _read_marker(name, params_key):
+  return f'snapshot_read:{name}:{params_key}'
+
+
+def is_default_params(name, params_key):
+  return _params_key(SNAPSHOT_TASKS[name][1]) == params_key
+
+
+def recently_read(name, params_key):
+  return cache.get(_read_marker(name, params_key)) is not None
+
+
+def latest_snapshot(name, params=None):
+  return AnalyticsSnapshot.query\
+    .filter_by(name=name, params=_params_key(params))\
+    .order_by(AnalyticsSnapshot.id.desc()).first()
+
+
+def store_snapshot(name, params, result, data_version, duration_ms=None):
+  key = _params_key(params)
+  snapshot = AnalyticsSnapshot(
+    name=name,
+    params=key,
+    result=result,
+    data_version=data_version,
+    duration_ms=duration_ms,
+    computed_at=datetime.utcnow()
+  )
+  db.session.add(snapshot)
+  db.session.flush()
+
+  expired = [snapshot_id for (snapshot_id,) in db.session.query(AnalyticsSnapshot.id)
+             .filter_by(name=name, params=key)
+             .order_by(AnalyticsSnapshot.id.desc())
+             .offset(current_app.config['ANALYTICS_SNAPSHOT_RETENTION'])]
+  if expired:
+    AnalyticsSnapshot.query.filter(AnalyticsSnapshot.id.in_(expired))\
+      .delete(synchronize_session=False)
+
+  db.session.commit()
+  return snapshot
+
+
+def compute_snapshot(name, params=None):
+  task, _ = SNAPSHOT_TASKS[name]
+  params = params or {}
+
+  # The version is read before computing, so writes that land while the
+  # task runs leave the snapshot behind and count towards the next refresh.
+  version = get_data_version()
+  started = time.monotonic()
+  result = task(**params)
+
+  return store_snapshot(name, params, result, version,
+                        duration_ms=int((time.monotonic() - started) * 1000))
+
+
+def get_snapshot(name, params=None):
+  """Latest stored snapshot, computed inline only if none exists yet.
+
+  Concurrent first requests share one computation through single_flight.
+  A stored snapshot that refresh_due_snapshots would recompute is still
+  served, and recomputed in the background, so snapshots stay fresh when
+  no scheduler runs. Reads are recorded for ANALYTICS_REFRESH_READ_WINDOW
+  seconds so the refresh keeps this parameter set warm.
+  """
+  config = current_app.config
+  params_key = _params_key(params)
+  key = f'snapshot:{name}:{params_key}'
+  cache.add(_read_marker(name, params_key), 1, timeout=config['ANALYTICS_REFRESH_READ_WINDOW'])
+
+  snapshot = latest_snapshot(name, params)
+  if snapshot is None:
+    return single_flight.do(key, lambda: latest_snapshot(name, params), lambda: compute_snapshot(name, params))
+
+  if snapshot_is_due(snapshot, config['ANALYTICS_REFRESH_MIN_CHANGES'], config['ANALYTICS_REFRESH_MAX_AGE']):
+    revalidator.submit(key, lambda: compute_snapshot(name, params))
+  return snapshot
+
+
+def pending_changes(snapshot):
+  """(writes, bulk resets) recorded in the change log since the snapshot."""
+  return db.session.query(
+    func.count(ChangeLog.id),
+    func.count(case((ChangeLog.action == 'reset', 1)))
+  ).filter(ChangeLog.id > snapshot.data_version).one()
+
+
+def snapshot_is_due(snapshot, min_changes, max_age_seconds):
+  changes, resets = pending_changes(snapshot)
+  if changes == 0:
+    return False
+  if resets or changes >= min_changes:
+    return True
+  return snapshot.computed_at + timedelta(seconds=max_age_seconds) <= datetime.utcnow()
+
+
+def refresh_due_snapshots(force=False):
+  """Recompute every kept snapshot that enough writes have invalidated.
+
+  Only the default parameter set of each task and the sets read within
+  ANALYTICS_REFRESH_READ_WINDOW are kept; the default set is created if it
+  is missing. Snapshots with fewer than ANALYTICS_REFRESH_MIN_CHANGES new
+  change log entries (and no restore) wait until ANALYTICS_REFRESH_MAX_AGE
+  has passed.
+  """
+  config = current_app.config
+  refreshed = []
+
+  latest_ids = db.session.query(func.max(AnalyticsSnapshot.id))\
+    .group_by(AnalyticsSnapshot.name, AnalyticsSnapshot.params)
+  snapshots = AnalyticsSnapshot.query.filter(AnalyticsSnapshot.id.in_(latest_ids)).all()
+  existing = {(snapshot.name, snapshot.params) for snapshot in snapshots}
+
+  for name, (_, default_params) in SNAPSHOT_TASKS.items():
+    if (name, _params_key(default_params)) not in existing:
+      refreshed.append(compute_snapshot(name, default_params))
+
+  for snapshot in snapshots:
+    if snapshot.name not in SNAPSHOT_TASKS:
+      continue
+    if not is_default_params(snapshot.name, snapshot.params) and not recently_read(snapshot.name, snapshot.params):
+      continue
+    if force or snapshot_is_due(snapshot, config['ANALYTICS_REFRESH_MIN_CHANGES'],
+                                config['ANALYTICS_REFRESH_MAX_AGE']):
+      refreshed.append(compute_snapshot(snapshot.name, json.loads(snapshot.params)))
+
+  return refreshed
+
+
+def refresh_author_metrics_if_due(force=False):
+  """Recompute the author leaderboard under the same rules as snapshots.
+
+  Returns the refresh result, or None when the stored table is current
+  enough.
+  """
+  config = current_app.config
+  version, computed_at = ResearchAnalytics.author_metrics_state()
+  if not force and version is not None and not snapshot_is_due(
+      SimpleNamespace(data_version=version, computed_at=computed_at),
+      config['ANALYTICS_REFRESH_MIN_CHANGES'], config['ANALYTICS_REFRESH_MAX_AGE']):
+    return None
+  return ResearchAnalytics.refresh_author_metrics()
+
+
+class AnalyticsScheduler:
+  """Daemon thread that periodically streams new citations into the burst
+  state, runs refresh_due_snapshots, refreshes the author leaderboard and
+  prunes the change log.
+
+  Only one process per deployment should run it; with several workers,
+  leave ANALYTICS_SCHEDULER_ENABLED off and call `flask refresh-analytics`
+  from cron instead. Without either, reads still refresh due snapshots in
+  the background through get_snapshot.
+  """
+
+  def __init__(self):
+    self.app = None
+    self._thread = None
+    self._stop = threading.Event()
+
+  def init_app(self, app):
+    self.app = app
+    if not app.config['ANALYTICS_SCHEDULER_ENABLED'] or app.testing:
+      return
+    # Under the reloader only the child process serves requests.
+    if app.debug and os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
+      return
+    self.start()
+
+  def start(self):
+    if self._thread is not None and self._thread.is_alive():
+      return
+    self._stop.clear()
+    self._thread = threading.Thread(target=self._run, name='analytics-scheduler', daemon=True)
+    self._thread.start()
+
+  def stop(self):
+    self._stop.set()
+
+  def _run(self):
+    interval = self.app.config['ANALYTICS_SCHEDULER_INTERVAL']
+    while not self._stop.wait(interval):
+      with self.app.app_context():
+        try:
+          process_new_citations()
+          refreshed = refresh_due_snapshots()
+          for snapshot in refreshed:
+            self.app.logger.info(
+              f'Analytics snapshot {snapshot.name} {snapshot.params} refreshed '
+              f'at version {snapshot.data_version} in {snapshot.duration_ms}ms'
+            )
+          metrics = refresh_author_metrics_if_due()
+          if metrics is not None:
+            self.app.logger.info(f'Author metrics refreshed at version {metrics["data_version"]}')
+          pruned = prune_change_log(self.app.config['CHANGE_LOG_RETENTION'])
+          if pruned:
+            self.app.logger.info(f'Pruned {pruned} change log rows')
+        except Exception as e:
+          db.session.rollback()
+          self.app.logger.error(f'Analytics snapshot refresh failed: {str(e)}')
+        finally:
+          db.session.remove()
+
+
+scheduler = AnalyticsScheduler()
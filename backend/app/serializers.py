@@ -100,8 +100,10 @@ class AnalyticsSchema(Schema):
     min_papers = fields.Int(validate=validate.Range(min=1))
 
 class ExportSchema(Schema):
-    format = fields.Str(validate=validate.OneOf(['json', 'csv', 'xml']))
+    format = fields.Str(validate=validate.OneOf(['json', 'csv', 'xml', 'graphml', 'gexf']))
     node_ids = fields.List(fields.Int())
+    filter = fields.Nested(GraphFilterSchema)
+    depth = fields.Int(validate=validate.Range(min=0, max=10))
     include_metadata = fields.Bool()
 
 class UploadSchema(Schema):
@@ -0,0 +1,155 @@
+from app.models import Paper, PaperSimilarity
+from app.citation_index import get_citation_index
+from app import db
+from datetime import datetime
+from flask import current_app
+import numpy as np
+import scipy.sparse as sp
+
+SIMILARITY_METHODS = ('cocitation', 'coupling')
+
+
+def _adjacency_matrix(index):
+  n = index.n_nodes
+  indices = np.asarray(index.out_indices, dtype=np.int32)
+  indptr = np.asarray(index.out_indptr, dtype=np.int64)
+  data = np.ones(len(indices), dtype=np.float32)
+  return sp.csr_matrix((data, indices, indptr), shape=(n, n))
+
+
+def _top_k_rows(block, row_offset, degrees, top_k):
+  # Scores are Salton's cosine: shared / sqrt(deg_a * deg_b), where the
+  # degree is times cited for co-citation and reference count for coupling.
+  for local_row in range(block.shape[0]):
+    row = row_offset + local_row
+    start, end = block.indptr[local_row], block.indptr[local_row + 1]
+    cols = block.indices[start:end]
+    shared = block.data[start:end]
+
+    keep = cols != row
+    cols, shared = cols[keep], shared[keep]
+    if len(cols) == 0:
+      continue
+
+    scores = shared / np.sqrt(degrees[row] * degrees[cols])
+    if len(cols) > top_k:
+      best = np.argpartition(-scores, top_k - 1)[:top_k]
+      cols, shared, scores = cols[best], shared[best], scores[best]
+
+    yield row, cols, shared, scores
+
+
+def compute_citation_similarity(top_k=None, block_size=None):
+  """Recompute co-citation and bibliographic coupling neighbours.
+
+  With A the citing x cited adjacency, co-citation counts are AᵀA and
+  coupling counts are AAᵀ. Both products are evaluated one row block at a
+  time so only block_size rows of the result are ever materialised, and
+  only the top_k neighbours per paper are persisted.
+  """
+
+  top_k = top_k or current_app.config['SIMILARITY_TOP_K']
+  block_size = block_size or current_app.config['SIMILARITY_BLOCK_SIZE']
+
+  index = get_citation_index()
+  A = _adjacency_matrix(index)
+  At = A.T.tocsr()
+  paper_ids = index.paper_ids
+
+  operands = {
+    'cocitation': (At, A, np.asarray(At.sum(axis=1)).ravel()),
+    'coupling': (A, At, np.asarray(A.sum(axis=1)).ravel())
+  }
+
+  computed_at = datetime.utcnow()
+  counts = {}
+
+  try:
+    PaperSimilarity.query.delete()
+
+    for method in SIMILARITY_METHODS:
+      left, right, degrees = operands[method]
+      stored = 0
+
+      for start in range(0, index.n_nodes, block_size):
+        block = (left[start:start + block_size] @ right).tocsr()
+        rows = []
+        for row, cols, shared, scores in _top_k_rows(block, start, degrees, top_k):
+          paper_id = int(paper_ids[row])
+          for col, count, score in zip(cols.tolist(), shared.tolist(), scores.tolist()):
+            rows.append({
+              'paper_id': paper_id,
+              'related_paper_id': int(paper_ids[col]),
+              'method': method,
+              'shared_count': int(count),
+              'score': float(score),
+              'computed_at': computed_at
+            })
+
+        if rows:
+          db.session.execute(PaperSimilarity.__table__.insert(), rows)
+          stored += len(rows)
+
+      counts[method] = stored
+
+    db.session.commit()
+
+  except Exception:
+    db.session.rollback()
+    raise
+
+  return {
+    'papers': index.n_nodes,
+    'citations': index.n_edges,
+    'top_k': top_k,
+    'stored': counts,
+    'computed_at': computed_at.isoformat()
+  }
+
+
+def get_related_papers(paper_id, method='combined', limit=10):
+  query = db.session.query(
+    PaperSimilarity.related_paper_id,
+    PaperSimilarity.method,
+    PaperSimilarity.shared_count,
+    PaperSimilarity.score
+  ).filter(PaperSimilarity.paper_id == paper_id)
+
+  if method in SIMILARITY_METHODS:
+    query = query.filter(PaperSimilarity.method == method)\
+      .order_by(PaperSimilarity.score.desc()).limit(limit)
+
+  related = {}
+  for related_id, row_method, shared_count, score in query:
+    entry = related.setdefault(related_id, {
+      'paper_id': related_id,
+      'score': 0.0,
+      'cocitation_count': 0,
+      'coupling_count': 0
+    })
+    entry['score'] += score
+    entry[f'{row_method}_count'] = shared_count
+
+  ranked = sorted(related.values(), key=lambda x: x['score'], reverse=True)[:limit]
+  if not ranked:
+    return []
+
+  papers = {
+    pid: (title, year, citation_count)
+    for pid, title, year, citation_count in db.session.query(
+      Paper.id, Paper.title, Paper.year, Paper.citation_count
+    ).filter(Paper.id.in_([entry['paper_id'] for entry in ranked]))
+  }
+
+  results = []
+  for entry in ranked:
+    if entry['paper_id'] not in papers:
+      continue
+    title, year, citation_count = papers[entry['paper_id']]
+    results.append({
+      **entry,
+      'title': title,
+      'year': year,
+      'citation_count': citation_count
+    })
+  return results
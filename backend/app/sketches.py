@@ -0,0 +1,206 @@
+from app.models import Paper, Citation, DistinctSketch, StreamCursor, paper_authors, paper_keywords
+from app.hll import HyperLogLog
+from app.utils import chunk_list
+from app import db
+from collections import defaultdict
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import and_, event, literal, or_, select, tuple_
+from sqlalchemy.orm import Session, attributes
+
+DISTINCT_METRICS = (
+  ('keyword', 'authors'),
+  ('author', 'collaborators'),
+  ('author', 'citing_papers'),
+  ('year', 'authors')
+)
+
+_KEY_COLUMNS = ('entity_type', 'entity_id', 'year', 'metric')
+
+# stream_cursor row left by the distinct_sketch migration on a database that
+# already had papers; the sketches miss that data until rebuild_sketches runs
+SKETCH_BACKFILL = 'distinct_sketch_backfill'
+
+
+def _sketch_queries(paper_ids=None, citation_ids=None):
+  """(entity_type, metric, select of (entity_id, year, item)) per sketch kind.
+
+  Without ids the selects cover the whole database (rebuild); with ids they
+  only cover the given papers and citations (incremental updates).
+  """
+  paper_filter = Paper.id.in_(paper_ids) if paper_ids is not None else None
+  co_author = paper_authors.alias('co_author')
+  citing = Paper.__table__.alias('citing')
+
+  queries = [
+    ('keyword', 'authors',
+     select(paper_keywords.c.keyword_id, Paper.year, paper_authors.c.author_id)
+     .join(Paper, Paper.id == paper_keywords.c.paper_id)
+     .join(paper_authors, paper_authors.c.paper_id == paper_keywords.c.paper_id)),
+    ('author', 'collaborators',
+     select(paper_authors.c.author_id, Paper.year, co_author.c.author_id)
+     .join(Paper, Paper.id == paper_authors.c.paper_id)
+     .join(co_author, and_(co_author.c.paper_id == paper_authors.c.paper_id,
+                           co_author.c.author_id != paper_authors.c.author_id))),
+    ('year', 'authors',
+     select(literal(0), Paper.year, paper_authors.c.author_id)
+     .join(Paper, Paper.id == paper_authors.c.paper_id))
+  ]
+  if paper_filter is not None:
+    queries = [(entity_type, metric, query.where(paper_filter)) for entity_type, metric, query in queries]
+
+  citing_papers = select(paper_authors.c.author_id, citing.c.year, Citation.citing_paper_id)\
+    .select_from(Citation)\
+    .join(paper_authors, paper_authors.c.paper_id == Citation.cited_paper_id)\
+    .join(citing, citing.c.id == Citation.citing_paper_id)
+  if paper_ids is not None or citation_ids is not None:
+    citing_papers = citing_papers.where(or_(
+      Citation.id.in_(citation_ids or []),
+      Citation.cited_paper_id.in_(paper_ids or []),
+      Citation.citing_paper_id.in_(paper_ids or [])
+    ))
+  queries.append(('author', 'citing_papers', citing_papers))
+
+  return queries
+
+
+@event.listens_for(Session, 'before_flush')
+def capture_sketch_changes(session, flush_context, instances):
+  papers = [obj for obj in session.new if isinstance(obj, Paper)]
+  for obj in session.dirty:
+    if isinstance(obj, Paper) and obj not in session.deleted and any(
+        attributes.get_history(obj, key).has_changes() for key in ('year', 'authors', 'keywords')):
+      papers.append(obj)
+  citations = [obj for obj in session.new if isinstance(obj, Citation)]
+
+  if papers or citations:
+    session.info['sketch_pending'] = (papers, citations)
+
+
+@event.listens_for(Session, 'after_flush')
+def apply_sketch_changes(session, flush_context):
+  # Sketches only ever grow: re-adding a paper's current authors is a no-op
+  # for items already counted, and removals stay counted until a rebuild.
+  pending = session.info.pop('sketch_pending', None)
+  if not pending:
+    return
+
+  papers, citations = pending
+  paper_ids = [obj.id for obj in papers if obj.id is not None]
+  citation_ids = [obj.id for obj in citations if obj.id is not None]
+
+  connection = session.connection()
+  updates = defaultdict(set)
+  for entity_type, metric, query in _sketch_queries(paper_ids, citation_ids):
+    for entity_id, year, item in connection.execute(query):
+      updates[(entity_type, entity_id, year, metric)].add(item)
+
+  if updates:
+    _merge_updates(connection, updates, current_app.config['HLL_PRECISION'])
+
+
+def _merge_updates(connection, updates, precision):
+  table = DistinctSketch.__table__
+  key_columns = [table.c[name] for name in _KEY_COLUMNS]
+
+  existing = {}
+  for chunk in chunk_list(list(updates), 200):
+    rows = connection.execute(
+      select(*key_columns, table.c.registers)
+      .where(tuple_(*key_columns).in_(chunk))
+      .with_for_update()
+    )
+    for entity_type, entity_id, year, metric, registers in rows:
+      existing[(entity_type, entity_id, year, metric)] = registers
+
+  now = datetime.utcnow()
+  inserts = []
+  for key, items in updates.items():
+    stored = existing.get(key)
+    sketch = HyperLogLog.from_bytes(stored) if stored is not None else HyperLogLog(precision)
+    registers = sketch.update(items).to_bytes()
+
+    if stored is None:
+      inserts.append({**dict(zip(_KEY_COLUMNS, key)), 'registers': registers, 'updated_at': now})
+    elif registers != stored:
+      connection.execute(
+        table.update()
+        .where(*[column == value for column, value in zip(key_columns, key)])
+        .values(registers=registers, updated_at=now)
+      )
+
+  if inserts:
+    connection.execute(table.insert(), inserts)
+
+
+def rebuild_sketches():
+  """Recompute every sketch from the association tables.
+
+  Each kind is streamed ordered by (entity, year), so only the sketch
+  currently being filled is held in memory.
+  """
+  precision = current_app.config['HLL_PRECISION']
+  table = DistinctSketch.__table__
+  db.session.execute(table.delete())
+  now = datetime.utcnow()
+
+  for entity_type, metric, query in _sketch_queries():
+    entity_column, year_column = list(query.selected_columns)[:2]
+    rows = db.session.execute(query.order_by(entity_column, year_column)
+                              .execution_options(yield_per=50000))
+    batch = []
+    current_key = None
+    sketch = None
+
+    for entity_id, year, item in rows:
+      if (entity_id, year) != current_key:
+        if sketch is not None:
+          batch.append({'entity_type': entity_type, 'entity_id': current_key[0], 'year': current_key[1],
+                        'metric': metric, 'registers': sketch.to_bytes(), 'updated_at': now})
+        current_key = (entity_id, year)
+        sketch = HyperLogLog(precision)
+      sketch.add(item)
+
+      if len(batch) >= 1000:
+        db.session.execute(table.insert(), batch)
+        batch = []
+
+    if sketch is not None:
+      batch.append({'entity_type': entity_type, 'entity_id': current_key[0], 'year': current_key[1],
+                    'metric': metric, 'registers': sketch.to_bytes(), 'updated_at': now})
+    if batch:
+      db.session.execute(table.insert(), batch)
+
+  StreamCursor.query.filter_by(name=SKETCH_BACKFILL).delete()
+  db.session.commit()
+  return {'sketches': DistinctSketch.query.count()}
+
+
+def sketches_built():
+  return db.session.get(StreamCursor, SKETCH_BACKFILL) is None
+
+
+def distinct_union(entity_type, metric, entity_ids=None, year_from=None, year_to=None):
+  """Merge the stored sketches for entity_ids over a year range.
+
+  Returns (union sketch, {entity_id: sketch}); call .count() for estimates.
+  """
+  query = db.session.query(DistinctSketch.entity_id, DistinctSketch.registers)\
+    .filter(DistinctSketch.entity_type == entity_type, DistinctSketch.metric == metric)
+  if entity_ids is not None:
+    query = query.filter(DistinctSketch.entity_id.in_(entity_ids))
+  if year_from is not None:
+    query = query.filter(DistinctSketch.year >= year_from)
+  if year_to is not None:
+    query = query.filter(DistinctSketch.year <= year_to)
+
+  per_entity = {}
+  for entity_id, registers in query:
+    sketch = HyperLogLog.from_bytes(registers)
+    if entity_id in per_entity:
+      per_entity[entity_id].merge(sketch)
+    else:
+      per_entity[entity_id] = sketch
+
+  union = HyperLogLog.union(per_entity.values(), current_app.config['HLL_PRECISION'])
+  return union, per_entity
@@ -0,0 +1,137 @@
+from app.models import Paper, Citation
+from app import db
+from collections import defaultdict
+
+
+class TemporalNetworkState:
+  """Cumulative citation network grown one publication year at a time.
+
+  A citation joins the network in the later of its two papers' years. Weak
+  components are tracked with union-find, and triangle and wedge counts
+  with per-node neighbour sets, so adding an edge only touches its two
+  endpoints and their common neighbours.
+  """
+
+  def __init__(self, n):
+    self.parent = list(range(n))
+    self.size = [1] * n
+    self.neighbours = [set() for _ in range(n)]
+    self.triangles = [0] * n
+    self.nodes = 0
+    self.edges = 0
+    self.merges = 0
+    self.largest_component = 0
+    self.triangle_total = 0
+    self.wedge_total = 0
+    self.clustering_sum = 0.0
+
+  def _find(self, x):
+    parent = self.parent
+    while parent[x] != x:
+      parent[x] = parent[parent[x]]
+      x = parent[x]
+    return x
+
+  def _local_clustering(self, x):
+    degree = len(self.neighbours[x])
+    return 2 * self.triangles[x] / (degree * (degree - 1)) if degree > 1 else 0.0
+
+  def add_nodes(self, count):
+    self.nodes += count
+    if count and not self.largest_component:
+      self.largest_component = 1
+
+  def add_edge(self, u, v):
+    self.edges += 1
+
+    ru, rv = self._find(u), self._find(v)
+    if ru != rv:
+      if self.size[ru] < self.size[rv]:
+        ru, rv = rv, ru
+      self.parent[rv] = ru
+      self.size[ru] += self.size[rv]
+      self.merges += 1
+      self.largest_component = max(self.largest_component, self.size[ru])
+
+    nu, nv = self.neighbours[u], self.neighbours[v]
+    if v in nu:
+      return
+
+    common = nu & nv if len(nu) <= len(nv) else nv & nu
+    touched = common | {u, v}
+    for x in touched:
+      self.clustering_sum -= self._local_clustering(x)
+    for x in (u, v):
+      degree = len(self.neighbours[x])
+      self.wedge_total -= degree * (degree - 1) // 2
+
+    nu.add(v)
+    nv.add(u)
+    shared = len(common)
+    self.triangles[u] += shared
+    self.triangles[v] += shared
+    for w in common:
+      self.triangles[w] += 1
+    self.triangle_total += shared
+
+    for x in touched:
+      self.clustering_sum += self._local_clustering(x)
+    for x in (u, v):
+      degree = len(self.neighbours[x])
+      self.wedge_total += degree * (degree - 1) // 2
+
+  def stats(self):
+    n = self.nodes
+    return {
+      'nodes': n,
+      'edges': self.edges,
+      'density': self.edges / (n * (n - 1)) if n > 1 else 0,
+      'weak_components': n - self.merges,
+      'largest_wcc': self.largest_component,
+      'largest_wcc_fraction': self.largest_component / n if n else 0,
+      'avg_clustering': max(self.clustering_sum, 0.0) / n if n else 0,
+      'transitivity': 3 * self.triangle_total / self.wedge_total if self.wedge_total else 0
+    }
+
+
+def temporal_network_stats(papers, edges):
+  """Cumulative network statistics at the end of every publication year.
+
+  papers is an iterable of (paper_id, year) and edges of (citing_id,
+  cited_id); both are consumed once.
+  """
+  position = {}
+  year_of = []
+  papers_per_year = defaultdict(int)
+  for paper_id, year in papers:
+    position[paper_id] = len(year_of)
+    year_of.append(year)
+    papers_per_year[year] += 1
+
+  edges_per_year = defaultdict(list)
+  for citing_id, cited_id in edges:
+    u = position.get(citing_id)
+    v = position.get(cited_id)
+    if u is not None and v is not None:
+      edges_per_year[max(year_of[u], year_of[v])].append((u, v))
+
+  state = TemporalNetworkState(len(year_of))
+  series = []
+  for year in sorted(papers_per_year):
+    state.add_nodes(papers_per_year[year])
+    for u, v in edges_per_year.get(year, ()):
+      state.add_edge(u, v)
+    series.append({
+      'year': year,
+      'papers_added': papers_per_year[year],
+      'citations_added': len(edges_per_year.get(year, ())),
+      **state.stats()
+    })
+  return series
+
+
+def compute_temporal_network_stats():
+  papers = db.session.query(Paper.id, Paper.year).execution_options(yield_per=50000)
+  edges = db.session.query(Citation.citing_paper_id, Citation.cited_paper_id)\
+    .execution_options(yield_per=50000)
+  return {'temporal_network': temporal_network_stats(papers, edges)}
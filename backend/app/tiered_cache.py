@@ -0,0 +1,374 @@
+from collections import OrderedDict
+from flask_caching.backends.base import BaseCache
+from werkzeug.utils import import_string
+import json
+import logging
+import pickle
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+def _payload_size(value, depth=0):
+  """Serialised size of a frozen response from its raw bytes, or None.
+
+  Covers nested tuples and lists of bytes, str and numbers (what cached()
+  stores) without pickling; anything else returns None.
+  """
+  if isinstance(value, (bytes, bytearray, str)):
+    return len(value)
+  if value is None or isinstance(value, (bool, int, float)):
+    return 9
+  if isinstance(value, (tuple, list)) and depth < 4 and len(value) <= 256:
+    total = 8
+    for item in value:
+      size = _payload_size(item, depth + 1)
+      if size is None:
+        return None
+      total += size + 2
+    return total
+  return None
+
+
+class LocalLRU:
+  """Thread-safe LRU of already deserialised values, bounded by bytes.
+
+  Sizes approximate what the entry costs in the remote tier: frozen
+  responses are measured from their bytes, other values are pickled once.
+  Values larger than max_item_bytes are never kept locally, and a key
+  found too large is remembered so remote hits on it skip the sizing.
+  """
+
+  _MAX_OVERSIZED = 10000
+
+  def __init__(self, max_bytes, max_item_bytes):
+    self.max_bytes = max_bytes
+    self.max_item_bytes = max_item_bytes
+    self.bytes = 0
+    self.evictions = 0
+    self._entries = OrderedDict()
+    self._oversized = {}
+    self._lock = threading.Lock()
+
+  def __len__(self):
+    return len(self._entries)
+
+  def get(self, key):
+    """(found, value); expired entries count as missing."""
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        return False, None
+      expires_at, value, size = entry
+      if expires_at <= time.monotonic():
+        del self._entries[key]
+        self.bytes -= size
+        return False, None
+      self._entries.move_to_end(key)
+      return True, value
+
+  def set(self, key, value, timeout):
+    size = _payload_size(value)
+    if size is None:
+      size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+    with self._lock:
+      self._pop(key)
+      if timeout <= 0:
+        return False
+      if size > self.max_item_bytes:
+        if len(self._oversized) >= self._MAX_OVERSIZED:
+          self._oversized.clear()
+        self._oversized[key] = time.monotonic() + timeout
+        return False
+      while self._entries and self.bytes + size > self.max_bytes:
+        _, (_, _, evicted) = self._entries.popitem(last=False)
+        self.bytes -= evicted
+        self.evictions += 1
+      self._entries[key] = (time.monotonic() + timeout, value, size)
+      self.bytes += size
+      return True
+
+  def fill(self, key, value, timeout):
+    """set for a value just read from the remote tier, skipping known oversized keys."""
+    with self._lock:
+      oversized_until = self._oversized.get(key)
+      if oversized_until is not None and oversized_until > time.monotonic():
+        return False
+    return self.set(key, value, timeout)
+
+  def _pop(self, key):
+    self._oversized.pop(key, None)
+    entry = self._entries.pop(key, None)
+    if entry is not None:
+      self.bytes -= entry[2]
+
+  def delete(self, keys):
+    with self._lock:
+      for key in keys:
+        self._pop(key)
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+      self._oversized.clear()
+      self.bytes = 0
+
+
+class LocalBus:
+  """In-process stand-in for the Redis invalidation channel.
+
+  Every TwoTierCache in the process subscribes to the shared instance, so
+  several apps in one test run behave like separate workers.
+  """
+
+  _shared = None
+
+  def __init__(self):
+    self._subscribers = []
+
+  @classmethod
+  def shared(cls):
+    if cls._shared is None:
+      cls._shared = cls()
+    return cls._shared
+
+  def subscribe(self, callback):
+    self._subscribers.append(callback)
+
+  def publish(self, message):
+    for callback in list(self._subscribers):
+      callback(message)
+
+
+class RedisBus:
+  """Invalidation messages over Redis pub/sub, read by a daemon thread.
+
+  After a dropped connection the subscribers get a clear-all message,
+  since invalidations sent while disconnected are lost.
+  """
+
+  def __init__(self, client, channel):
+    self.client = client
+    self.channel = channel
+    self._subscribers = []
+    self._thread = threading.Thread(target=self._listen, name='cache-invalidation', daemon=True)
+    self._thread.start()
+
+  def subscribe(self, callback):
+    self._subscribers.append(callback)
+
+  def publish(self, message):
+    self.client.publish(self.channel, json.dumps(message))
+
+  def _deliver(self, message):
+    for callback in list(self._subscribers):
+      callback(message)
+
+  def _listen(self):
+    while True:
+      try:
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+        for message in pubsub.listen():
+          self._deliver(json.loads(message['data']))
+      except Exception as e:
+        logger.warning(f'Cache invalidation channel lost: {e}')
+        self._deliver({'origin': None, 'keys': None})
+        time.sleep(1)
+
+
+class TwoTierCache(BaseCache):
+  """Process-local LRU in front of a shared remote cache (Redis).
+
+  Only keys under local_prefixes (rendered responses and graph snapshots)
+  are kept locally, for at most local_timeout seconds; counters, tag sets
+  and stale markers always go to the remote tier. Every write or delete is
+  published on the bus so other workers drop their local copy. The Redis
+  client and key prefix of the remote are exposed, so the tag index and
+  single-flight locks keep using Redis directly.
+  """
+
+  def __init__(self, remote, bus, local_max_bytes=64 * 1024 * 1024, local_max_item_bytes=4 * 1024 * 1024,
+               local_timeout=60, local_prefixes=('view/', 'swr/'), default_timeout=300):
+    super().__init__(default_timeout)
+    self.remote = remote
+    self.local = LocalLRU(local_max_bytes, local_max_item_bytes)
+    self.local_timeout = local_timeout
+    self.local_prefixes = tuple(local_prefixes)
+    self.key_prefix = getattr(remote, 'key_prefix', '')
+    if hasattr(remote, '_write_client'):
+      self._write_client = remote._write_client
+      self._read_client = remote._read_client
+
+    self.node_id = uuid.uuid4().hex
+    self.counts = {'local_hits': 0, 'local_misses': 0, 'remote_hits': 0, 'remote_misses': 0,
+                   'invalidations_sent': 0, 'invalidations_received': 0}
+    self._counts_lock = threading.Lock()
+    self.bus = bus
+    bus.subscribe(self._on_invalidate)
+
+  @classmethod
+  def factory(cls, app, config, args, kwargs):
+    remote_type = config.get('CACHE_REMOTE_TYPE', 'RedisCache')
+    if '.' not in remote_type:
+      remote_type = f'flask_caching.backends.{remote_type}'
+    remote = import_string(remote_type).factory(app, config, list(args), dict(kwargs))
+
+    client = getattr(remote, '_write_client', None)
+    if client is not None:
+      bus = RedisBus(client, f"{config.get('CACHE_KEY_PREFIX') or ''}cache_invalidation")
+    else:
+      bus = LocalBus.shared()
+
+    return cls(
+      remote, bus,
+      local_max_bytes=config.get('CACHE_LOCAL_MAX_BYTES', 64 * 1024 * 1024),
+      local_max_item_bytes=config.get('CACHE_LOCAL_MAX_ITEM_BYTES', 4 * 1024 * 1024),
+      local_timeout=config.get('CACHE_LOCAL_TIMEOUT', 60),
+      local_prefixes=config.get('CACHE_LOCAL_PREFIXES', ('view/', 'swr/')),
+      default_timeout=kwargs.get('default_timeout', 300)
+    )
+
+  def _count(self, name, amount=1):
+    with self._counts_lock:
+      self.counts[name] += amount
+
+  def _is_local(self, key):
+    return key.startswith(self.local_prefixes)
+
+  def _local_timeout(self, timeout):
+    timeout = self._normalize_timeout(timeout)
+    return min(timeout, self.local_timeout) if timeout else self.local_timeout
+
+  def _publish(self, keys):
+    if keys is not None:
+      keys = [key for key in keys if self._is_local(key)]
+      if not keys:
+        return
+    self._count('invalidations_sent')
+    try:
+      self.bus.publish({'origin': self.node_id, 'keys': keys})
+    except Exception as e:
+      logger.warning(f'Could not publish cache invalidation: {e}')
+
+  def _on_invalidate(self, message):
+    if message.get('origin') == self.node_id:
+      return
+    self._count('invalidations_received')
+    if message.get('keys') is None:
+      self.local.clear()
+    else:
+      self.local.delete(message['keys'])
+
+  def get(self, key):
+    if self._is_local(key):
+      found, value = self.local.get(key)
+      if found:
+        self._count('local_hits')
+        return value
+      self._count('local_misses')
+
+    value = self.remote.get(key)
+    self._count('remote_hits' if value is not None else 'remote_misses')
+    if value is not None and self._is_local(key):
+      self.local.fill(key, value, self.local_timeout)
+    return value
+
+  def get_many(self, *keys):
+    values = {}
+    remote_keys = []
+    for key in keys:
+      if self._is_local(key):
+        found, value = self.local.get(key)
+        self._count('local_hits' if found else 'local_misses')
+        if found:
+          values[key] = value
+          continue
+      remote_keys.append(key)
+
+    if remote_keys:
+      for key, value in zip(remote_keys, self.remote.get_many(*remote_keys)):
+        self._count('remote_hits' if value is not None else 'remote_misses')
+        if value is not None and self._is_local(key):
+          self.local.fill(key, value, self.local_timeout)
+        values[key] = value
+    return [values[key] for key in keys]
+
+  def has(self, key):
+    if self._is_local(key) and self.local.get(key)[0]:
+      return True
+    return self.remote.has(key)
+
+  def set(self, key, value, timeout=None):
+    result = self.remote.set(key, value, timeout)
+    if self._is_local(key):
+      self.local.set(key, value, self._local_timeout(timeout))
+      self._publish([key])
+    return result
+
+  def set_many(self, mapping, timeout=None):
+    result = self.remote.set_many(mapping, timeout)
+    local_keys = [key for key in mapping if self._is_local(key)]
+    for key in local_keys:
+      self.local.set(key, mapping[key], self._local_timeout(timeout))
+    self._publish(local_keys)
+    return result
+
+  def add(self, key, value, timeout=None):
+    added = self.remote.add(key, value, timeout)
+    if added and self._is_local(key):
+      self.local.set(key, value, self._local_timeout(timeout))
+      self._publish([key])
+    return added
+
+  def delete(self, key):
+    return self.delete_many(key)
+
+  def delete_many(self, *keys):
+    result = self.remote.delete_many(*keys)
+    self.local.delete(keys)
+    self._publish(keys)
+    return result
+
+  def clear(self):
+    result = self.remote.clear()
+    self.local.clear()
+    self._publish(None)
+    return result
+
+  def inc(self, key, delta=1):
+    return self.remote.inc(key, delta)
+
+  def dec(self, key, delta=1):
+    return self.remote.dec(key, delta)
+
+  def stats(self):
+    with self._counts_lock:
+      counts = dict(self.counts)
+
+    def ratio(hits, misses):
+      return hits / (hits + misses) if hits + misses else 0.0
+
+    return {
+      'local': {
+        'hits': counts['local_hits'],
+        'misses': counts['local_misses'],
+        'hit_ratio': ratio(counts['local_hits'], counts['local_misses']),
+        'items': len(self.local),
+        'bytes': self.local.bytes,
+        'max_bytes': self.local.max_bytes,
+        'evictions': self.local.evictions
+      },
+      'remote': {
+        'backend': type(self.remote).__name__,
+        'hits': counts['remote_hits'],
+        'misses': counts['remote_misses'],
+        'hit_ratio': ratio(counts['remote_hits'], counts['remote_misses'])
+      },
+      'invalidations': {
+        'sent': counts['invalidations_sent'],
+        'received': counts['invalidations_received']
+      }
+    }
@@ -291,9 +291,10 @@ class CacheHelper:
         key_parts.append(f'{k}_{v}')
     return '_'.join(key_parts)
   
-  @staticmethod #REDISSSSSSSSSSSSSSSSSSSSSSSSSSSSSSSSSSSSSSSS
-  def invalidate_related_cache(patterns: List[str]):
-    pass
+  @staticmethod
+  def invalidate_related_cache(patterns: List[str]) -> int:
+    from app.caching import invalidate_tags
+    return invalidate_tags(patterns)
 
 class ValidationHelper: 
   @staticmethod
@@ -0,0 +1,50 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from app import cache
+from flask import current_app
+import re
+import time
+
+# "GET /api/papers?page=2 HTTP/1.1" 200 as written by gunicorn and nginx
+_ACCESS_LOG_REQUEST = re.compile(r'"GET (?P<path>/api/\S*) HTTP/[\d.]+" (?P<status>\d{3})')
+
+
+def popular_endpoints(log_path, top=50):
+  """The top most requested successful GET /api paths in an access log."""
+  counts = Counter()
+  with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+    for line in f:
+      match = _ACCESS_LOG_REQUEST.search(line)
+      if match and match.group('status') == '200':
+        counts[match.group('path')] += 1
+  return [path for path, _ in counts.most_common(top)]
+
+
+def _warm(app, path):
+  started = time.perf_counter()
+  with app.test_client() as client:
+    response = client.get(path)
+    status = response.status_code
+    response.close()
+  return path, status, time.perf_counter() - started
+
+
+def warm_cache(paths, concurrency=None):
+  """Request every path through the test client to fill the cache.
+
+  Paths run on up to concurrency threads, each with its own test client,
+  so responses land in the configured backend exactly as live traffic
+  would store them. Returns (path, status, seconds) in request order.
+
+  Only a backend shared with the web workers (Redis, or TwoTierCache over
+  Redis) is accepted; a process-local one would be filled and discarded
+  with this process.
+  """
+  if getattr(cache.cache, '_write_client', None) is None:
+    raise RuntimeError(f'{type(cache.cache).__name__} is local to this process; '
+                       'warming only works with a shared cache such as Redis')
+
+  app = current_app._get_current_object()
+  concurrency = concurrency or app.config['CACHE_WARM_CONCURRENCY']
+  with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='cache-warm') as pool:
+    return list(pool.map(lambda path: _warm(app, path), paths))
@@ -3,6 +3,7 @@ import os
 import sys
 import click
 import json
+import time
 from datetime import datetime
 from flask.cli import with_appcontext
 from app import create_app, db
@@ -12,7 +13,7 @@ app = create_app(os.getenv('FLASK_ENV', 'development'))
 @app.shell_context_processor
 def make_shell_context():
     from app.models import (
-        Paper, Author, Keyword, Citation, 
+        Paper, Author, Keyword, Citation, PaperSimilarity, AnalyticsSnapshot,
         paper_authors, paper_keywords,
         create_sample_data, backup_database, restore_database
     )
@@ -25,6 +26,8 @@ def make_shell_context():
         'Author': Author,
         'Keyword': Keyword,
         'Citation': Citation,
+        'PaperSimilarity': PaperSimilarity,
+        'AnalyticsSnapshot': AnalyticsSnapshot,
         'paper_authors': paper_authors,
         'paper_keywords': paper_keywords,
         'create_sample_data': create_sample_data,
@@ -170,8 +173,17 @@ def check_health():
 
 @app.cli.command()
 @click.option('--limit', default=5, help='Number of results to show')
-def run_analytics(limit):
+@click.option('--parallel', is_flag=True, help='Run the batch tasks across a process pool')
+@click.option('--workers', default=None, type=int, help='Worker processes for --parallel')
+@click.option('--tasks', default=None, help='Comma-separated subset of batch tasks for --parallel')
+@click.option('--output-dir', default=None, help='Write each task result as JSON into this directory')
+@click.option('--store-snapshots', is_flag=True, help='Store the results as analytics snapshots')
+def run_analytics(limit, parallel, workers, tasks, output_dir, store_snapshots):
     """Run research analytics and display results"""
+    if parallel:
+        run_batch_analytics_cmd(limit, workers, tasks, output_dir, store_snapshots)
+        return
+
     try:
         from app.analytics import ResearchAnalytics
         
@@ -204,11 +216,207 @@ def run_analytics(limit):
         click.echo(f'Analytics failed: {str(e)}', err=True)
         sys.exit(1)
 
+def run_batch_analytics_cmd(limit, workers, tasks, output_dir, store_snapshots):
+    try:
+        from app.batch import (
+            BATCH_TASKS, run_batch_analytics, store_batch_snapshots, write_batch_files
+        )
+
+        selected = [t.strip() for t in tasks.split(',') if t.strip()] if tasks else list(BATCH_TASKS)
+        unknown = [t for t in selected if t not in BATCH_TASKS]
+        if unknown:
+            click.echo(f'Unknown tasks: {", ".join(unknown)} '
+                      f'(available: {", ".join(BATCH_TASKS)})', err=True)
+            sys.exit(1)
+
+        click.echo(f'Running {len(selected)} analytics tasks in parallel...')
+        started = time.perf_counter()
+        inputs, results, timings = run_batch_analytics(
+            selected, workers=workers or app.config['BATCH_ANALYTICS_WORKERS']
+        )
+        elapsed = time.perf_counter() - started
+
+        click.echo(f'\n⏱  Task timings (data version {inputs["data_version"]}):')
+        for name in selected:
+            click.echo(f'   - {name:<24} {timings[name]:8.2f}s')
+        click.echo(f'   - {"total wall time":<24} {elapsed:8.2f}s')
+
+        if 'hotspots' in results:
+            click.echo('\n📈 Top Research Hotspots:')
+            for i, hotspot in enumerate(results['hotspots'][:limit], 1):
+                click.echo(f'   {i}. {hotspot["keyword"]} '
+                          f'({hotspot["paper_count"]} papers, '
+                          f'{hotspot["avg_citations"]:.1f} avg citations)')
+
+        if 'clustering' in results:
+            click.echo('\n🔗 Citation Network Analysis:')
+            click.echo(f'   - Total papers: {len(inputs["papers"])}')
+            click.echo(f'   - Total citations: {len(inputs["edges"])}')
+            click.echo(f'   - Network density: {results["clustering"]["density"]:.4f}')
+            click.echo(f'   - Average clustering: {results["clustering"]["avg_clustering"]:.4f}')
+
+        if output_dir:
+            paths = write_batch_files(output_dir, inputs, results, timings)
+            click.echo(f'\nWrote {len(paths)} result files to {output_dir}')
+
+        if store_snapshots:
+            stored = store_batch_snapshots(inputs, results, timings)
+            click.echo(f'\nStored snapshots: {", ".join(s.name for s in stored) or "none"}')
+
+        click.echo('\nAnalytics completed!')
+
+    except Exception as e:
+        click.echo(f'Analytics failed: {str(e)}', err=True)
+        sys.exit(1)
+
+@app.cli.command()
+@click.option('--force', is_flag=True, help='Recompute every snapshot regardless of pending writes')
+def refresh_analytics(force):
+    """Recompute analytics snapshots invalidated by recent writes"""
+    try:
+        from app.scheduler import refresh_author_metrics_if_due, refresh_due_snapshots
+
+        click.echo('Refreshing analytics snapshots...')
+        refreshed = refresh_due_snapshots(force=force)
+        for snapshot in refreshed:
+            click.echo(f'   - {snapshot.name} {snapshot.params}: '
+                      f'version {snapshot.data_version} in {snapshot.duration_ms}ms')
+        click.echo(f'{len(refreshed)} snapshots refreshed!')
+
+        metrics = refresh_author_metrics_if_due(force=force)
+        if metrics is not None:
+            click.echo(f'Author metrics refreshed at version {metrics["data_version"]}')
+
+    except Exception as e:
+        click.echo(f'Analytics refresh failed: {str(e)}', err=True)
+        sys.exit(1)
+
+@app.cli.command()
+@click.option('--endpoint', '-e', multiple=True, help='Path with query string to warm (repeatable)')
+@click.option('--from-log', type=click.Path(exists=True, dir_okay=False),
+              help='Warm the most requested GET /api paths in this access log')
+@click.option('--top', default=50, help='Number of paths to take from --from-log')
+@click.option('--concurrency', default=None, type=int, help='Requests in flight at once')
+def warm_cache(endpoint, from_log, top, concurrency):
+    """Fill the cache by replaying popular endpoints"""
+    try:
+        from app.warmup import popular_endpoints, warm_cache as run_warm_cache
+
+        paths = list(endpoint)
+        if from_log:
+            paths.extend(popular_endpoints(from_log, top))
+        if not paths:
+            paths = list(app.config['CACHE_WARM_ENDPOINTS'])
+        paths = list(dict.fromkeys(paths))
+
+        click.echo(f'Warming {len(paths)} endpoints...')
+        started = time.perf_counter()
+        results = run_warm_cache(paths, concurrency)
+        for path, status, seconds in results:
+            click.echo(f'   - {status} {path} ({seconds:.2f}s)')
+
+        failed = [path for path, status, _ in results if status != 200]
+        click.echo(f'{len(results) - len(failed)} of {len(results)} endpoints warmed '
+                  f'in {time.perf_counter() - started:.1f}s')
+        if failed:
+            sys.exit(1)
+
+    except Exception as e:
+        click.echo(f'Cache warming failed: {str(e)}', err=True)
+        sys.exit(1)
+
+@app.cli.command()
+@click.option('--rebuild', is_flag=True, help='Discard velocity and burst state and replay every citation')
+def update_citation_bursts(rebuild):
+    """Stream new citations into citation velocity and burst state"""
+    try:
+        from app.bursts import process_new_citations, reset_citation_stream
+
+        if rebuild:
+            click.echo('Resetting citation stream...')
+            reset_citation_stream()
+
+        click.echo('Processing new citations...')
+        processed = process_new_citations()
+        click.echo(f'   - Citations processed: {processed}')
+        click.echo('Citation bursts updated!')
+
+    except Exception as e:
+        click.echo(f'Citation burst update failed: {str(e)}', err=True)
+        sys.exit(1)
+
+@app.cli.command()
+def rebuild_sketches():
+    """Recompute the HyperLogLog distinct-count sketches from scratch"""
+    try:
+        from app.sketches import rebuild_sketches as rebuild
+
+        click.echo('Rebuilding distinct-count sketches...')
+        result = rebuild()
+        click.echo(f'   - Sketches: {result["sketches"]}')
+        click.echo('Sketches rebuilt!')
+
+    except Exception as e:
+        click.echo(f'Sketch rebuild failed: {str(e)}', err=True)
+        sys.exit(1)
+
+@app.cli.command()
+def compute_author_metrics():
+    """Recompute the author impact leaderboard"""
+    try:
+        from app.analytics import ResearchAnalytics
+
+        click.echo('Computing author metrics...')
+        result = ResearchAnalytics.refresh_author_metrics()
+        click.echo(f'   - Authors ranked: {result["authors"]}')
+        click.echo('Author metrics computed!')
+
+    except Exception as e:
+        click.echo(f'Author metrics computation failed: {str(e)}', err=True)
+        sys.exit(1)
+
+@app.cli.command()
+def rebuild_rollups():
+    """Recompute the keyword x year rollup tables from scratch"""
+    try:
+        from app.rollups import rebuild_rollups as rebuild
+
+        click.echo('Rebuilding keyword/year rollups...')
+        result = rebuild()
+        click.echo(f'   - Keyword/year rows: {result["keyword_years"]}')
+        click.echo(f'   - Year rows: {result["years"]}')
+        click.echo(f'   - Keyword pair rows: {result["keyword_pairs"]}')
+        click.echo('Rollups rebuilt!')
+
+    except Exception as e:
+        click.echo(f'Rollup rebuild failed: {str(e)}', err=True)
+        sys.exit(1)
+
+@app.cli.command()
+@click.option('--top-k', default=None, type=int, help='Neighbours kept per paper')
+@click.option('--block-size', default=None, type=int, help='Rows per sparse product block')
+def compute_similarity(top_k, block_size):
+    """Recompute co-citation and bibliographic coupling neighbours"""
+    try:
+        from app.similarity import compute_citation_similarity
+
+        click.echo('Computing citation similarity...')
+        result = compute_citation_similarity(top_k=top_k, block_size=block_size)
+        click.echo(f'   - Papers in citation graph: {result["papers"]}')
+        for method, count in result['stored'].items():
+            click.echo(f'   - {method}: {count} neighbour rows')
+        click.echo('Similarity computation completed!')
+
+    except Exception as e:
+        click.echo(f'Similarity computation failed: {str(e)}', err=True)
+        sys.exit(1)
+
 @app.cli.command()
 @click.option('--days', default=7, help='Clean files older than N days')
 def cleanup(days):
-    """Clean up old temporary files"""
+    """Clean up old temporary files and change log entries"""
     try:
+        from app.models import prune_change_log
         from app.utils import FileManager
         
         directories = [
@@ -222,6 +430,9 @@ def cleanup(days):
             if os.path.exists(directory):
                 FileManager.cleanup_old_files(directory, days)
                 click.echo(f'Cleaned {directory}')
+
+        pruned = prune_change_log(app.config['CHANGE_LOG_RETENTION'])
+        click.echo(f'Pruned {pruned} change log rows')
         
         click.echo('Cleanup completed!')
         
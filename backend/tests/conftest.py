@@ -0,0 +1,29 @@
+from app import create_app, db
+from app import citation_index
+from app.models import create_sample_data
+from config import TestingConfig, config
+import pytest
+
+
+class CachedTestingConfig(TestingConfig):
+  # a real per-app backend, so tag invalidation and 304s can be observed
+  CACHE_TYPE = 'SimpleCache'
+
+
+@pytest.fixture
+def app(monkeypatch):
+  monkeypatch.setitem(config, 'testing_cached', CachedTestingConfig)
+  # the citation index is process-wide; start every test from its own data
+  monkeypatch.setattr(citation_index, '_index', None)
+  app = create_app('testing_cached')
+  with app.app_context():
+    db.create_all()
+    create_sample_data()
+    yield app
+    db.session.remove()
+    db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+  return app.test_client()
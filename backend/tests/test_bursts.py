@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+from app import db
+from app.bursts import get_rising_papers, process_new_citations, reset_citation_stream
+from app.models import Citation, CitationDailyCount, CitationVelocity
+
+
+def _stream_state():
+  daily = sorted((row.paper_id, row.day, row.citation_count) for row in CitationDailyCount.query)
+  velocity = sorted(
+    (row.paper_id, row.citation_count, row.first_cited_at, row.last_cited_at,
+     round(row.base_cost, 9), round(row.burst_cost, 9), row.in_burst, row.burst_started_at, row.burst_citations)
+    for row in CitationVelocity.query
+  )
+  return daily, velocity
+
+
+def _add_citations(pairs):
+  # Arrivals in timestamp order: the automaton is fed in id order across batches.
+  start = datetime.utcnow() + timedelta(minutes=1)
+  for i, (citing, cited) in enumerate(pairs):
+    db.session.add(Citation(citing_paper_id=citing, cited_paper_id=cited, created_at=start + timedelta(hours=i)))
+  db.session.commit()
+
+
+def test_processing_the_stream_twice_counts_each_citation_once(app):
+  total = Citation.query.count()
+  assert process_new_citations() == total
+  state = _stream_state()
+
+  assert process_new_citations() == 0
+  assert _stream_state() == state
+  assert sum(count for _, _, count in state[0]) == total
+
+
+def test_batched_and_replayed_streams_match(app):
+  _add_citations([(8, 1), (7, 1), (6, 1), (5, 2)])
+  process_new_citations(batch_size=2)
+  batched = _stream_state()
+
+  reset_citation_stream()
+  assert _stream_state() == ([], [])
+  process_new_citations()
+  assert _stream_state() == batched
+
+
+def test_new_citations_are_picked_up_incrementally(app):
+  process_new_citations()
+  _add_citations([(8, 3)])
+
+  assert process_new_citations() == 1
+  incremental = _stream_state()
+
+  reset_citation_stream()
+  process_new_citations()
+  assert _stream_state() == incremental
+
+
+def test_rising_papers_clamp_the_window(app, client):
+  process_new_citations()
+  max_window = app.config['CITATION_VELOCITY_MAX_WINDOW_DAYS']
+
+  response = client.get('/api/analytics/citation-bursts?window_days=100000000')
+  assert response.status_code == 200
+  assert response.get_json()['window_days'] == max_window
+  assert response.get_json()['papers'] == get_rising_papers(10, max_window)
+
+  assert client.get('/api/analytics/citation-bursts?window_days=0').status_code == 400
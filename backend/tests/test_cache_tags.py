@@ -0,0 +1,84 @@
+from sqlalchemy import text
+import time
+
+from app import db
+from app.caching import revalidator
+from app.models import Citation, Paper
+
+
+def _uncited_pair():
+  cited = {(c.citing_paper_id, c.cited_paper_id) for c in Citation.query}
+  for paper in Paper.query.order_by(Paper.id):
+    if paper.authors.count() and paper.keywords.count():
+      for other in Paper.query.order_by(Paper.id.desc()):
+        if other.id != paper.id and (other.id, paper.id) not in cited and (paper.id, other.id) not in cited:
+          return other.id, paper.id, paper.authors.first().id, paper.keywords.first().id
+
+
+def _cited_by(papers, paper_id):
+  return next(paper['citation_network']['cited_by_count'] for paper in papers if paper['id'] == paper_id)
+
+
+def _settled(client, url):
+  # a dropped stale-while-revalidate entry is served once more while the
+  # background refresh replaces it
+  client.get(url)
+  deadline = time.monotonic() + 5
+  while revalidator._refreshing and time.monotonic() < deadline:
+    time.sleep(0.01)
+  return client.get(url).get_json()
+
+
+def _views(client, citing_id, paper_id, author_id, keyword_id):
+  return {
+    'paper': _settled(client, f'/api/papers/{paper_id}')['citation_network']['cited_by_count'],
+    'papers': _cited_by(_settled(client, '/api/papers?per_page=100')['papers'], paper_id),
+    'author': _cited_by(_settled(client, f'/api/authors/{author_id}')['papers'], paper_id),
+    'keyword': _cited_by(_settled(client, f'/api/keywords/{keyword_id}')['papers'], paper_id),
+    'citation_analysis': _cited_by(_settled(client, '/api/trends/citation-analysis')['most-cited_papers'], paper_id),
+    'citations': len(_settled(client, '/api/citations')),
+    'subgraph': int(paper_id in [node['id'] for node in _settled(client, f'/api/graph/subgraph/{citing_id}')['nodes']]),
+    'statistics': _settled(client, '/api/statistics/overview')['overview']['total_citations']
+  }
+
+
+def test_citation_write_reaches_every_view_embedding_the_counts(client):
+  citing_id, cited_id, author_id, keyword_id = _uncited_pair()
+  before = _views(client, citing_id, cited_id, author_id, keyword_id)
+
+  response = client.post('/api/citations', json={'citing_paper_id': citing_id, 'cited_paper_id': cited_id})
+  assert response.status_code == 201
+
+  after = _views(client, citing_id, cited_id, author_id, keyword_id)
+  assert after == {view: count + 1 for view, count in before.items()}
+
+
+def test_title_update_keeps_unrelated_collections(client):
+  unrelated = ('/api/trends/papers-per-year', '/api/trends/keywords-over-time', '/api/statistics/overview',
+               '/api/authors', '/api/keywords')
+  cached = {url: _settled(client, url) for url in unrelated}
+  _settled(client, '/api/citations')
+  _settled(client, '/api/trends/citation-analysis')
+
+  # change what those views read behind the cache's back
+  db.session.execute(text('UPDATE paper SET year = year + 100, citation_count = citation_count + 1000'))
+  db.session.commit()
+
+  response = client.put('/api/papers/2', json={'title': 'A renamed paper'})
+  assert response.status_code == 200
+
+  assert {url: _settled(client, url) for url in unrelated} == cached
+  assert 'A renamed paper' in [c['citing_paper_title'] for c in _settled(client, '/api/citations')] + \
+    [c['cited_paper_title'] for c in _settled(client, '/api/citations')]
+  assert 'A renamed paper' in [p['title'] for p in _settled(client, '/api/trends/citation-analysis')['most-cited_papers']]
+
+
+def test_year_update_drops_trends(client):
+  before = _settled(client, '/api/trends/papers-per-year')['data']
+
+  response = client.put('/api/papers/2', json={'year': 1901})
+  assert response.status_code == 200
+
+  after = _settled(client, '/api/trends/papers-per-year')['data']
+  assert after != before
+  assert {'year': 1901, 'count': 1} in after
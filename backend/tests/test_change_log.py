@@ -0,0 +1,54 @@
+from app import db
+from app.models import ChangeLog, Paper, get_data_version, get_last_change, prune_change_log
+
+
+def _touch(paper_id, times):
+  for i in range(times):
+    db.session.get(Paper, paper_id).citation_count = 1000 + i
+    db.session.commit()
+
+
+def test_every_tracked_write_advances_the_version(app):
+  version = get_data_version()
+  _touch(1, 1)
+  assert get_data_version() > version
+  assert get_last_change(ChangeLog.entity_type == 'paper', ChangeLog.entity_id == 1)[0] == get_data_version()
+
+
+def test_prune_keeps_versions_and_newest_row_per_entity(app, client):
+  _touch(1, 5)
+  _touch(2, 5)
+  etag = client.get('/api/papers/3').headers['ETag']
+  newest = {
+    paper_id: get_last_change(ChangeLog.entity_type == 'paper', ChangeLog.entity_id == paper_id)
+    for paper_id in range(1, 9)
+  }
+  version = get_data_version()
+  rows = ChangeLog.query.count()
+
+  assert prune_change_log(2) > 0
+  assert ChangeLog.query.count() < rows
+  assert get_data_version() == version
+  for row in ChangeLog.query.filter(ChangeLog.id <= version - 2):
+    assert get_last_change(ChangeLog.entity_type == row.entity_type,
+                           ChangeLog.entity_id == row.entity_id)[0] == row.id
+  for paper_id, change in newest.items():
+    assert get_last_change(ChangeLog.entity_type == 'paper', ChangeLog.entity_id == paper_id) == change
+  assert client.get('/api/papers/3', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_prune_drops_deleted_entities_and_never_the_newest_row(app):
+  paper = Paper.query.filter(~Paper.citing_papers.any(), ~Paper.cited_papers.any()).first() or \
+    Paper(title='Transient', year=2020, citation_count=0)
+  db.session.add(paper)
+  db.session.commit()
+  paper_id = paper.id
+  db.session.delete(paper)
+  db.session.commit()
+  version = get_data_version()
+
+  prune_change_log(0)
+
+  assert get_data_version() == version
+  assert ChangeLog.query.filter(ChangeLog.entity_type == 'paper', ChangeLog.entity_id == paper_id,
+                                ChangeLog.id < version).count() == 0
@@ -0,0 +1,67 @@
+from app.citation_index import CitationIndex
+import networkx as nx
+import pytest
+import random
+
+
+def _random_graph(seed, n=60, m=150):
+  rng = random.Random(seed)
+  edges = {(rng.randrange(1, n + 1), rng.randrange(1, n + 1)) for _ in range(m)}
+  return [(u, v) for u, v in edges if u != v]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_reachability_and_paths_match_networkx(app, seed):
+  edges = _random_graph(seed)
+  G = nx.DiGraph(edges)
+  index = CitationIndex([u for u, _ in edges], [v for _, v in edges])
+
+  for source in list(G)[:20]:
+    for target in G:
+      reachable = nx.has_path(G, source, target)
+      assert index.reaches(source, target) == reachable
+      path = index.shortest_path(source, target)
+      if not reachable:
+        assert path is None
+        continue
+      assert len(path) - 1 == nx.shortest_path_length(G, source, target)
+      assert all(G.has_edge(u, v) for u, v in zip(path, path[1:]))
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_lineage_counts_match_networkx(app, seed):
+  edges = _random_graph(seed)
+  G = nx.DiGraph(edges)
+  index = CitationIndex([u for u, _ in edges], [v for _, v in edges])
+
+  for paper_id in G:
+    assert index.lineage_counts(paper_id) == {
+      'ancestors': len(nx.descendants(G, paper_id)),
+      'descendants': len(nx.ancestors(G, paper_id))
+    }
+
+
+def test_unknown_papers(app):
+  index = CitationIndex([1], [2])
+  assert index.reaches(3, 3)
+  assert not index.reaches(1, 3)
+  assert index.shortest_path(3, 1) is None
+  assert index.lineage_counts(3) == {'ancestors': 0, 'descendants': 0}
+
+
+def test_new_citation_reaches_path_and_lineage(client):
+  pairs = [(source, target) for source in range(1, 9) for target in range(1, 9)
+           if source != target and not client.get(f'/api/graph/path/{source}/{target}').json['reachable']]
+  source, target = pairs[0]
+  before = client.get(f'/api/graph/lineage/{source}').json['ancestors']
+
+  response = client.post('/api/citations', json={'citing_paper_id': source, 'cited_paper_id': target})
+  assert response.status_code == 201
+
+  path = client.get(f'/api/graph/path/{source}/{target}').json
+  assert path['reachable'] and path['path'] == [source, target]
+  assert client.get(f'/api/graph/lineage/{source}').json['ancestors'] > before
+
+
+def test_path_to_unknown_paper_is_404(client):
+  assert client.get('/api/graph/path/1/99999').status_code == 404
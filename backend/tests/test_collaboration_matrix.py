@@ -0,0 +1,19 @@
+import pytest
+
+
+@pytest.mark.parametrize('body', [{'authors': [1, 2]}, {'authors': ['John Smith', None]}, ['John Smith'], {}])
+def test_collaboration_matrix_rejects_malformed_authors(client, body):
+  response = client.post('/api/analytics/collaboration-matrix', json=body)
+  assert response.status_code == 400
+
+
+def test_collaboration_matrix_is_symmetric_with_paper_counts_on_the_diagonal(client):
+  response = client.post('/api/analytics/collaboration-matrix', json={'authors': ['John Smith', 'Jane Doe', 'Nobody']})
+  assert response.status_code == 200
+  body = response.get_json()
+
+  assert body['authors'] == ['John Smith', 'Jane Doe']
+  assert body['missing'] == ['Nobody']
+  matrix = body['matrix']
+  assert matrix[0][1] == matrix[1][0]
+  assert all(matrix[i][i] >= matrix[i][j] for i in range(2) for j in range(2))
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+from app import db
+from app.caching import http_last_modified
+from app.models import ChangeLog, Paper
+
+
+def _age_change_log(changed_at):
+  ChangeLog.query.update({ChangeLog.changed_at: changed_at}, synchronize_session=False)
+  db.session.commit()
+
+
+def test_matching_etag_gets_a_bodiless_304(client):
+  response = client.get('/api/papers/1')
+  etag = response.headers['ETag']
+  assert response.status_code == 200
+
+  response = client.get('/api/papers/1', headers={'If-None-Match': etag})
+  assert response.status_code == 304
+  assert response.data == b''
+  assert response.headers['ETag'] == etag
+
+
+def test_writes_change_the_etag(client):
+  paper_etag = client.get('/api/papers/1').headers['ETag']
+  list_etag = client.get('/api/papers').headers['ETag']
+
+  assert client.put('/api/papers/1', json={'title': 'Retitled'}).status_code == 200
+
+  response = client.get('/api/papers/1', headers={'If-None-Match': paper_etag})
+  assert response.status_code == 200
+  assert response.get_json()['title'] == 'Retitled'
+  assert response.headers['ETag'] != paper_etag
+  assert client.get('/api/papers', headers={'If-None-Match': list_etag}).status_code == 200
+
+
+def test_star_only_matches_papers_that_exist(client):
+  assert client.get('/api/papers/1', headers={'If-None-Match': '*'}).status_code == 304
+  assert client.get('/api/papers/99999', headers={'If-None-Match': '*'}).status_code == 404
+  assert client.get('/api/graph/subgraph/99999', headers={'If-None-Match': '*'}).status_code == 404
+
+  uncited = Paper.query.filter(~Paper.citing_papers.any()).first().id
+  assert client.delete(f'/api/papers/{uncited}').status_code == 200
+  assert client.get(f'/api/papers/{uncited}', headers={'If-None-Match': '*'}).status_code == 404
+
+
+def test_unknown_paper_has_no_validators(client):
+  response = client.get('/api/papers/99999')
+  assert response.status_code == 404
+  assert 'ETag' not in response.headers
+
+
+def test_if_modified_since(client):
+  changed_at = datetime(2020, 1, 1, 12, 0, 0)
+  _age_change_log(changed_at)
+
+  response = client.get('/api/papers/1')
+  assert response.headers['Last-Modified'] == 'Wed, 01 Jan 2020 12:00:00 GMT'
+
+  same = client.get('/api/papers/1', headers={'If-Modified-Since': response.headers['Last-Modified']})
+  assert same.status_code == 304
+  earlier = client.get('/api/papers/1', headers={'If-Modified-Since': 'Tue, 31 Dec 2019 12:00:00 GMT'})
+  assert earlier.status_code == 200
+
+
+def test_last_modified_is_withheld_until_its_second_is_over():
+  now = datetime.utcnow()
+  assert http_last_modified(now) is None
+  earlier = now - timedelta(seconds=2)
+  assert http_last_modified(earlier).replace(tzinfo=None) == earlier.replace(microsecond=0)
@@ -0,0 +1,19 @@
+import pytest
+
+
+@pytest.mark.parametrize('body', [{'format': 5}, [1, 2], 'graphml'])
+def test_graph_export_rejects_malformed_bodies(client, body):
+  response = client.post('/api/export/graph-data', json=body)
+  assert response.status_code == 400
+
+
+def test_graph_export_streams_graphml(client):
+  response = client.post('/api/export/graph-data', json={'format': 'GraphML', 'node_ids': [1, 2], 'depth': 1})
+  assert response.status_code == 200
+  assert response.mimetype == 'application/graphml+xml'
+  assert b'<graphml' in response.data
+
+
+def test_graph_export_validates_streamed_options(client):
+  response = client.post('/api/export/graph-data', json={'format': 'gexf', 'node_ids': [1], 'depth': 99})
+  assert response.status_code == 400
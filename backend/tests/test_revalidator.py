@@ -0,0 +1,63 @@
+import time
+
+from app import cache
+from app.caching import Revalidator
+
+
+class ClaimClient:
+  """Just enough of a Redis client for the revalidator's SET NX claim."""
+
+  def __init__(self):
+    self.values = {}
+
+  def set(self, name, value, nx=False, px=None):
+    if nx and name in self.values:
+      return False
+    self.values[name] = value
+    return True
+
+  def eval(self, script, numkeys, name, token):
+    if self.values.get(name) == token:
+      del self.values[name]
+      return 1
+    return 0
+
+
+def _wait(revalidator):
+  deadline = time.monotonic() + 5
+  while revalidator._refreshing and time.monotonic() < deadline:
+    time.sleep(0.01)
+
+
+def test_refresh_releases_its_claim(app, monkeypatch):
+  client = ClaimClient()
+  monkeypatch.setattr(cache.cache, '_write_client', client, raising=False)
+  monkeypatch.setattr(cache.cache, 'key_prefix', 'test:', raising=False)
+  revalidator = Revalidator()
+  calls = []
+
+  with app.test_request_context('/api/trends/papers-per-year'):
+    assert revalidator.submit('swr/key', lambda: calls.append(1))
+    _wait(revalidator)
+    assert client.values == {}
+    assert revalidator.submit('swr/key', lambda: calls.append(1))
+    _wait(revalidator)
+
+  assert calls == [1, 1]
+
+
+def test_refresh_keeps_a_claim_taken_over_by_another_worker(app, monkeypatch):
+  client = ClaimClient()
+  monkeypatch.setattr(cache.cache, '_write_client', client, raising=False)
+  monkeypatch.setattr(cache.cache, 'key_prefix', 'test:', raising=False)
+  revalidator = Revalidator()
+  name = f'{cache.cache.key_prefix}revalidate:swr/key'
+
+  def expire_and_reclaim():
+    client.values[name] = 'other-worker'
+
+  with app.test_request_context('/api/trends/papers-per-year'):
+    assert revalidator.submit('swr/key', expire_and_reclaim)
+    _wait(revalidator)
+
+  assert client.values == {name: 'other-worker'}
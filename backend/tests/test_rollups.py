@@ -0,0 +1,60 @@
+from app import db
+from app.models import Keyword, KeywordPairStats, KeywordYearStats, Paper, YearStats
+from app.rollups import rebuild_rollups
+
+
+def _rollups():
+  return (
+    sorted((row.keyword_id, row.year, row.paper_count, row.citation_sum) for row in KeywordYearStats.query),
+    sorted((row.year, row.paper_count, row.citation_sum) for row in YearStats.query),
+    sorted((row.keyword_id, row.related_keyword_id, row.co_count) for row in KeywordPairStats.query)
+  )
+
+
+def _assert_matches_rebuild():
+  incremental = _rollups()
+  rebuild_rollups()
+  assert incremental == _rollups()
+
+
+def test_sample_data_rollups_match_a_rebuild(app):
+  _assert_matches_rebuild()
+
+
+def test_rollups_follow_creates_and_bulk_creates(client):
+  existing = [keyword.name for keyword in Keyword.query.order_by(Keyword.id).limit(2)]
+  response = client.post('/api/papers/', json={
+    'title': 'Rollup paper', 'year': 2019, 'citation_count': 7, 'keywords': existing + ['rollups']
+  })
+  assert response.status_code == 201
+
+  response = client.post('/api/papers/bulk', json={'papers': [
+    {'title': 'Bulk one', 'year': 2019, 'citation_count': 3, 'keywords': [existing[0], 'bulk']},
+    {'title': 'Bulk two', 'year': 2024, 'keywords': ['bulk', 'rollups']},
+    {'title': 'Bulk three', 'year': 2020}
+  ]})
+  assert response.status_code == 201
+
+  _assert_matches_rebuild()
+
+
+def test_rollups_follow_updates(client):
+  assert client.put('/api/papers/1', json={'year': 2011, 'citation_count': 999}).status_code == 200
+  assert client.put('/api/papers/2', json={'citation_count': 0}).status_code == 200
+
+  paper = db.session.get(Paper, 3)
+  paper.keywords.remove(paper.keywords.first())
+  paper.keywords.append(Keyword.query.order_by(Keyword.id.desc()).first())
+  paper.year = 2012
+  db.session.commit()
+
+  _assert_matches_rebuild()
+
+
+def test_rollups_follow_deletes(client):
+  uncited = Paper.query.filter(~Paper.citing_papers.any()).limit(2).all()
+  assert uncited
+  for paper in uncited:
+    assert client.delete(f'/api/papers/{paper.id}').status_code == 200
+
+  _assert_matches_rebuild()
@@ -0,0 +1,79 @@
+import numpy as np
+
+from app import db
+from app.analytics import ResearchAnalytics
+from app.hll import HyperLogLog
+from app.models import Author, Citation, DistinctSketch, Keyword, Paper, StreamCursor
+from app.sketches import SKETCH_BACKFILL, rebuild_sketches
+
+
+def _sketches():
+  return {
+    (row.entity_type, row.entity_id, row.year, row.metric): HyperLogLog.from_bytes(row.registers).registers
+    for row in DistinctSketch.query
+  }
+
+
+def _add_paper(year, author_ids, keyword_ids, cites=()):
+  paper = Paper(title=f'Sketch paper {year}', year=year, citation_count=0)
+  db.session.add(paper)
+  for author_id in author_ids:
+    paper.authors.append(db.session.get(Author, author_id))
+  for keyword_id in keyword_ids:
+    paper.keywords.append(db.session.get(Keyword, keyword_id))
+  db.session.flush()
+  for cited_id in cites:
+    db.session.add(Citation(citing_paper_id=paper.id, cited_paper_id=cited_id))
+  db.session.commit()
+  return paper
+
+
+def test_incremental_sketches_match_a_rebuild_after_additions(app):
+  paper = _add_paper(2021, [1, 5, 9], [2, 3], cites=[1, 2])
+  _add_paper(2017, [2], [1], cites=[paper.id])
+  existing = db.session.get(Paper, 3)
+  existing.authors.append(db.session.get(Author, 12))
+  existing.keywords.append(db.session.get(Keyword, 7))
+  db.session.add(Citation(citing_paper_id=4, cited_paper_id=paper.id))
+  db.session.commit()
+
+  incremental = _sketches()
+  rebuild_sketches()
+  rebuilt = _sketches()
+
+  assert incremental.keys() == rebuilt.keys()
+  for key, registers in rebuilt.items():
+    assert np.array_equal(incremental[key], registers), key
+
+
+def test_incremental_sketches_only_grow_until_a_rebuild(app):
+  paper = db.session.get(Paper, 2)
+  paper.year += 1
+  paper.authors.remove(paper.authors.first())
+  db.session.commit()
+
+  incremental = _sketches()
+  rebuild_sketches()
+  rebuilt = _sketches()
+
+  assert rebuilt.keys() <= incremental.keys()
+  for key, registers in rebuilt.items():
+    assert np.all(incremental[key] >= registers), key
+
+
+def test_author_impact_metrics_fall_back_to_exact_counts_before_the_backfill(app):
+  author = db.session.get(Author, 1)
+  estimated = ResearchAnalytics.get_author_impact_metrics(author.name)
+
+  db.session.add(StreamCursor(name=SKETCH_BACKFILL, position=0, pending=[]))
+  db.session.query(DistinctSketch).delete()
+  db.session.commit()
+  exact = ResearchAnalytics.get_author_impact_metrics(author.name)
+
+  collaborators = {co.id for paper in author.papers for co in paper.authors if co.id != author.id}
+  citing = {citation.citing_paper_id for paper in author.papers for citation in paper.citing_papers}
+  assert collaborators and citing
+  assert exact['unique_collaborators'] == len(collaborators)
+  assert exact['distinct_citing_papers'] == len(citing)
+  assert estimated['unique_collaborators'] == len(collaborators)
+  assert estimated['distinct_citing_papers'] == len(citing)